@@ -13,16 +13,21 @@ from sqlalchemy.ext.asyncio import async_engine_from_config
 from alembic import context
 
 # Import Base and all models to ensure they're registered
+import app.services  # noqa: F401  (loads services/models in dependency order)
 from app.models.base import Base
 from app.models import (
     User,
     Shipment,
     ClientCTe,
+    Invoice,
+    CTeDocument,
     SubcontractedCTe,
-    Schedule,
     TrackingEvent,
     State,
     Municipality,
+    SyncJob,
+    OpenTransitKey,
+    TrackingOutbox,
 )
 from app.config.settings import settings
 
@@ -0,0 +1,57 @@
+"""Make client_ctes.access_key unique.
+
+The shipment sync upserts client CTes with ON CONFLICT (access_key), which
+requires a unique index on the column. The existing non-unique index is
+replaced by a unique one with the same name.
+
+Duplicate access keys must be resolved before running this migration.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Replace ix_client_ctes_access_key with a unique index."""
+    conn = op.get_bind()
+    duplicates = conn.execute(sa.text(
+        "SELECT access_key FROM client_ctes "
+        "GROUP BY access_key HAVING COUNT(*) > 1"
+    )).fetchall()
+    if duplicates:
+        keys = ", ".join(row[0] for row in duplicates[:10])
+        raise RuntimeError(
+            f"Cannot add unique index: duplicate client_ctes.access_key values ({keys})"
+        )
+
+    op.drop_index('ix_client_ctes_access_key', table_name='client_ctes')
+    op.create_index(
+        'ix_client_ctes_access_key',
+        'client_ctes',
+        ['access_key'],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    """Restore the non-unique access_key index."""
+    op.drop_index('ix_client_ctes_access_key', table_name='client_ctes')
+    op.create_index(
+        'ix_client_ctes_access_key',
+        'client_ctes',
+        ['access_key'],
+        unique=False,
+    )
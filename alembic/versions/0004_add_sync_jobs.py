@@ -0,0 +1,53 @@
+"""Add sync_jobs table.
+
+Persists background VBLOG sync runs (stage, counts, per-stage timings,
+errors) so their status can be polled over the API.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create sync_jobs table."""
+    op.create_table(
+        'sync_jobs',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('trigger', sa.String(20), nullable=False,
+                  comment='What started the job: api | schedule'),
+        sa.Column('dry_run', sa.Boolean(), nullable=False),
+        sa.Column('status', sa.String(20), nullable=False),
+        sa.Column('stage', sa.String(30), nullable=True,
+                  comment='Current (or last) pipeline stage'),
+        sa.Column('counts', sa.JSON(), nullable=True,
+                  comment='found_keys / created / updated / skipped / errors'),
+        sa.Column('timings', sa.JSON(), nullable=True,
+                  comment='Seconds spent per pipeline stage'),
+        sa.Column('errors', sa.JSON(), nullable=True),
+        sa.Column('warnings', sa.JSON(), nullable=True),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index('ix_sync_jobs_status', 'sync_jobs', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    """Drop sync_jobs table."""
+    op.drop_index('ix_sync_jobs_status', table_name='sync_jobs')
+    op.drop_table('sync_jobs')
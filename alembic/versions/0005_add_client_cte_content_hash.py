@@ -0,0 +1,50 @@
+"""Add content_hash and ingested_at columns to client_ctes table.
+
+The sync uses them to skip re-downloading CTes that were already ingested
+and to skip rewriting (and re-encrypting) XML that has not changed.
+Existing rows start with NULLs and are picked up on their next sync.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add content_hash and ingested_at columns to client_ctes table."""
+    op.add_column(
+        'client_ctes',
+        sa.Column(
+            'content_hash',
+            sa.String(64),
+            nullable=True,
+            comment="SHA-256 of the plain XML, used to skip unchanged re-syncs",
+        )
+    )
+    op.add_column(
+        'client_ctes',
+        sa.Column(
+            'ingested_at',
+            sa.DateTime(timezone=True),
+            nullable=True,
+            comment="When the sync last stored this CTe's XML",
+        )
+    )
+
+
+def downgrade() -> None:
+    """Remove content_hash and ingested_at columns from client_ctes table."""
+    op.drop_column('client_ctes', 'ingested_at')
+    op.drop_column('client_ctes', 'content_hash')
@@ -0,0 +1,40 @@
+"""Add open_transit_keys table.
+
+Stores the snapshot of open-transit CTe keys so each sync only processes
+keys that were added since the previous run and closes keys that left.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create open_transit_keys table."""
+    op.create_table(
+        'open_transit_keys',
+        sa.Column('access_key', sa.String(60), primary_key=True,
+                  comment='CTe access key (44 digits)'),
+        sa.Column('first_seen_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('closed_at', sa.DateTime(timezone=True), nullable=True,
+                  comment='When the key left the open-transit list (NULL = still open)'),
+    )
+    op.create_index('ix_open_transit_keys_closed_at', 'open_transit_keys', ['closed_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Drop open_transit_keys table."""
+    op.drop_index('ix_open_transit_keys_closed_at', table_name='open_transit_keys')
+    op.drop_table('open_transit_keys')
@@ -0,0 +1,73 @@
+"""Add tracking outbox and delivery columns on tracking_events.
+
+Status changes queue their Brudam tracking events in tracking_outbox within
+the same transaction; a background worker delivers them and records the
+outcome (status, attempts, latency) on each tracking event.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add delivery columns and create tracking_outbox table."""
+    op.add_column('tracking_events', sa.Column('delivery_status', sa.String(20), nullable=True,
+                  comment='pending | delivered | failed (NULL = recorded before delivery tracking)'))
+    op.add_column('tracking_events', sa.Column('delivery_attempts', sa.Integer(), nullable=False,
+                  server_default='0'))
+    op.add_column('tracking_events', sa.Column('delivery_latency_ms', sa.Float(), nullable=True,
+                  comment='Latency of the last delivery attempt'))
+    op.add_column('tracking_events', sa.Column('delivered_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('tracking_events', sa.Column('delivery_response', sa.Text(), nullable=True,
+                  comment='Brudam response (or error) of the last attempt, truncated'))
+    op.create_index('ix_tracking_events_delivery_status', 'tracking_events', ['delivery_status'], unique=False)
+
+    op.create_table(
+        'tracking_outbox',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('tracking_event_id', postgresql.UUID(as_uuid=True),
+                  sa.ForeignKey('tracking_events.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('document_key', sa.String(60), nullable=False,
+                  comment='Document (NF-e) key sent to Brudam'),
+        sa.Column('event_code', sa.String(10), nullable=False),
+        sa.Column('event_date', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('attachments_json', sa.Text(), nullable=True,
+                  comment='Saved attachment URLs as JSON array'),
+        sa.Column('status', sa.String(20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index('ix_tracking_outbox_tracking_event_id', 'tracking_outbox', ['tracking_event_id'], unique=False)
+    op.create_index('ix_tracking_outbox_status_next_attempt_at', 'tracking_outbox',
+                    ['status', 'next_attempt_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Drop tracking_outbox table and delivery columns."""
+    op.drop_index('ix_tracking_outbox_status_next_attempt_at', table_name='tracking_outbox')
+    op.drop_index('ix_tracking_outbox_tracking_event_id', table_name='tracking_outbox')
+    op.drop_table('tracking_outbox')
+
+    op.drop_index('ix_tracking_events_delivery_status', table_name='tracking_events')
+    op.drop_column('tracking_events', 'delivery_response')
+    op.drop_column('tracking_events', 'delivered_at')
+    op.drop_column('tracking_events', 'delivery_latency_ms')
+    op.drop_column('tracking_events', 'delivery_attempts')
+    op.drop_column('tracking_events', 'delivery_status')
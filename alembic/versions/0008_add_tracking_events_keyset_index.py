@@ -0,0 +1,35 @@
+"""Add composite index for keyset pagination of tracking events.
+
+Backs GET /tracking/{cte_id}/events, which pages a CTe's events by
+(event_date, id).
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create (client_cte_id, event_date, id) index on tracking_events."""
+    op.create_index(
+        'ix_tracking_events_client_cte_id_event_date_id',
+        'tracking_events',
+        ['client_cte_id', 'event_date', 'id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Drop (client_cte_id, event_date, id) index."""
+    op.drop_index('ix_tracking_events_client_cte_id_event_date_id', table_name='tracking_events')
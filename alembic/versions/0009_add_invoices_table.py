@@ -0,0 +1,144 @@
+"""Add invoices table and backfill it from client_ctes.invoices_json.
+
+NF-e membership and per-invoice status move from the invoices_json text
+column to one row per (CTe, NF-e). Existing JSON is copied over in batches
+and then cleared; downgrade rebuilds the JSON from the rows.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17
+
+"""
+import json
+import uuid
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.services.constants import VALID_CODES
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BATCH_SIZE = 1000
+DEFAULT_CODE = '10'
+
+client_ctes = sa.table(
+    'client_ctes',
+    sa.column('id', postgresql.UUID(as_uuid=True)),
+    sa.column('invoices_json', sa.Text()),
+)
+
+invoices = sa.table(
+    'invoices',
+    sa.column('id', postgresql.UUID(as_uuid=True)),
+    sa.column('cte_id', postgresql.UUID(as_uuid=True)),
+    sa.column('nfe_key', sa.String()),
+    sa.column('status_code', sa.String()),
+    sa.column('position', sa.Integer()),
+)
+
+
+def _parse_invoices(value):
+    """(key, status_code) pairs from legacy (list of keys) or current JSON."""
+    try:
+        data = json.loads(value) if value else []
+    except ValueError:
+        return []
+    pairs = []
+    seen = set()
+    for item in data or []:
+        if isinstance(item, dict):
+            key = item.get('key')
+            code = (item.get('status') or {}).get('code') or DEFAULT_CODE
+        else:
+            key, code = item, DEFAULT_CODE
+        if key and key not in seen:
+            seen.add(key)
+            pairs.append((key, str(code)))
+    return pairs
+
+
+def _status(code):
+    """Full status dict for `code`, as InvoiceStatus.create builds it (message/type derive from the code)."""
+    info = VALID_CODES.get(code, {})
+    return {'code': code, 'message': info.get('message', ''), 'type': info.get('type', '')}
+
+
+def upgrade() -> None:
+    """Create invoices table, backfill it and clear invoices_json."""
+    op.create_table(
+        'invoices',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('cte_id', postgresql.UUID(as_uuid=True),
+                  sa.ForeignKey('client_ctes.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('nfe_key', sa.String(60), nullable=False, comment='NF-e access key (44 digits)'),
+        sa.Column('status_code', sa.String(10), nullable=False, comment='Current Brudam/VBLOG status code'),
+        sa.Column('position', sa.Integer(), nullable=False, comment='Order of the NF-e within the CTe'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.UniqueConstraint('cte_id', 'nfe_key', name='uq_invoices_cte_id_nfe_key'),
+    )
+    op.create_index('ix_invoices_nfe_key', 'invoices', ['nfe_key'], unique=False)
+    op.create_index('ix_invoices_status_code', 'invoices', ['status_code'], unique=False)
+
+    # Backfill in keyset-ordered batches
+    conn = op.get_bind()
+    last_id = None
+    while True:
+        query = (
+            sa.select(client_ctes.c.id, client_ctes.c.invoices_json)
+            .where(client_ctes.c.invoices_json.isnot(None))
+            .order_by(client_ctes.c.id)
+            .limit(BATCH_SIZE)
+        )
+        if last_id is not None:
+            query = query.where(client_ctes.c.id > last_id)
+        batch = conn.execute(query).all()
+        if not batch:
+            break
+
+        rows = [
+            {
+                'id': uuid.uuid4(),
+                'cte_id': cte_id,
+                'nfe_key': key,
+                'status_code': code,
+                'position': position,
+            }
+            for cte_id, value in batch
+            for position, (key, code) in enumerate(_parse_invoices(value))
+        ]
+        if rows:
+            conn.execute(invoices.insert(), rows)
+        last_id = batch[-1].id
+
+    op.execute(client_ctes.update().values(invoices_json=None))
+
+
+def downgrade() -> None:
+    """Rebuild invoices_json from the invoices table and drop it."""
+    conn = op.get_bind()
+    by_cte = {}
+    for cte_id, key, code in conn.execute(
+        sa.select(invoices.c.cte_id, invoices.c.nfe_key, invoices.c.status_code)
+        .order_by(invoices.c.cte_id, invoices.c.position)
+    ):
+        by_cte.setdefault(cte_id, []).append({'key': key, 'status': _status(code)})
+
+    for cte_id, items in by_cte.items():
+        conn.execute(
+            client_ctes.update()
+            .where(client_ctes.c.id == cte_id)
+            .values(invoices_json=json.dumps(items))
+        )
+
+    op.drop_index('ix_invoices_status_code', table_name='invoices')
+    op.drop_index('ix_invoices_nfe_key', table_name='invoices')
+    op.drop_table('invoices')
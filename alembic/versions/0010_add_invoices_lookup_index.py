@@ -0,0 +1,38 @@
+"""Add covering index for NF-e reverse lookup.
+
+Replaces the single-column nfe_key index with (nfe_key, cte_id,
+status_code) so GET /invoices/{nfe_key} and POST /invoices/lookup are
+answered from the index.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Swap ix_invoices_nfe_key for a covering lookup index."""
+    op.create_index(
+        'ix_invoices_nfe_key_cte_id_status_code',
+        'invoices',
+        ['nfe_key', 'cte_id', 'status_code'],
+        unique=False,
+    )
+    op.drop_index('ix_invoices_nfe_key', table_name='invoices')
+
+
+def downgrade() -> None:
+    """Restore the single-column nfe_key index."""
+    op.create_index('ix_invoices_nfe_key', 'invoices', ['nfe_key'], unique=False)
+    op.drop_index('ix_invoices_nfe_key_cte_id_status_code', table_name='invoices')
@@ -0,0 +1,35 @@
+"""Add binary xml_blob column for AES-GCM XML envelopes.
+
+client_ctes and subcontracted_ctes get a nullable xml_blob column that
+holds XML written with XML_CIPHER=aesgcm. Existing Fernet rows in
+xml_encrypted are left untouched and converted lazily (on the next write
+or with scripts/reencode_xml.py).
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0011'
+down_revision: Union[str, None] = '0010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add xml_blob to both CTe tables."""
+    op.add_column('client_ctes', sa.Column('xml_blob', sa.LargeBinary(), nullable=True))
+    op.add_column('subcontracted_ctes', sa.Column('xml_blob', sa.LargeBinary(), nullable=True))
+
+
+def downgrade() -> None:
+    """Drop xml_blob (re-encode to Fernet first: envelope-only rows lose their XML)."""
+    op.drop_column('subcontracted_ctes', 'xml_blob')
+    op.drop_column('client_ctes', 'xml_blob')
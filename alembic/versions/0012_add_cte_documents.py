@@ -0,0 +1,151 @@
+"""Move CTe XML into the cte_documents side table.
+
+The encrypted XML (xml_encrypted / xml_blob) of client_ctes and
+subcontracted_ctes moves to one cte_documents row per CTe, so the CTe
+tables only carry metadata. Existing XML is copied in keyset-ordered
+batches before the inline columns are dropped; downgrade copies it back.
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-17
+
+"""
+import uuid
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0012'
+down_revision: Union[str, None] = '0011'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BATCH_SIZE = 500
+
+# UUIDs are stored as hex strings on SQLite; pin a text type there so the
+# columns get TEXT affinity (a bare UUID type has NUMERIC affinity, which
+# coerces all-digit / "NNNeNNN" hex ids into numbers)
+UUID_TYPE = postgresql.UUID(as_uuid=True).with_variant(sa.Uuid(), 'sqlite')
+
+# owner table -> owner column in cte_documents
+OWNERS = {
+    'client_ctes': 'client_cte_id',
+    'subcontracted_ctes': 'subcontracted_cte_id',
+}
+
+cte_documents = sa.table(
+    'cte_documents',
+    sa.column('id', UUID_TYPE),
+    sa.column('client_cte_id', UUID_TYPE),
+    sa.column('subcontracted_cte_id', UUID_TYPE),
+    sa.column('xml_encrypted', sa.Text()),
+    sa.column('xml_blob', sa.LargeBinary()),
+)
+
+
+def _owner_table(name):
+    return sa.table(
+        name,
+        sa.column('id', UUID_TYPE),
+        sa.column('xml_encrypted', sa.Text()),
+        sa.column('xml_blob', sa.LargeBinary()),
+    )
+
+
+def upgrade() -> None:
+    """Create cte_documents, copy the XML over in batches and drop the inline columns."""
+    op.create_table(
+        'cte_documents',
+        sa.Column('id', UUID_TYPE, primary_key=True),
+        sa.Column('client_cte_id', UUID_TYPE,
+                  sa.ForeignKey('client_ctes.id', ondelete='CASCADE'), nullable=True, unique=True),
+        sa.Column('subcontracted_cte_id', UUID_TYPE,
+                  sa.ForeignKey('subcontracted_ctes.id', ondelete='CASCADE'), nullable=True, unique=True),
+        sa.Column('xml_encrypted', sa.Text(), nullable=True),
+        sa.Column('xml_blob', sa.LargeBinary(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.CheckConstraint(
+            '(client_cte_id IS NULL) <> (subcontracted_cte_id IS NULL)',
+            name='ck_cte_documents_one_owner',
+        ),
+    )
+
+    conn = op.get_bind()
+    for name, owner_column in OWNERS.items():
+        owner = _owner_table(name)
+        last_id = None
+        while True:
+            query = (
+                sa.select(owner.c.id, owner.c.xml_encrypted, owner.c.xml_blob)
+                .where(sa.or_(owner.c.xml_encrypted.isnot(None), owner.c.xml_blob.isnot(None)))
+                .order_by(owner.c.id)
+                .limit(BATCH_SIZE)
+            )
+            if last_id is not None:
+                query = query.where(owner.c.id > last_id)
+            batch = conn.execute(query).all()
+            if not batch:
+                break
+
+            conn.execute(cte_documents.insert(), [
+                {
+                    'id': uuid.uuid4(),
+                    'client_cte_id': None,
+                    'subcontracted_cte_id': None,
+                    owner_column: owner_id,
+                    'xml_encrypted': xml_encrypted,
+                    'xml_blob': xml_blob,
+                }
+                for owner_id, xml_encrypted, xml_blob in batch
+            ])
+            last_id = batch[-1].id
+
+        # On SQLite this rebuilds the table from its reflection: pin the
+        # UUID columns so the copy does not come back as NUMERIC
+        with op.batch_alter_table(name, reflect_args=[
+            sa.Column('id', UUID_TYPE, primary_key=True),
+            sa.Column('shipment_id', UUID_TYPE,
+                      sa.ForeignKey('shipments.id', ondelete='CASCADE'), nullable=False),
+        ]) as batch_op:
+            batch_op.drop_column('xml_blob')
+            batch_op.drop_column('xml_encrypted')
+
+
+def downgrade() -> None:
+    """Copy the XML back into the CTe tables and drop cte_documents."""
+    conn = op.get_bind()
+    for name, owner_column in OWNERS.items():
+        op.add_column(name, sa.Column('xml_encrypted', sa.Text(), nullable=True))
+        op.add_column(name, sa.Column('xml_blob', sa.LargeBinary(), nullable=True))
+
+        owner = _owner_table(name)
+        owner_id = cte_documents.c[owner_column]
+        last_id = None
+        while True:
+            query = (
+                sa.select(owner_id, cte_documents.c.xml_encrypted, cte_documents.c.xml_blob)
+                .where(owner_id.isnot(None))
+                .order_by(owner_id)
+                .limit(BATCH_SIZE)
+            )
+            if last_id is not None:
+                query = query.where(owner_id > last_id)
+            batch = conn.execute(query).all()
+            if not batch:
+                break
+
+            for row_id, xml_encrypted, xml_blob in batch:
+                conn.execute(
+                    owner.update()
+                    .where(owner.c.id == row_id)
+                    .values(xml_encrypted=xml_encrypted, xml_blob=xml_blob)
+                )
+            last_id = batch[-1][0]
+
+    op.drop_table('cte_documents')
@@ -4,15 +4,19 @@ Centralized FastAPI dependencies.
 All route dependencies should be imported from here.
 """
 
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Optional
 
+from fastapi import Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db as _get_db
+from app.core.http_clients import http_clients
 from app.config.settings import settings
 from app.services.vblog.base import VBlogBaseClient
 from app.services.vblog.transito import VBlogTransitoService
 from app.services.vblog.tracking import VBlogTrackingService
+from app.services.sync_job_runner import SyncJobRunner
+from app.services.tracking_outbox_worker import TrackingOutboxWorker
 
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
@@ -24,21 +28,37 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
+def include_xml(
+    include: Optional[str] = Query(
+        None,
+        description="Comma-separated extras; 'xml' embeds the decrypted CTe XML",
+    ),
+) -> bool:
+    """
+    Whether the request opted into XML in read responses (?include=xml).
+    Use as: with_xml: bool = Depends(include_xml)
+    """
+    return "xml" in {part.strip().lower() for part in (include or "").split(",")}
+
+
 def get_vblog_service() -> VBlogTransitoService:
     """
-    Provides VBlogTransitoService configured from settings.
+    Provides VBlogTransitoService configured from settings,
+    using the shared pooled "vblog" HTTP client.
     Use as: vblog: VBlogTransitoService = Depends(get_vblog_service)
     """
     return VBlogTransitoService(
         cnpj=settings.vblog_cnpj,
         token=settings.vblog_token,
         base_url=settings.vblog_base,
+        client=http_clients.get("vblog"),
     )
 
 
 def get_tracking_service() -> VBlogTrackingService:
     """
-    Provides VBlogTrackingService configured from settings.
+    Provides VBlogTrackingService configured from settings,
+    using the shared pooled "brudam" HTTP client.
     Use as: tracking: VBlogTrackingService = Depends(get_tracking_service)
     """
     return VBlogTrackingService(
@@ -46,4 +66,39 @@ def get_tracking_service() -> VBlogTrackingService:
         senha=settings.brudam_senha,
         endpoint=settings.brudam_url_tracking,
         cliente=settings.brudam_cliente,
+        client=http_clients.get("brudam"),
     )
+
+
+_sync_job_runner: Optional[SyncJobRunner] = None
+
+
+def get_sync_job_runner() -> SyncJobRunner:
+    """
+    Provides the process-wide SyncJobRunner (started/stopped by the app lifespan).
+    Use as: runner: SyncJobRunner = Depends(get_sync_job_runner)
+    """
+    global _sync_job_runner
+    if _sync_job_runner is None:
+        _sync_job_runner = SyncJobRunner(
+            vblog_factory=get_vblog_service,
+            interval_seconds=settings.sync_interval_seconds,
+        )
+    return _sync_job_runner
+
+
+_tracking_outbox_worker: Optional[TrackingOutboxWorker] = None
+
+
+def get_tracking_outbox_worker() -> TrackingOutboxWorker:
+    """
+    Provides the process-wide TrackingOutboxWorker (started/stopped by the app lifespan).
+    Use as: worker: TrackingOutboxWorker = Depends(get_tracking_outbox_worker)
+    """
+    global _tracking_outbox_worker
+    if _tracking_outbox_worker is None:
+        _tracking_outbox_worker = TrackingOutboxWorker(
+            tracking_factory=get_tracking_service,
+            poll_interval=settings.outbox_poll_interval,
+        )
+    return _tracking_outbox_worker
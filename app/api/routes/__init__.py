@@ -9,7 +9,9 @@ from fastapi import APIRouter
 from . import shipments
 from . import subcontracted_ctes
 from . import tracking
+from . import invoices
 from . import locations
+from . import system
 
 # Main router that includes all sub-routers
 api_router = APIRouter()
@@ -32,8 +34,20 @@ api_router.include_router(
     tags=["Tracking"],
 )
 
+api_router.include_router(
+    invoices.router,
+    prefix="/invoices",
+    tags=["Invoices"],
+)
+
 api_router.include_router(
     locations.router,
     prefix="/locations",
     tags=["Locations"],
 )
+
+api_router.include_router(
+    system.router,
+    prefix="/system",
+    tags=["System"],
+)
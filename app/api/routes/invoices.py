@@ -0,0 +1,50 @@
+# app/api/routes/invoices.py
+"""
+Invoice API routes.
+Reverse lookup from NF-e keys to the CTes and shipments carrying them.
+"""
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_db
+from app.services.invoice_service import InvoiceService
+from app.schemas.invoice import InvoiceLookupRead, InvoiceLookupRequest, InvoiceLookupResult
+
+
+router = APIRouter()
+
+
+@router.get("/{nfe_key}", response_model=list[InvoiceLookupRead])
+async def get_invoice(
+    nfe_key: str,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Find the CTe(s) and shipment(s) carrying an NF-e, with its current status.
+    An NF-e normally belongs to one CTe, but redispatches can list it in several.
+    """
+    matches = await InvoiceService.lookup(db, [nfe_key.strip()])
+    if not matches:
+        raise HTTPException(404, "NF-e not found")
+    return matches
+
+
+@router.post("/lookup", response_model=InvoiceLookupResult)
+async def lookup_invoices(
+    data: InvoiceLookupRequest,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Resolve a batch of NF-e keys at once.
+
+    Example payload:
+        {"keys": ["35240...", "35241..."]}
+    """
+    keys = [key.strip() for key in data.keys if key and key.strip()]
+    found = await InvoiceService.lookup(db, keys)
+    found_keys = {match["nfe_key"] for match in found}
+    return {
+        "found": found,
+        "missing": [key for key in dict.fromkeys(keys) if key not in found_keys],
+    }
@@ -9,7 +9,7 @@ from typing import List
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_db
+from app.api.deps import get_db, include_xml
 from app.services.shipment_service import ShipmentService
 from app.schemas.shipment import ShipmentCreate, ShipmentUpdate, ShipmentRead
 
@@ -18,18 +18,28 @@ router = APIRouter()
 
 
 @router.get("/", response_model=List[ShipmentRead])
-async def list_shipments(db: AsyncSession = Depends(get_db)):
-    """List all shipments."""
-    return await ShipmentService.list_all(db)
+async def list_shipments(
+    with_xml: bool = Depends(include_xml),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    List all shipments.
+    CTe XML is left out unless requested with ?include=xml.
+    """
+    return await ShipmentService.list_all(db, include_xml=with_xml)
 
 
 @router.get("/{shipment_id}", response_model=ShipmentRead)
 async def get_shipment(
     shipment_id: UUID,
+    with_xml: bool = Depends(include_xml),
     db: AsyncSession = Depends(get_db),
 ):
-    """Get a shipment by ID."""
-    shipment = await ShipmentService.get_by_id(db, shipment_id)
+    """
+    Get a shipment by ID.
+    CTe XML is left out unless requested with ?include=xml.
+    """
+    shipment = await ShipmentService.get_by_id(db, shipment_id, include_xml=with_xml)
     if not shipment:
         raise HTTPException(404, "Shipment not found")
     return shipment
@@ -10,7 +10,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_db
+from app.api.deps import get_db, include_xml
 from app.services.client_cte_service import ClientCTeService
 from app.schemas.client_cte import ClientCTeRead
 
@@ -21,10 +21,14 @@ router = APIRouter()
 @router.get("/cte/{cte_id}", response_model=ClientCTeRead)
 async def get_cte(
     cte_id: UUID,
+    with_xml: bool = Depends(include_xml),
     db: AsyncSession = Depends(get_db),
 ):
-    """Get a client CTe by ID."""
-    cte = await ClientCTeService.get_by_id(db, cte_id)
+    """
+    Get a client CTe by ID.
+    XML is left out unless requested with ?include=xml (or use /download).
+    """
+    cte = await ClientCTeService.get_by_id(db, cte_id, include_xml=with_xml)
     if not cte:
         raise HTTPException(404, "CTe not found")
     return cte
@@ -36,14 +40,15 @@ async def download_cte_xml(
     db: AsyncSession = Depends(get_db),
 ):
     """Download CTe XML file."""
-    cte = await ClientCTeService.get_by_id(db, cte_id)
+    cte = await ClientCTeService.get_by_id(db, cte_id, include_xml=True)
     if not cte:
         raise HTTPException(404, "CTe not found")
     
-    if not cte.xml:
+    xml = await cte.read_xml()
+    if not xml:
         raise HTTPException(400, "CTe has no stored XML")
     
-    xml_bytes = cte.xml.encode("utf-8")
+    xml_bytes = xml.encode("utf-8")
     file_stream = BytesIO(xml_bytes)
     filename = f"cte-{cte.id}.xml"
     
@@ -5,22 +5,27 @@ Status update operations with tracking for shipments.
 
 from uuid import UUID
 from typing import Optional, Any
+import asyncio
 import json
-import base64
 import datetime
 
 from fastapi import APIRouter, Depends, HTTPException, Body, Request, File, UploadFile
 from sqlalchemy.ext.asyncio import AsyncSession
-import httpx
 
-from app.api.deps import get_db, get_tracking_service
+from app.api.deps import get_db, get_tracking_service, get_tracking_outbox_worker
+from app.config.settings import settings
+from app.core.http_clients import http_clients
 from app.services.shipment_service import ShipmentService
 from app.services.tracking_event_service import TrackingEventService
-from app.services.attachments_service import AttachmentService
+from app.services.tracking_outbox_service import TrackingOutboxService
+from app.services.tracking_outbox_worker import TrackingOutboxWorker
+from app.services.attachments_service import AttachmentService, AttachmentRef
+from app.services.invoice_service import InvoiceService
 from app.services.vblog.tracking import VBlogTrackingService
 from app.services.constants import VALID_CODES, VALID_CODES_SET
-from app.schemas.tracking_event import TrackingEventCreate
 from app.models.shipment import ShipmentStatus
+from app.models.client_cte import InvoiceStatus
+from app.models.tracking_event import DeliveryStatus
 
 
 router = APIRouter()
@@ -82,16 +87,21 @@ async def process_attachments(
     attachment: Optional[UploadFile],
     attachments_input: Optional[list],
     attachment_service: AttachmentService,
-) -> list[dict]:
-    """Process and save attachments from various sources."""
+) -> list[AttachmentRef]:
+    """
+    Save attachments from various sources to disk.
+
+    Returns references to the saved files; their base64 is streamed into
+    the Brudam payloads at send time, so no copy is kept in memory.
+    """
     final_attachments = []
 
     # Single file from multipart
     if attachment:
-        content = await attachment.read()
-        saved = attachment_service.save_file(content, original_name=getattr(attachment, "filename", None))
-        b64 = base64.b64encode(content).decode()
-        final_attachments.append({"arquivo": {"nome": saved["url"], "dados": b64}})
+        saved = await attachment_service.save_stream(
+            iter_upload(attachment), original_name=getattr(attachment, "filename", None)
+        )
+        final_attachments.append(attachment_service.to_ref(saved))
 
     # Attachments from JSON body
     if attachments_input:
@@ -101,22 +111,35 @@ async def process_attachments(
             dados = arquivo.get("dados")
             if dados:
                 saved = attachment_service.save_base64(dados, original_name=None)
-                final_attachments.append({"arquivo": {"nome": saved["url"], "dados": dados}})
+                final_attachments.append(attachment_service.to_ref(saved))
             elif nome and nome.startswith("http"):
                 try:
-                    async with httpx.AsyncClient() as client:
-                        r = await client.get(nome)
-                    if r.status_code < 300:
-                        content = r.content
-                        saved = attachment_service.save_file(content, original_name=nome.split("/")[-1])
-                        b64 = base64.b64encode(content).decode()
-                        final_attachments.append({"arquivo": {"nome": saved["url"], "dados": b64}})
+                    async with http_clients.get("attachments").stream("GET", nome) as r:
+                        if r.status_code >= 300:
+                            continue
+                        saved = await attachment_service.save_stream(
+                            r.aiter_bytes(), original_name=nome.split("/")[-1]
+                        )
+                    final_attachments.append(attachment_service.to_ref(saved))
                 except Exception:
                     continue
 
     return final_attachments
 
 
+async def iter_upload(upload: UploadFile, chunk_size: int = 1024 * 1024):
+    """Read an uploaded file chunk by chunk."""
+    while chunk := await upload.read(chunk_size):
+        yield chunk
+
+
+async def watch_disconnect(request: Request, event: asyncio.Event, interval: float = 0.5) -> None:
+    """Set `event` once the client has disconnected."""
+    while not await request.is_disconnected():
+        await asyncio.sleep(interval)
+    event.set()
+
+
 def parse_invoice_keys(body: dict) -> Optional[list[str]]:
     """Extract invoice keys from request body."""
     keys = body.get("notas") or body.get("invoice_keys") or body.get("nfs")
@@ -125,6 +148,88 @@ def parse_invoice_keys(body: dict) -> Optional[list[str]]:
     return None
 
 
+async def send_tracking_inline(
+    request: Optional[Request],
+    db: AsyncSession,
+    tracking_service: VBlogTrackingService,
+    updated: list[tuple],
+    code_val: str,
+    final_attachments: list[AttachmentRef],
+    event_date: datetime.datetime,
+) -> list[dict]:
+    """
+    Send tracking to Brudam inside the request and register each event with
+    its delivery outcome (TRACKING_DELIVERY_MODE=inline).
+
+    Batched when there are no attachments; otherwise one request per invoice
+    (attachments are per document), fanned out in parallel and cancelled if
+    the client disconnects.
+    """
+    document_keys = list(dict.fromkeys(inv["key"] for _, inv in updated))
+    if final_attachments and document_keys:
+        disconnected = asyncio.Event()
+        watcher = asyncio.create_task(watch_disconnect(request, disconnected)) if request else None
+        try:
+            sent_each = await tracking_service.send_each(
+                document_keys=document_keys,
+                event_code=code_val,
+                attachments=final_attachments,
+                concurrency=settings.brudam_send_concurrency,
+                cancel_event=disconnected,
+            )
+        finally:
+            if watcher:
+                watcher.cancel()
+        sent = {
+            key: (success, resp_text, elapsed_ms)
+            for key, (success, resp_text, elapsed_ms) in zip(document_keys, sent_each)
+        }
+    else:
+        sent = {
+            key: (success, resp_text, None)
+            for key, (success, resp_text) in (await tracking_service.send_many(
+                document_keys=document_keys,
+                event_code=code_val,
+                batch_size=settings.brudam_batch_size,
+            )).items()
+        }
+
+    results = []
+    events = []
+    now = datetime.datetime.now(datetime.timezone.utc)
+    for cte, inv in updated:
+        invoice_key = inv["key"]
+        success, resp_text, elapsed_ms = sent[invoice_key]
+        results.append({
+            "cte": str(cte.id),
+            "nf": invoice_key,
+            "status": inv["status"],
+            "ok": success,
+            "response": resp_text[:500] if resp_text else None,
+            "elapsed_ms": elapsed_ms,
+        })
+
+        # Tracking event for this specific invoice, with its delivery outcome
+        events.append({
+            "client_cte_id": cte.id,
+            "invoice_key": invoice_key,
+            "event_code": code_val,
+            "description": VALID_CODES[code_val]["message"],
+            "event_date": event_date,
+            "delivery_status": DeliveryStatus.DELIVERED if success else DeliveryStatus.FAILED,
+            "delivery_attempts": 1,
+            "delivery_latency_ms": elapsed_ms,
+            "delivered_at": now if success else None,
+            "delivery_response": resp_text[:2000] if resp_text else None,
+        })
+
+    event_ids = await TrackingEventService.register_many(db, events)
+    for result, event_id in zip(results, event_ids):
+        result["event_id"] = str(event_id)
+
+    return results
+
+
 @router.post("/{shipment_id}/status")
 async def update_status(
     shipment_id: UUID,
@@ -132,9 +237,16 @@ async def update_status(
     request: Request = None,
     db: AsyncSession = Depends(get_db),
     tracking_service: VBlogTrackingService = Depends(get_tracking_service),
+    outbox_worker: TrackingOutboxWorker = Depends(get_tracking_outbox_worker),
 ):
     """
     Update status for invoices in a shipment and send tracking events to Brudam.
+
+    By default the status change and its tracking events are committed to the
+    tracking outbox and the endpoint returns right away; delivery (retries,
+    backoff, batching) happens in the background and its outcome is stored on
+    each tracking event. With TRACKING_DELIVERY_MODE=inline events are sent
+    within the request instead.
     
     Accepts status code in various formats:
     - Raw code: "1" or 1
@@ -191,50 +303,52 @@ async def update_status(
     attachment_service = AttachmentService()
     final_attachments = await process_attachments(attachment, attachments_input, attachment_service)
 
-    # Update status and send tracking events for each invoice
-    results = []
-    total_updated = 0
-    
-    for cte in shipment.client_ctes:
-        # Update invoice statuses in the CTe
-        updated_invoices = cte.update_invoice_status(invoice_keys_filter, code_val)
-        total_updated += len(updated_invoices)
-        
-        # Send tracking to Brudam for each updated invoice
-        for inv in updated_invoices:
-            invoice_key = inv["key"]
-            success, resp_text = await tracking_service.send(
-                document_key=invoice_key,
-                event_code=code_val,
-                attachments=final_attachments,
-            )
-            results.append({
+    # Update invoice statuses of every CTe in one statement
+    cte_by_id = {cte.id: cte for cte in shipment.client_ctes}
+    updated = [
+        (cte_by_id[cte_id], InvoiceStatus.create(nfe_key, code_val))
+        for cte_id, nfe_key in await InvoiceService.update_status(
+            db, list(cte_by_id), invoice_keys_filter, code_val
+        )
+    ]
+    total_updated = len(updated)
+
+    event_date = datetime.datetime.now(datetime.timezone.utc)
+
+    if settings.tracking_delivery_mode == "inline":
+        results = await send_tracking_inline(
+            request, db, tracking_service, updated, code_val, final_attachments, event_date
+        )
+        await db.commit()
+    else:
+        # Status change and tracking events commit atomically; the outbox
+        # worker delivers them to Brudam in the background
+        event_ids = await TrackingOutboxService.enqueue(
+            db,
+            [(cte.id, inv["key"]) for cte, inv in updated],
+            event_code=code_val,
+            event_date=event_date,
+            attachment_urls=[a.url for a in final_attachments],
+        )
+        await db.commit()
+        outbox_worker.wake()
+
+        results = [
+            {
                 "cte": str(cte.id),
-                "nf": invoice_key,
+                "nf": inv["key"],
                 "status": inv["status"],
-                "ok": success,
-                "response": resp_text[:500] if resp_text else None,
-            })
-
-            # Register tracking event for this specific invoice
-            await TrackingEventService.register(
-                db,
-                TrackingEventCreate(
-                    client_cte_id=cte.id,
-                    invoice_key=invoice_key,
-                    event_code=code_val,
-                    description=VALID_CODES[code_val]["message"],
-                    event_date=datetime.datetime.now(datetime.timezone.utc),
-                ),
-            )
-
-    # Commit all changes
-    await db.commit()
+                "event_id": str(event_id),
+                "delivery_status": DeliveryStatus.PENDING,
+            }
+            for (cte, inv), event_id in zip(updated, event_ids)
+        ]
 
     return {
         "status": "ok",
         "code_sent": code_val,
         "invoices_updated": total_updated,
         "filter_applied": invoice_keys_filter is not None,
+        "delivery": settings.tracking_delivery_mode,
         "results": results,
     }
@@ -3,190 +3,104 @@
 VBLOG synchronization operations for shipments.
 """
 
-from typing import Optional
-import xml.etree.ElementTree as ET
+from typing import AsyncIterator, List
+from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_db, get_vblog_service
-from app.services.shipment_service import ShipmentService
-from app.services.client_cte_service import ClientCTeService
+from app.api.deps import get_db, get_vblog_service, get_sync_job_runner
+from app.schemas.sync_job import SyncJobRead
+from app.services.shipment_sync_service import ShipmentSyncService
+from app.services.sync_job_runner import SyncJobRunner
+from app.services.sync_job_service import SyncJobService
 from app.services.vblog.transito import VBlogTransitoService
-from app.services.vblog.cte import VBlogCTeService
-from app.schemas.shipment import ShipmentCreate
-from app.schemas.client_cte import ClientCTeCreate
-from app.utils.logger import logger
 
 
 router = APIRouter()
 
 
-def extract_nfe_keys(cte_xml: Optional[str]) -> list[str]:
-    """Extract NF-e keys from a CTe XML string."""
-    if not cte_xml:
-        return []
-    try:
-        root = ET.fromstring(cte_xml)
-    except Exception:
-        return []
-    
-    found: list[str] = []
-    for elem in root.iter():
-        tag = elem.tag.split("}")[-1] if "}" in elem.tag else elem.tag
-        if tag == "chNFe" and elem.text:
-            val = elem.text.strip()
-            if val:
-                found.append(val)
-    
-    # Deduplicate while preserving order
-    seen = set()
-    unique = []
-    for x in found:
-        if x not in seen:
-            unique.append(x)
-            seen.add(x)
-    return unique
+def _require_vblog_config(vblog: VBlogTransitoService) -> None:
+    if not (vblog.cnpj and vblog.token and vblog.base_url):
+        raise HTTPException(400, "VBLOG configuration missing: cnpj/token/base_url")
+
+
+async def _ndjson_lines(sync: ShipmentSyncService) -> AsyncIterator[bytes]:
+    """One NDJSON line per processed key, then a final summary line."""
+    async for detail in sync.iter_results():
+        yield orjson.dumps({"type": "key", **detail}) + b"\n"
+    yield orjson.dumps({"type": "summary", **sync.summary()}) + b"\n"
 
 
 @router.post("/sync")
 async def sync_shipments_from_vblog(
     dry_run: bool = False,
+    refresh: bool = False,
+    stream: bool = False,
+    include_raw_xml: bool = False,
     db: AsyncSession = Depends(get_db),
     vblog: VBlogTransitoService = Depends(get_vblog_service),
 ):
     """
-    Sync shipments from VBLOG open transits:
+    Sync shipments from VBLOG open transits inside the request:
     - Queries open transits
-    - Extracts CTe access keys
-    - Downloads CTe XMLs
-    - Persists new `Shipment` + `ClientCTe` or updates existing CT-es
+    - Extracts CTe access keys and diffs them against the previous run's
+      open-transit snapshot (only added keys are processed; removed ones are closed)
+    - Downloads CTe XMLs concurrently (up to `SYNC_DOWNLOAD_CONCURRENCY` at once),
+      skipping CT-es that were already ingested
+    - Persists new `Shipment` + `ClientCTe` or updates CT-es whose XML changed,
+      one transaction per `SYNC_BATCH_SIZE` keys (invoice statuses are kept)
+
+    Large syncs should use `POST /sync/jobs` instead, which runs in the background.
 
     Query params:
     - dry_run: When true, performs no DB writes; returns summary only.
+    - refresh: When true, processes every open key and re-downloads ingested CT-es.
+    - stream: When true, responds with NDJSON (`application/x-ndjson`): one
+      `{"type": "key", ...}` line per key as its batch completes, then one
+      `{"type": "summary", ...}` line. No `details` list is accumulated.
+    - include_raw_xml: When true, echoes the raw VBLOG transit XML in the summary.
     """
+    _require_vblog_config(vblog)
+    sync = ShipmentSyncService(
+        db, vblog, dry_run=dry_run, include_raw_xml=include_raw_xml, refresh=refresh
+    )
+    if stream:
+        return StreamingResponse(_ndjson_lines(sync), media_type="application/x-ndjson")
+    return await sync.run()
+
+
+@router.post("/sync/jobs", response_model=SyncJobRead, status_code=202)
+async def start_sync_job(
+    dry_run: bool = False,
+    refresh: bool = False,
+    vblog: VBlogTransitoService = Depends(get_vblog_service),
+    runner: SyncJobRunner = Depends(get_sync_job_runner),
+):
+    """
+    Start a background sync job and return it immediately.
+    If a sync is already running, the running job is returned instead.
+    Poll `GET /sync/jobs/{job_id}` for stage, counts, timings and errors.
+    """
+    _require_vblog_config(vblog)
+    return await runner.trigger(dry_run=dry_run, refresh=refresh)
+
+
+@router.get("/sync/jobs", response_model=List[SyncJobRead])
+async def list_sync_jobs(
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+):
+    """List recent sync jobs, newest first."""
+    return await SyncJobService.list_recent(db, limit=limit)
 
-    # Ensure VBLOG is configured
-    if not (vblog.cnpj and vblog.token and vblog.base_url):
-        raise HTTPException(400, "VBLOG configuration missing: cnpj/token/base_url")
 
-    # Query open transits
-    transit_resp = await vblog.query_open_transits()
-    if not transit_resp.transits:
-        return {
-            "status": "ok",
-            "found_keys": 0,
-            "created": 0,
-            "updated": 0,
-            "details": [],
-            "warnings": transit_resp.warnings,
-            "code": transit_resp.code,
-            "description": transit_resp.description,
-            "raw_xml": transit_resp.raw_xml,
-        }
-
-    # Collect CTe keys from transits
-    keys: set[str] = set()
-    for ct in transit_resp.transits:
-        for doc in ct.docs:
-            local_type = (doc.type or "").lower()
-            if local_type == "chavecte" and doc.value:
-                key = doc.value.strip()
-                if len(key) >= 20:  # basic sanity
-                    keys.add(key)
-            elif local_type == "xml" and doc.value:
-                try:
-                    # Try to extract chCTe from inline XML
-                    k = VBlogTransitoService.extract_xml_key(doc.value, key_tag="chCTe")
-                    if k:
-                        keys.add(k)
-                except Exception:
-                    continue
-
-    if not keys:
-        return {
-            "status": "ok",
-            "found_keys": 0,
-            "created": 0,
-            "updated": 0,
-            "details": [],
-            "warnings": transit_resp.warnings + ["No CTe keys found in transits"],
-            "code": transit_resp.code,
-            "description": transit_resp.description,
-            "raw_xml": transit_resp.raw_xml,
-        }
-
-    # Prepare CTe downloader
-    cte_downloader = VBlogCTeService(vblog)
-
-    created = 0
-    updated = 0
-    details = []
-    errors = []
-
-    for key in sorted(keys):
-        try:
-            existing = await ClientCTeService.get_by_access_key(db, key)
-
-            # Download XML (best-effort)
-            xml_cte = await cte_downloader.download_cte(key)
-            nfe_keys = extract_nfe_keys(xml_cte)
-
-            if dry_run:
-                details.append({
-                    "key": key,
-                    "action": "skipped",
-                    "has_xml": bool(xml_cte),
-                    "nfe_count": len(nfe_keys),
-                })
-                continue
-
-            if existing:
-                # Update XML and invoices if available
-                if xml_cte:
-                    existing = await ClientCTeService.update_xml(db, existing, xml_cte)
-                if nfe_keys:
-                    existing = await ClientCTeService.update_invoices(db, existing, nfe_keys)
-                updated += 1
-                details.append({
-                    "key": key,
-                    "action": "updated",
-                    "has_xml": bool(xml_cte),
-                    "nfe_count": len(nfe_keys),
-                })
-            else:
-                # Create a new shipment and attach the CTe
-                shipment = await ShipmentService.create(db, ShipmentCreate())
-                cte = await ClientCTeService.add(
-                    db,
-                    shipment_id=shipment.id,
-                    data=ClientCTeCreate(access_key=key, xml=xml_cte),
-                )
-                if nfe_keys:
-                    await ClientCTeService.update_invoices(db, cte, nfe_keys)
-                created += 1
-                details.append({
-                    "key": key,
-                    "action": "created",
-                    "shipment_id": str(shipment.id),
-                    "has_xml": bool(xml_cte),
-                    "nfe_count": len(nfe_keys),
-                })
-
-        except Exception as e:
-            msg = f"CTe {key} error: {e}"
-            logger.error(msg)
-            errors.append(msg)
-
-    return {
-        "status": "ok",
-        "found_keys": len(keys),
-        "created": created,
-        "updated": updated,
-        "details": details,
-        "errors": errors,
-        "warnings": transit_resp.warnings,
-        "code": transit_resp.code,
-        "description": transit_resp.description,
-        "raw_xml": transit_resp.raw_xml,
-    }
+@router.get("/sync/jobs/{job_id}", response_model=SyncJobRead)
+async def get_sync_job(job_id: UUID, db: AsyncSession = Depends(get_db)):
+    """Get a sync job's status."""
+    job = await SyncJobService.get_by_id(db, job_id)
+    if not job:
+        raise HTTPException(404, "Sync job not found")
+    return job
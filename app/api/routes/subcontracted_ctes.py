@@ -10,8 +10,10 @@ import xml.etree.ElementTree as ET
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.orm import selectinload
 
-from app.api.deps import get_db, get_vblog_service
+from app.api.deps import get_db, get_vblog_service, include_xml
+from app.core.cpu_offload import run_cpu
 from app.services.shipment_service import ShipmentService
 from app.services.crypto_service import encrypt_text
 from app.services.vblog.transito import VBlogTransitoService
@@ -60,7 +62,7 @@ async def upload_subcontracted_xml(
     xml_str = content.decode("utf-8")
 
     # Extract access key
-    access_key = extract_key_from_xml(xml_str)
+    access_key = await run_cpu(extract_key_from_xml, xml_str, size=len(content))
     if not access_key:
         raise HTTPException(400, "Could not extract CTe key from XML")
 
@@ -77,7 +79,7 @@ async def upload_subcontracted_xml(
         shipment_id=shipment_id,
         access_key=access_key,
     )
-    subcontracted.xml = xml_str  # Encrypted on assignment
+    await subcontracted.write_xml(xml_str)  # Encrypted (off the loop when large)
     db.add(subcontracted)
 
     # Send to VBLOG
@@ -112,15 +114,22 @@ async def upload_subcontracted_xml(
 @router.get("/{cte_id}", response_model=SubcontractedCTeRead)
 async def get_subcontracted_cte(
     cte_id: UUID,
+    with_xml: bool = Depends(include_xml),
     db: AsyncSession = Depends(get_db),
 ):
-    """Get subcontracted CTe by ID."""
-    result = await db.execute(
-        select(SubcontractedCTe).where(SubcontractedCTe.id == cte_id)
-    )
+    """
+    Get subcontracted CTe by ID.
+    XML is left out unless requested with ?include=xml.
+    """
+    query = select(SubcontractedCTe).where(SubcontractedCTe.id == cte_id)
+    if with_xml:
+        query = query.options(selectinload(SubcontractedCTe.document))
+    result = await db.execute(query)
     cte = result.scalar_one_or_none()
     if not cte:
         raise HTTPException(404, "Subcontracted CTe not found")
+    if with_xml:
+        await cte.resolve_xml()
     return cte
 
 
@@ -132,18 +141,21 @@ async def retry_vblog_upload(
 ):
     """Retry sending subcontracted CTe to VBLOG."""
     result = await db.execute(
-        select(SubcontractedCTe).where(SubcontractedCTe.id == cte_id)
+        select(SubcontractedCTe)
+        .options(selectinload(SubcontractedCTe.document))
+        .where(SubcontractedCTe.id == cte_id)
     )
     cte = result.scalar_one_or_none()
     if not cte:
         raise HTTPException(404, "Subcontracted CTe not found")
 
-    if not cte.xml:
+    xml = await cte.read_xml()
+    if not xml:
         raise HTTPException(400, "CTe has no stored XML")
 
     envdocs_service = VBlogEnvDocsService(vblog)
     try:
-        vblog_result = await envdocs_service.upload_ctes([cte.xml])
+        vblog_result = await envdocs_service.upload_ctes([xml])
         
         cte.vblog_status_code = str(vblog_result.get("code", ""))
         cte.vblog_status_description = vblog_result.get("description", "")
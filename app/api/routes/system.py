@@ -0,0 +1,36 @@
+# app/api/routes/system.py
+"""
+System API routes.
+Operational visibility into the integration layer (circuit breakers, outbox, metrics).
+"""
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_db
+from app.core.circuit_breaker import circuit_breakers
+from app.core.cpu_offload import cpu_offloader
+from app.core.loop_lag import loop_lag
+from app.core.xml_cache import xml_cache
+from app.services.tracking_outbox_service import TrackingOutboxService
+
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+async def get_metrics(db: AsyncSession = Depends(get_db)):
+    """Runtime metrics for the integration layer."""
+    return {
+        "circuit_breakers": circuit_breakers.snapshot(),
+        "tracking_outbox": await TrackingOutboxService.count_by_status(db),
+        "xml_cache": xml_cache.snapshot(),
+        "event_loop_lag": loop_lag.snapshot(),
+        "cpu_executor": cpu_offloader.snapshot(),
+    }
+
+
+@router.get("/circuit-breakers")
+async def list_circuit_breakers():
+    """State of each upstream circuit breaker (closed / open / half_open)."""
+    return circuit_breakers.snapshot()
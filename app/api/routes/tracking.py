@@ -5,9 +5,11 @@ Handles tracking event operations and resending.
 """
 
 from uuid import UUID
+from typing import Optional
 import datetime
+import time
 
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_db, get_tracking_service
@@ -15,6 +17,7 @@ from app.services.client_cte_service import ClientCTeService
 from app.services.tracking_event_service import TrackingEventService
 from app.services.vblog.tracking import VBlogTrackingService
 from app.services.constants import VALID_CODES
+from app.models.tracking_event import DeliveryStatus
 from app.schemas.tracking_event import TrackingEventCreate, TrackingEventRead
 from app.utils.logger import logger
 
@@ -42,13 +45,15 @@ async def resend_tracking(
         raise HTTPException(404, "CTe not found")
 
     # Send tracking event
+    started = time.perf_counter()
     success, response_text = await tracking_service.send(
         document_key=cte.access_key,
         event_code=event_code,
     )
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
 
-    # Register tracking event
-    await TrackingEventService.register(
+    # Register tracking event with its delivery outcome
+    event = await TrackingEventService.register(
         db,
         TrackingEventCreate(
             client_cte_id=cte.id,
@@ -57,6 +62,10 @@ async def resend_tracking(
             event_date=datetime.datetime.now(datetime.timezone.utc),
         ),
     )
+    event.record_delivery(success, response_text, elapsed_ms)
+    if not success:
+        event.delivery_status = DeliveryStatus.FAILED
+    await db.commit()
 
     logger.info(f"Tracking resent for CTe {cte.access_key}: code {event_code}")
 
@@ -69,11 +78,34 @@ async def resend_tracking(
 @router.get("/tracking/{cte_id}/events", response_model=list[TrackingEventRead])
 async def list_tracking_events(
     cte_id: UUID,
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    invoice_key: Optional[str] = Query(None, description="Only events for this NF-e key"),
+    event_code: Optional[str] = Query(None, description="Only events with this code"),
     db: AsyncSession = Depends(get_db),
 ):
-    """List all tracking events for a CTe."""
-    cte = await ClientCTeService.get_by_id(db, cte_id)
-    if not cte:
+    """
+    List tracking events for a CTe, oldest first, one page at a time.
+
+    When more events exist, the cursor for the next page is returned in the
+    `X-Next-Cursor` header.
+    """
+    if not await ClientCTeService.exists(db, cte_id):
         raise HTTPException(404, "CTe not found")
 
-    return await TrackingEventService.list_by_cte(db, cte_id)
+    try:
+        events, next_cursor = await TrackingEventService.list_page(
+            db,
+            cte_id,
+            limit=limit,
+            cursor=cursor,
+            invoice_key=invoice_key,
+            event_code=event_code,
+        )
+    except ValueError:
+        raise HTTPException(400, "Invalid cursor")
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return events
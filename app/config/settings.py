@@ -33,6 +33,30 @@ class Settings(BaseSettings):
     
     # Encryption
     fernet_key: Optional[str] = Field(default=None)
+    xml_cipher: str = Field(
+        default="fernet",
+        description="Cipher for newly written CTe XML: fernet (text column) or aesgcm (binary envelope)",
+    )
+    aesgcm_keys: Optional[str] = Field(
+        default=None,
+        description="Comma-separated key_id:base64 AES-256 keys (key_id 0-255); the first one encrypts new data",
+    )
+
+    @field_validator("xml_cipher")
+    @classmethod
+    def validate_xml_cipher(cls, value: str) -> str:
+        value = value.strip().lower()
+        if value not in ("fernet", "aesgcm"):
+            raise ValueError("xml_cipher must be 'fernet' or 'aesgcm'")
+        return value
+
+    @field_validator("cpu_executor")
+    @classmethod
+    def validate_cpu_executor(cls, value: str) -> str:
+        value = value.strip().lower()
+        if value not in ("thread", "process", "none"):
+            raise ValueError("cpu_executor must be 'thread', 'process' or 'none'")
+        return value
 
     # Attachments
     attachments_dir: str = Field(default="attachments")
@@ -48,6 +72,89 @@ class Settings(BaseSettings):
     brudam_senha: Optional[str] = Field(default=None)
     brudam_url_tracking: Optional[str] = Field(default=None)
     brudam_cliente: Optional[str] = Field(default=None)
+    brudam_batch_size: int = Field(
+        default=50,
+        description="Documents per Brudam tracking request when sending without attachments",
+    )
+    brudam_send_concurrency: int = Field(
+        default=8,
+        description="Max per-invoice Brudam requests in flight (sends with attachments)",
+    )
+    tracking_delivery_mode: str = Field(
+        default="outbox",
+        description="outbox = status endpoint queues events for the background worker; inline = send in the request",
+    )
+    outbox_poll_interval: float = Field(default=2.0, description="Seconds between outbox polls when idle")
+    outbox_batch_size: int = Field(default=100, description="Outbox entries claimed per worker pass")
+    outbox_max_attempts: int = Field(default=8, description="Delivery attempts before an event is marked failed")
+    outbox_backoff_seconds: float = Field(
+        default=5.0,
+        description="Base retry delay; doubles on each failed attempt",
+    )
+    outbox_backoff_max_seconds: float = Field(default=900.0, description="Upper bound for the retry delay")
+    outbox_lease_seconds: float = Field(
+        default=300.0,
+        description="How long a claimed entry stays leased to a worker before another may retry it",
+    )
+
+    # Outbound HTTP (pooled clients shared per upstream: VBLOG, Brudam)
+    http_max_connections: int = Field(default=100, description="Max open connections per upstream")
+    http_max_keepalive_connections: int = Field(
+        default=20,
+        description="Idle connections kept alive per upstream",
+    )
+    http_keepalive_expiry: float = Field(default=30.0, description="Seconds an idle connection is kept")
+    http_timeout: float = Field(default=10.0, description="Default request timeout in seconds")
+    http_http2: bool = Field(default=False, description="Use HTTP/2 when the 'h2' package is installed")
+
+    # Circuit breakers (per upstream)
+    circuit_failure_threshold: int = Field(
+        default=5,
+        description="Consecutive failed calls that open an upstream's circuit",
+    )
+    circuit_recovery_seconds: float = Field(
+        default=30.0,
+        description="Seconds an open circuit fails fast before a probe call is allowed",
+    )
+
+    # CTe XML storage
+    xml_compress_level: int = Field(
+        default=6,
+        description="zlib level used to compress CTe XML before encryption (0 stores it uncompressed)",
+    )
+
+    # Decrypted CTe XML cache (process-local LRU)
+    xml_cache_max_bytes: int = Field(
+        default=64 * 1024 * 1024,
+        description="Upper bound on cached decrypted XML, in bytes (0 disables the cache)",
+    )
+    xml_cache_ttl_seconds: float = Field(default=600.0, description="Seconds a decrypted XML stays cached")
+
+    # CPU-bound work (XML parsing, XML encryption) off the event loop
+    cpu_executor: str = Field(
+        default="thread",
+        description="Executor for CPU-heavy steps: thread, process or none (always inline)",
+    )
+    cpu_executor_workers: int = Field(default=0, description="Executor workers (0 = min(4, CPU count))")
+    cpu_offload_min_bytes: int = Field(
+        default=64 * 1024,
+        description="Inputs smaller than this many bytes are processed inline on the event loop",
+    )
+    loop_lag_interval: float = Field(default=0.5, description="Seconds between event-loop lag samples")
+
+    # Shipment sync (VBLOG open transits)
+    sync_download_concurrency: int = Field(
+        default=8,
+        description="Max CTe downloads in flight at once during /shipments/sync",
+    )
+    sync_batch_size: int = Field(
+        default=200,
+        description="CTes downloaded and written per transaction during /shipments/sync",
+    )
+    sync_interval_seconds: int = Field(
+        default=0,
+        description="Run the background sync job every N seconds (0 = only when triggered via API)",
+    )
 
     # CORS - stored as string, accessed as property for list
     cors_origins_str: str = Field(
@@ -0,0 +1,141 @@
+# app/core/circuit_breaker.py
+"""
+Per-upstream circuit breakers for outbound integrations (VBLOG, Brudam).
+
+closed    -> calls go through; consecutive failures are counted
+open      -> calls fail fast until the recovery timeout elapses
+half_open -> a single probe call is let through; success closes the
+             circuit, failure opens it again
+"""
+
+import datetime
+import time
+from typing import Dict, Optional
+
+from app.config.settings import settings
+from app.utils.logger import logger
+
+
+class CircuitState:
+    """Circuit breaker states."""
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one upstream."""
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self.rejected = 0
+        self._opened_at: Optional[float] = None
+        self._opened_wall: Optional[datetime.datetime] = None
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go out now. In half-open state only one probe
+        call is allowed at a time.
+        """
+        if self.state == CircuitState.OPEN:
+            if time.monotonic() - self._opened_at < self.recovery_timeout:
+                self.rejected += 1
+                return False
+            self.state = CircuitState.HALF_OPEN
+            self._probe_in_flight = False
+            logger.info(f"Circuit '{self.name}' half-open: probing upstream")
+
+        if self.state == CircuitState.HALF_OPEN:
+            # A probe that never reported back (e.g. cancelled) expires after the timeout
+            if self._probe_in_flight and time.monotonic() - self._probe_started < self.recovery_timeout:
+                self.rejected += 1
+                return False
+            self._probe_in_flight = True
+            self._probe_started = time.monotonic()
+
+        return True
+
+    @property
+    def is_probing(self) -> bool:
+        """Whether the current call is the half-open probe."""
+        return self.state == CircuitState.HALF_OPEN
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == CircuitState.OPEN
+
+    def record_success(self) -> None:
+        if self.state != CircuitState.CLOSED:
+            logger.info(f"Circuit '{self.name}' closed: upstream recovered")
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self._opened_at = None
+        self._opened_wall = None
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == CircuitState.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != CircuitState.OPEN:
+                logger.warning(
+                    f"Circuit '{self.name}' open after {self.failures} failure(s); "
+                    f"failing fast for {self.recovery_timeout}s"
+                )
+            self.state = CircuitState.OPEN
+            self._opened_at = time.monotonic()
+            self._opened_wall = datetime.datetime.now(datetime.timezone.utc)
+            self._probe_in_flight = False
+
+    def retry_in(self) -> float:
+        """Seconds until an open circuit lets a probe through (0 otherwise)."""
+        if self.state != CircuitState.OPEN:
+            return 0.0
+        return max(0.0, self.recovery_timeout - (time.monotonic() - self._opened_at))
+
+    def snapshot(self) -> dict:
+        """Current state for the metrics endpoint."""
+        return {
+            "name": self.name,
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "failure_threshold": self.failure_threshold,
+            "recovery_timeout": self.recovery_timeout,
+            "rejected_calls": self.rejected,
+            "opened_at": self._opened_wall.isoformat() if self._opened_wall else None,
+            "retry_in": round(self.retry_in(), 2),
+        }
+
+
+class CircuitBreakerRegistry:
+    """One breaker per upstream name, created on first use."""
+
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                name,
+                failure_threshold=settings.circuit_failure_threshold,
+                recovery_timeout=settings.circuit_recovery_seconds,
+            )
+            self._breakers[name] = breaker
+        return breaker
+
+    def snapshot(self) -> list[dict]:
+        return [breaker.snapshot() for breaker in self._breakers.values()]
+
+    def reset(self) -> None:
+        self._breakers.clear()
+
+
+# Shared registry used by the VBLOG/Brudam clients and the metrics endpoint
+circuit_breakers = CircuitBreakerRegistry()
@@ -0,0 +1,94 @@
+# app/core/cpu_offload.py
+"""
+Offloading of CPU-bound work (XML parsing, XML encryption/compression)
+from the event loop to a shared executor.
+
+Inputs smaller than `cpu_offload_min_bytes` run inline: for them the
+executor hand-off costs more than the work itself.
+
+thread  -> ThreadPoolExecutor; zlib and the cryptography ciphers release
+           the GIL, so crypto runs in parallel with the loop
+process -> ProcessPoolExecutor; also parallelizes pure-Python work such as
+           ElementTree parsing. Callables and arguments must be picklable
+           (module-level functions, plain data)
+none    -> everything runs inline
+"""
+
+import asyncio
+import functools
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from app.config.settings import settings
+from app.utils.logger import logger
+
+
+T = TypeVar("T")
+
+
+class CPUOffloader:
+    """Lazily created executor plus the size threshold for offloading."""
+
+    def __init__(self, kind: str, workers: int, min_bytes: int):
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.min_bytes = min_bytes
+
+        self._executor: Optional[Executor] = None
+        self.offloaded = 0
+        self.inline = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.kind in ("thread", "process")
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="cpu")
+            logger.info(f"CPU offload executor started ({self.kind}, workers={self.workers})")
+        return self._executor
+
+    async def run(self, func: Callable[..., T], *args: Any, size: int = 0) -> T:
+        """
+        Run func(*args) on the executor when `size` (input bytes) reaches
+        the threshold, else inline on the loop.
+        """
+        if not self.enabled or size < self.min_bytes:
+            self.inline += 1
+            return func(*args)
+        self.offloaded += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), functools.partial(func, *args))
+
+    def shutdown(self) -> None:
+        """Stop the executor (application shutdown); it is recreated on next use."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def snapshot(self) -> dict:
+        """Executor settings and call counts for the metrics endpoint."""
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "min_bytes": self.min_bytes,
+            "offloaded_calls": self.offloaded,
+            "inline_calls": self.inline,
+        }
+
+
+# Shared offloader used by the VBLOG parsers, the sync and XML storage
+cpu_offloader = CPUOffloader(
+    kind=settings.cpu_executor,
+    workers=settings.cpu_executor_workers or min(4, os.cpu_count() or 1),
+    min_bytes=settings.cpu_offload_min_bytes,
+)
+
+
+async def run_cpu(func: Callable[..., T], *args: Any, size: int = 0) -> T:
+    """Run CPU-bound func(*args) via the shared offloader (see CPUOffloader.run)."""
+    return await cpu_offloader.run(func, *args, size=size)
@@ -0,0 +1,72 @@
+# app/core/http_clients.py
+"""
+Process-wide pooled HTTP clients, one per upstream (VBLOG, Brudam).
+Clients are created on first use and closed by the application lifespan.
+"""
+
+from typing import Dict
+
+import httpx
+
+from app.config.settings import settings
+from app.utils.logger import logger
+
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the optional `h2` package (httpx[http2])."""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class HTTPClientRegistry:
+    """
+    Holds one long-lived `httpx.AsyncClient` per upstream name so that
+    connections (and TLS sessions) are reused across requests.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        """Get the shared client for an upstream, creating it if needed."""
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._create(name)
+            self._clients[name] = client
+        return client
+
+    @staticmethod
+    def _create(name: str) -> httpx.AsyncClient:
+        http2 = settings.http_http2
+        if http2 and not _http2_available():
+            logger.warning("HTTP_HTTP2 is enabled but 'h2' is not installed; using HTTP/1.1")
+            http2 = False
+
+        logger.info(
+            f"Creating pooled HTTP client '{name}' "
+            f"(max_connections={settings.http_max_connections}, http2={http2})"
+        )
+        return httpx.AsyncClient(
+            timeout=settings.http_timeout,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.http_max_connections,
+                max_keepalive_connections=settings.http_max_keepalive_connections,
+                keepalive_expiry=settings.http_keepalive_expiry,
+            ),
+        )
+
+    async def aclose(self) -> None:
+        """Close every client (application shutdown)."""
+        clients, self._clients = self._clients, {}
+        for name, client in clients.items():
+            if not client.is_closed:
+                await client.aclose()
+                logger.info(f"Closed pooled HTTP client '{name}'")
+
+
+# Shared registry used by app.api.deps and the application lifespan
+http_clients = HTTPClientRegistry()
@@ -0,0 +1,72 @@
+# app/core/loop_lag.py
+"""
+Event-loop lag monitor.
+
+A background task sleeps for a fixed interval and measures how late it
+wakes up. The delay is time the loop spent running other (blocking) code,
+i.e. how long any request could have been stalled.
+"""
+
+import asyncio
+import statistics
+import time
+from collections import deque
+from typing import Deque, Optional
+
+from app.config.settings import settings
+from app.utils.logger import logger
+
+
+class LoopLagMonitor:
+    """Samples event-loop lag and keeps a rolling window for metrics."""
+
+    def __init__(self, interval: float = 0.5, window: int = 600):
+        self.interval = interval
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._task: Optional[asyncio.Task] = None
+        self.max_ms = 0.0
+
+    def start(self) -> None:
+        """Start sampling on the running loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+            logger.info(f"Event loop lag monitor started (interval={self.interval}s)")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            self.record(max(0.0, time.perf_counter() - expected))
+
+    def record(self, lag_seconds: float) -> None:
+        lag_ms = lag_seconds * 1000
+        self._samples.append(lag_ms)
+        self.max_ms = max(self.max_ms, lag_ms)
+
+    def snapshot(self) -> dict:
+        """Lag statistics (ms) over the rolling window, plus the all-time max."""
+        samples = sorted(self._samples)
+        if not samples:
+            return {"samples": 0, "interval": self.interval}
+        return {
+            "samples": len(samples),
+            "interval": self.interval,
+            "last_ms": round(self._samples[-1], 2),
+            "mean_ms": round(statistics.fmean(samples), 2),
+            "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 2),
+            "window_max_ms": round(samples[-1], 2),
+            "max_ms": round(self.max_ms, 2),
+        }
+
+
+# Shared monitor started by the application lifespan
+loop_lag = LoopLagMonitor(interval=settings.loop_lag_interval)
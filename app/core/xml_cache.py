@@ -0,0 +1,133 @@
+# app/core/xml_cache.py
+"""
+Process-local LRU cache for decrypted CTe XML.
+
+Entries are keyed by a hash of the stored ciphertext (Fernet text or
+AES-GCM envelope), so a changed XML never hits a stale entry. The cache
+is bounded by the total size of the cached XML in bytes, and entries
+expire after a TTL.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple, Union
+
+from app.config.settings import settings
+from app.core.cpu_offload import run_cpu
+
+
+class DecryptedXMLCache:
+    """Memory-bounded LRU of plaintext XML keyed by ciphertext hash."""
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        # key -> (plain, size_bytes, expires_at); most recently used last
+        self._entries: "OrderedDict[bytes, Tuple[str, int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 and self.ttl_seconds > 0
+
+    @staticmethod
+    def _key(token: Union[str, bytes]) -> bytes:
+        data = token.encode("utf-8") if isinstance(token, str) else token
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+    def get_or_decrypt(
+        self,
+        token: Optional[Union[str, bytes]],
+        decrypt: Callable,
+    ) -> Optional[str]:
+        """Cached plaintext for `token`, decrypting (and caching) on a miss."""
+        if not token or not self.enabled:
+            return decrypt(token)
+        key, plain = self._lookup(token)
+        if plain is None:
+            plain = decrypt(token)
+            self._store(key, plain)
+        return plain
+
+    async def aget_or_decrypt(
+        self,
+        token: Optional[Union[str, bytes]],
+        decrypt: Callable,
+    ) -> Optional[str]:
+        """Like get_or_decrypt, with a miss decrypted on the CPU offload executor."""
+        if not token or not self.enabled:
+            return await run_cpu(decrypt, token, size=len(token or ""))
+        key, plain = self._lookup(token)
+        if plain is None:
+            plain = await run_cpu(decrypt, token, size=len(token))
+            self._store(key, plain)
+        return plain
+
+    def _lookup(self, token: Union[str, bytes]) -> Tuple[bytes, Optional[str]]:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[2] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return key, entry[0]
+                self._drop(key)
+            self.misses += 1
+        return key, None
+
+    def _store(self, key: bytes, plain: Optional[str]) -> None:
+        if plain is not None:
+            self._put(key, plain, time.monotonic() + self.ttl_seconds)
+
+    def _put(self, key: bytes, plain: str, expires_at: float) -> None:
+        size = len(plain.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (plain, size, expires_at)
+            self.size_bytes += size
+            while self.size_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def _drop(self, key: bytes) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.size_bytes -= size
+
+    def snapshot(self) -> dict:
+        """Current usage and hit/miss counters for the metrics endpoint."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+
+# Shared cache used by EncryptedXMLMixin.xml and the metrics endpoint
+xml_cache = DecryptedXMLCache(
+    max_bytes=settings.xml_cache_max_bytes,
+    ttl_seconds=settings.xml_cache_ttl_seconds,
+)
@@ -7,11 +7,15 @@ from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.config.settings import settings
 from app.core.database import ensure_db_initialized
+from app.core.cpu_offload import cpu_offloader
+from app.core.http_clients import http_clients
+from app.core.loop_lag import loop_lag
 from app.utils.logger import logger
 
 
@@ -30,11 +34,29 @@ async def lifespan(app: FastAPI):
     # Initialize database
     await ensure_db_initialized()
     logger.info("Database initialized")
+
+    # Event-loop lag sampling (reported in /system/metrics)
+    loop_lag.start()
+
+    # Background shipment sync (scheduled and API-triggered jobs)
+    from app.api.deps import get_sync_job_runner, get_tracking_outbox_worker
+    sync_runner = get_sync_job_runner()
+    await sync_runner.start()
+
+    # Brudam tracking delivery (outbox worker)
+    outbox_worker = get_tracking_outbox_worker()
+    if settings.tracking_delivery_mode == "outbox":
+        outbox_worker.start()
     
     yield
     
     # Shutdown
     logger.info("Shutting down application...")
+    await sync_runner.stop()
+    await outbox_worker.stop()
+    await http_clients.aclose()
+    cpu_offloader.shutdown()
+    await loop_lag.stop()
 
 
 app = FastAPI(
@@ -42,6 +64,8 @@ app = FastAPI(
     description="API for shipment and CTe management",
     version="2.0.0",
     lifespan=lifespan,
+    # orjson: faster encoding of large list payloads; handles UUID/datetime natively
+    default_response_class=ORJSONResponse,
 )
 
 # Serve uploaded attachments
@@ -58,6 +82,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Pagination cursor of GET /tracking/{cte_id}/events
+    expose_headers=["X-Next-Cursor"],
 )
 
 # API routes (async, English names only)
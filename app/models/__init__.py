@@ -10,9 +10,14 @@ from .user import User
 # Models (English names)
 from .shipment import Shipment, ShipmentStatus
 from .client_cte import ClientCTe
+from .invoice import Invoice
+from .cte_document import CTeDocument, XMLDocumentMixin
 from .subcontracted_cte import SubcontractedCTe
-from .tracking_event import TrackingEvent
+from .tracking_event import TrackingEvent, DeliveryStatus
+from .tracking_outbox import TrackingOutbox
 from .location import State, Municipality
+from .sync_job import SyncJob, SyncJobStatus
+from .open_transit_key import OpenTransitKey
 
 __all__ = [
     # Base classes
@@ -26,8 +31,16 @@ __all__ = [
     "Shipment",
     "ShipmentStatus",
     "ClientCTe",
+    "Invoice",
+    "CTeDocument",
+    "XMLDocumentMixin",
     "SubcontractedCTe",
     "TrackingEvent",
+    "DeliveryStatus",
+    "TrackingOutbox",
     "State",
     "Municipality",
+    "SyncJob",
+    "SyncJobStatus",
+    "OpenTransitKey",
 ]
@@ -9,9 +9,12 @@ import datetime
 from typing import Optional
 
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-from sqlalchemy import DateTime, Text, func
+from sqlalchemy import DateTime, LargeBinary, Text, func
 
-from app.services.crypto_service import encrypt_text, decrypt_text
+from app.config.settings import settings
+from app.core.cpu_offload import run_cpu
+from app.core.xml_cache import xml_cache
+from app.services.crypto_service import encrypt_text, decrypt_text, encrypt_envelope, decrypt_envelope
 
 
 class Base(DeclarativeBase):
@@ -45,21 +48,58 @@ class TimestampMixin:
 class EncryptedXMLMixin:
     """
     Mixin for models that store encrypted XML content.
-    Provides xml property that auto-encrypts/decrypts.
-    
-    Requires: xml_encrypted column in the model.
+    Provides xml property that auto-encrypts/decrypts. XML is zlib-compressed
+    before encryption ("z1:" header); legacy uncompressed tokens still decrypt.
+
+    New XML is written with the cipher selected by XML_CIPHER: Fernet text in
+    xml_encrypted, or an AES-GCM envelope in xml_blob. Only one of the two
+    is set per row; rows in the other format stay readable and are converted
+    when their XML is next written (or by scripts/reencode_xml.py).
+
+    Used by CTeDocument (cte_documents), which keeps the XML out of the CTe
+    tables; CTe models reach it through XMLDocumentMixin.
     """
     xml_encrypted: Mapped[Optional[str]] = mapped_column(
         Text,
         nullable=True,
     )
+    xml_blob: Mapped[Optional[bytes]] = mapped_column(
+        LargeBinary,
+        nullable=True,
+    )
 
     @property
     def xml(self) -> Optional[str]:
-        """Get decrypted XML content."""
-        return decrypt_text(self.xml_encrypted)
+        """Get decrypted XML content (served from the decrypted-XML cache when hot)."""
+        if self.xml_blob is not None:
+            return xml_cache.get_or_decrypt(self.xml_blob, decrypt_envelope)
+        return xml_cache.get_or_decrypt(self.xml_encrypted, decrypt_text)
 
     @xml.setter
     def xml(self, value: Optional[str]) -> None:
         """Set XML content (will be encrypted)."""
-        self.xml_encrypted = encrypt_text(value)
+        for column, stored in self.encode_xml(value).items():
+            setattr(self, column, stored)
+
+    async def read_xml(self) -> Optional[str]:
+        """`xml`, with large documents decrypted off the event loop."""
+        if self.xml_blob is not None:
+            return await xml_cache.aget_or_decrypt(self.xml_blob, decrypt_envelope)
+        return await xml_cache.aget_or_decrypt(self.xml_encrypted, decrypt_text)
+
+    async def write_xml(self, value: Optional[str]) -> None:
+        """Set `xml`, with large documents compressed/encrypted off the event loop."""
+        stored = await run_cpu(type(self).encode_xml, value, size=len(value or ""))
+        for column, encoded in stored.items():
+            setattr(self, column, encoded)
+
+    @staticmethod
+    def encode_xml(value: Optional[str]) -> dict:
+        """
+        Encode XML into its stored column values.
+        Used by bulk writes that bypass the ORM attribute (e.g. upserts).
+        """
+        compress = settings.xml_compress_level > 0
+        if settings.xml_cipher == "aesgcm":
+            return {"xml_encrypted": None, "xml_blob": encrypt_envelope(value, compress)}
+        return {"xml_encrypted": encrypt_text(value, compress=compress), "xml_blob": None}
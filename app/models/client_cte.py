@@ -8,18 +8,22 @@ from __future__ import annotations
 
 import uuid
 import json
-from typing import Optional, List, TYPE_CHECKING
+import hashlib
+import datetime
+from typing import Dict, Optional, List, TYPE_CHECKING
 
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy import String, Text, ForeignKey
+from sqlalchemy import String, Text, ForeignKey, DateTime, event, inspect
 
-from .base import Base, TimestampMixin, EncryptedXMLMixin
+from .base import Base, TimestampMixin
+from .cte_document import XMLDocumentMixin
 from app.services.constants import VALID_CODES
 
 if TYPE_CHECKING:
     from .shipment import Shipment
     from .tracking_event import TrackingEvent
+    from .invoice import Invoice
 
 
 class InvoiceStatus:
@@ -67,16 +71,30 @@ class InvoiceStatus:
         # Migrate from old format
         return [InvoiceStatus.create(key) for key in data]
 
+    @staticmethod
+    def merge(existing: list, keys: list[str]) -> list:
+        """
+        Build the invoice list for `keys`, keeping the stored status of
+        invoices that already exist; new keys get the default status.
+        """
+        by_key = {
+            inv["key"]: inv for inv in InvoiceStatus.migrate_legacy(existing)
+        }
+        return [by_key.get(key) or InvoiceStatus.create(key) for key in keys]
+
 
-class ClientCTe(Base, TimestampMixin, EncryptedXMLMixin):
+class ClientCTe(Base, TimestampMixin, XMLDocumentMixin):
     """
     Client CTe document model.
     
-    Stores CTe documents received from the client with encrypted XML storage.
+    Stores CTe documents received from the client; the encrypted XML is
+    kept in cte_documents and loaded on demand.
     
     Relationships:
         - shipment: Parent shipment
+        - document: Encrypted XML (CTeDocument, loaded on demand)
         - tracking_events: Associated tracking events
+        - invoice_rows: NF-e invoices with their status (invoices table)
     """
     __tablename__ = "client_ctes"
 
@@ -97,15 +115,29 @@ class ClientCTe(Base, TimestampMixin, EncryptedXMLMixin):
         String(60),
         nullable=False,
         index=True,
+        unique=True,
         comment="CTe access key (44 digits)",
     )
 
-    # NF-e references stored as JSON
+    # Legacy NF-e list as JSON; superseded by the invoices table and only
+    # read for rows that were not backfilled yet
     invoices_json: Mapped[Optional[str]] = mapped_column(
         Text,
         nullable=True,
         default=None,
-        comment="Associated NF-e keys as JSON array",
+        comment="Legacy NF-e keys as JSON array (see invoices table)",
+    )
+
+    content_hash: Mapped[Optional[str]] = mapped_column(
+        String(64),
+        nullable=True,
+        comment="SHA-256 of the plain XML, used to skip unchanged re-syncs",
+    )
+
+    ingested_at: Mapped[Optional[datetime.datetime]] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+        comment="When the sync last stored this CTe's XML",
     )
 
     # Relationships
@@ -121,9 +153,75 @@ class ClientCTe(Base, TimestampMixin, EncryptedXMLMixin):
         lazy="selectin",
     )
 
+    invoice_rows: Mapped[List["Invoice"]] = relationship(
+        "Invoice",
+        back_populates="client_cte",
+        cascade="all, delete-orphan",
+        order_by="Invoice.position",
+        lazy="selectin",
+    )
+
+    @staticmethod
+    def hash_xml(value: Optional[str]) -> Optional[str]:
+        """SHA-256 hex digest of the plain XML (None when there is no XML)."""
+        if not value:
+            return None
+        return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+    def xml_changed(self, value: Optional[str]) -> None:
+        """Keep the content hash in step with the stored XML."""
+        self.content_hash = ClientCTe.hash_xml(value)
+
     @property
     def invoices(self) -> list[dict]:
-        """Get list of invoices with individual status."""
+        """Get list of invoices with individual status (treat as read-only)."""
+        return [
+            entry if isinstance(entry, dict) else entry.to_dict()
+            for entry in self._invoice_index().values()
+        ]
+
+    @invoices.setter
+    def invoices(self, value: list) -> None:
+        """
+        Set list of invoices. Accepts both old format (strings) and new format (dicts).
+        Rows for keys already on the CTe are reused; missing keys are removed.
+        """
+        from .invoice import Invoice
+
+        existing = {row.nfe_key: row for row in self.invoice_rows}
+        rows = []
+        for position, inv in enumerate(InvoiceStatus.migrate_legacy(value or [])):
+            row = existing.get(inv["key"]) or Invoice(nfe_key=inv["key"])
+            row.status_code = inv["status"]["code"]
+            row.position = position
+            rows.append(row)
+        self.invoice_rows = rows
+        self.invoices_json = None
+        self._reset_invoice_index()
+
+    def _invoice_index(self) -> Dict[str, "Invoice | dict"]:
+        """
+        NF-e key -> invoice row, built once per load and reset when the rows
+        change. CTes not backfilled into the invoices table yet map to the
+        decoded invoices_json dicts instead (parsed once, not per access).
+        """
+        index = self.__dict__.get("_invoice_index_cache")
+        if index is None:
+            state = inspect(self)
+            rows = []
+            if "invoice_rows" not in state.unloaded or not state.has_identity:
+                rows = self.invoice_rows
+            if rows:
+                index = {row.nfe_key: row for row in rows}
+            else:
+                index = {inv["key"]: inv for inv in self._legacy_invoices()}
+            self.__dict__["_invoice_index_cache"] = index
+        return index
+
+    def _reset_invoice_index(self) -> None:
+        self.__dict__.pop("_invoice_index_cache", None)
+
+    def _legacy_invoices(self) -> list[dict]:
         if not self.invoices_json:
             return []
         try:
@@ -133,34 +231,24 @@ class ClientCTe(Base, TimestampMixin, EncryptedXMLMixin):
         except Exception:
             return []
 
-    @invoices.setter
-    def invoices(self, value: list) -> None:
-        """Set list of invoices. Accepts both old format (strings) and new format (dicts)."""
-        try:
-            if value:
-                # Migrate if needed
-                migrated = InvoiceStatus.migrate_legacy(value)
-                self.invoices_json = json.dumps(migrated)
-            else:
-                self.invoices_json = None
-        except Exception:
-            self.invoices_json = None
-
     @property
     def invoice_keys(self) -> list[str]:
         """Get just the invoice keys (for backward compatibility and filtering)."""
-        return [inv["key"] if isinstance(inv, dict) else inv for inv in self.invoices]
+        return list(self._invoice_index())
 
     def get_invoice_by_key(self, key: str) -> Optional[dict]:
         """Get a specific invoice by its key."""
-        for inv in self.invoices:
-            if inv.get("key") == key:
-                return inv
-        return None
+        entry = self._invoice_index().get(key)
+        if entry is None or isinstance(entry, dict):
+            return entry
+        return entry.to_dict()
 
     def update_invoice_status(self, keys: Optional[list[str]], code: str) -> list[dict]:
         """
         Update status for specific invoices or all if keys is None.
+        Changes the loaded invoice rows in place (flushed as per-row UPDATEs
+        of just the changed rows); InvoiceService.update_status does the same
+        with one UPDATE statement.
         
         Args:
             keys: List of invoice keys to update, or None to update all
@@ -169,16 +257,23 @@ class ClientCTe(Base, TimestampMixin, EncryptedXMLMixin):
         Returns:
             List of updated invoice objects
         """
-        invoices = self.invoices
-        keys_set = set(keys) if keys else None
+        if not self.invoice_rows and self.invoices_json:
+            # Legacy CTe: move its invoices into rows first
+            self.invoices = self._legacy_invoices()
+
+        index = self._invoice_index()
+        if keys:
+            rows = sorted(
+                (index[key] for key in set(keys) if key in index),
+                key=lambda row: row.position,
+            )
+        else:
+            rows = list(index.values())
+
         updated = []
-        
-        for inv in invoices:
-            if keys_set is None or inv["key"] in keys_set:
-                InvoiceStatus.update_status(inv, code)
-                updated.append(inv)
-        
-        self.invoices_json = json.dumps(invoices)
+        for row in rows:
+            row.status_code = code
+            updated.append(row.to_dict())
         return updated
 
     # Legacy property aliases
@@ -223,3 +318,19 @@ class ClientCTe(Base, TimestampMixin, EncryptedXMLMixin):
     def trackings(self) -> List["TrackingEvent"]:
         """Legacy alias for tracking_events."""
         return self.tracking_events
+
+
+# The invoice index is per load: drop it whenever the rows or legacy JSON change
+@event.listens_for(ClientCTe, "load")
+@event.listens_for(ClientCTe, "refresh")
+@event.listens_for(ClientCTe, "expire")
+def _reset_invoice_index_on_load(target, *args) -> None:
+    if target is not None:  # expire can fire for already garbage-collected states
+        target._reset_invoice_index()
+
+
+@event.listens_for(ClientCTe.invoice_rows, "append")
+@event.listens_for(ClientCTe.invoice_rows, "remove")
+@event.listens_for(ClientCTe.invoices_json, "set")
+def _reset_invoice_index_on_change(target, *args) -> None:
+    target._reset_invoice_index()
@@ -0,0 +1,143 @@
+# app/models/cte_document.py
+"""
+CTeDocument model.
+Encrypted XML of client and subcontracted CTes, kept in its own table so
+the CTe metadata rows stay narrow.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import uuid
+from typing import Iterable, Optional
+
+from sqlalchemy.ext.asyncio import AsyncAttrs
+from sqlalchemy.orm import Mapped, mapped_column, relationship, declared_attr
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import ForeignKey, CheckConstraint, inspect
+
+from app.core.cpu_offload import run_cpu
+from .base import Base, TimestampMixin, EncryptedXMLMixin
+
+
+class CTeDocument(Base, TimestampMixin, EncryptedXMLMixin):
+    """
+    Encrypted CTe XML document.
+
+    Belongs to exactly one client CTe or subcontracted CTe (one document
+    per CTe); deleted together with its owner.
+    """
+    __tablename__ = "cte_documents"
+    __table_args__ = (
+        CheckConstraint(
+            "(client_cte_id IS NULL) <> (subcontracted_cte_id IS NULL)",
+            name="ck_cte_documents_one_owner",
+        ),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        default=uuid.uuid4,
+    )
+
+    client_cte_id: Mapped[Optional[uuid.UUID]] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("client_ctes.id", ondelete="CASCADE"),
+        nullable=True,
+        unique=True,
+    )
+
+    subcontracted_cte_id: Mapped[Optional[uuid.UUID]] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("subcontracted_ctes.id", ondelete="CASCADE"),
+        nullable=True,
+        unique=True,
+    )
+
+
+# `_resolved_xml` value of a CTe whose XML was not resolved ahead of time
+_UNRESOLVED = object()
+
+
+class XMLDocumentMixin(AsyncAttrs):
+    """
+    Mixin for CTe models whose encrypted XML lives in cte_documents.
+
+    The document is only loaded on demand: eager-load it with
+    `selectinload(Model.document)`, or use `await read_xml()` /
+    `await write_xml()`, which load it when needed.
+    The sync `xml` property requires the document to be loaded (or the
+    object to be new). Read paths call `await resolve_xml()` before
+    serializing, so `loaded_xml` does no decryption on the event loop.
+    """
+
+    _resolved_xml = _UNRESOLVED
+
+    @declared_attr
+    def document(cls) -> Mapped[Optional[CTeDocument]]:
+        return relationship(
+            CTeDocument,
+            uselist=False,
+            cascade="all, delete-orphan",
+            passive_deletes=True,
+        )
+
+    @property
+    def xml(self) -> Optional[str]:
+        """Get decrypted XML content."""
+        document = self.document
+        return document.xml if document is not None else None
+
+    @xml.setter
+    def xml(self, value: Optional[str]) -> None:
+        """Set XML content (will be encrypted)."""
+        self._apply_xml(value, CTeDocument.encode_xml(value))
+
+    @property
+    def loaded_xml(self) -> Optional[str]:
+        """
+        Decrypted XML if the document was loaded, else None (never triggers a load).
+        Uses the XML from `resolve_xml()`; decrypts inline only as a fallback.
+        """
+        if self._resolved_xml is not _UNRESOLVED:
+            return self._resolved_xml
+        if "document" in inspect(self).unloaded:
+            return None
+        return self.xml
+
+    async def read_xml(self) -> Optional[str]:
+        """`xml`, loading the document if needed; large documents are decrypted off the event loop."""
+        if self._resolved_xml is not _UNRESOLVED:
+            return self._resolved_xml
+        document = await self.awaitable_attrs.document
+        return await document.read_xml() if document is not None else None
+
+    async def resolve_xml(self) -> Optional[str]:
+        """Decrypt the loaded document off the event loop and keep it for `loaded_xml`."""
+        if "document" in inspect(self).unloaded:
+            return None
+        self._resolved_xml = await self.read_xml()
+        return self._resolved_xml
+
+    async def write_xml(self, value: Optional[str]) -> None:
+        """Set `xml`, loading the document if needed; large documents are encrypted off the event loop."""
+        stored = await run_cpu(CTeDocument.encode_xml, value, size=len(value or ""))
+        await self.awaitable_attrs.document
+        self._apply_xml(value, stored)
+
+    def _apply_xml(self, value: Optional[str], stored: dict) -> None:
+        vars(self).pop("_resolved_xml", None)
+        if self.document is None:
+            self.document = CTeDocument()
+        for column, encoded in stored.items():
+            setattr(self.document, column, encoded)
+        self.xml_changed(value)
+
+    def xml_changed(self, value: Optional[str]) -> None:
+        """Hook for models that derive columns from the plain XML."""
+
+
+async def resolve_xml_documents(ctes: Iterable[XMLDocumentMixin]) -> None:
+    """`resolve_xml()` every CTe whose document was loaded, before serializing them."""
+    await asyncio.gather(*(cte.resolve_xml() for cte in ctes))
@@ -0,0 +1,89 @@
+# app/models/invoice.py
+"""
+Invoice model.
+NF-e membership of a client CTe and the per-invoice tracking status.
+"""
+
+from __future__ import annotations
+
+import uuid
+import datetime
+from typing import TYPE_CHECKING
+
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import String, DateTime, ForeignKey, Integer, UniqueConstraint, Index, func
+
+from .base import Base
+
+if TYPE_CHECKING:
+    from .client_cte import ClientCTe
+
+
+class Invoice(Base):
+    """
+    Invoice (NF-e) of a client CTe.
+
+    One row per (CTe, NF-e key); `position` keeps the order of the NF-es in
+    the CTe XML. Status changes are single-row UPDATEs instead of rewrites
+    of a JSON list.
+
+    Relationships:
+        - client_cte: Parent CTe document
+    """
+    __tablename__ = "invoices"
+    __table_args__ = (
+        UniqueConstraint("cte_id", "nfe_key", name="uq_invoices_cte_id_nfe_key"),
+        # Covers the NF-e -> CTe/status lookup without touching the table
+        Index("ix_invoices_nfe_key_cte_id_status_code", "nfe_key", "cte_id", "status_code"),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        default=uuid.uuid4,
+    )
+
+    cte_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("client_ctes.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+
+    nfe_key: Mapped[str] = mapped_column(
+        String(60),
+        nullable=False,
+        comment="NF-e access key (44 digits)",
+    )
+
+    status_code: Mapped[str] = mapped_column(
+        String(10),
+        nullable=False,
+        index=True,
+        comment="Current Brudam/VBLOG status code",
+    )
+
+    position: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        default=0,
+        comment="Order of the NF-e within the CTe",
+    )
+
+    updated_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+    )
+
+    # Relationship
+    client_cte: Mapped["ClientCTe"] = relationship(
+        "ClientCTe",
+        back_populates="invoice_rows",
+    )
+
+    def to_dict(self) -> dict:
+        """Invoice in the {"key", "status": {...}} format used by the API."""
+        from .client_cte import InvoiceStatus
+        return InvoiceStatus.create(self.nfe_key, self.status_code)
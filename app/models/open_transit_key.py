@@ -0,0 +1,51 @@
+# app/models/open_transit_key.py
+"""
+OpenTransitKey model.
+Snapshot of the CTe keys seen in VBLOG's open-transit list, used by the
+sync to diff consecutive runs.
+"""
+
+from __future__ import annotations
+
+import datetime
+from typing import Optional
+
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, DateTime, func
+
+from .base import Base
+
+
+class OpenTransitKey(Base):
+    """
+    Open-transit snapshot entry.
+
+    A key is recorded once it has been ingested successfully and stays open
+    (closed_at is NULL) while VBLOG keeps listing it; it is closed when it
+    leaves the open-transit list, and reopened if it comes back.
+    """
+    __tablename__ = "open_transit_keys"
+
+    access_key: Mapped[str] = mapped_column(
+        String(60),
+        primary_key=True,
+        comment="CTe access key (44 digits)",
+    )
+
+    first_seen_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+    )
+
+    closed_at: Mapped[Optional[datetime.datetime]] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+        index=True,
+        comment="When the key left the open-transit list (NULL = still open)",
+    )
+
+    @property
+    def is_open(self) -> bool:
+        """Whether the key is still in the open-transit list."""
+        return self.closed_at is None
@@ -14,21 +14,23 @@ from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy import String, Text, ForeignKey
 
-from .base import Base, TimestampMixin, EncryptedXMLMixin
+from .base import Base, TimestampMixin
+from .cte_document import XMLDocumentMixin
 
 if TYPE_CHECKING:
     from .shipment import Shipment
 
 
-class SubcontractedCTe(Base, TimestampMixin, EncryptedXMLMixin):
+class SubcontractedCTe(Base, TimestampMixin, XMLDocumentMixin):
     """
     Subcontracted CTe document model.
     
-    Stores CTe documents from subcontractors with encrypted XML storage
-    and VBLOG upload status tracking.
+    Stores CTe documents from subcontractors (encrypted XML in
+    cte_documents, loaded on demand) and VBLOG upload status tracking.
     
     Relationships:
         - shipment: Parent shipment
+        - document: Encrypted XML (CTeDocument, loaded on demand)
     """
     __tablename__ = "subcontracted_ctes"
 
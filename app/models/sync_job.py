@@ -0,0 +1,106 @@
+# app/models/sync_job.py
+"""
+SyncJob model.
+Persisted record of a VBLOG shipment sync run (background or API-triggered).
+"""
+
+from __future__ import annotations
+
+import uuid
+import datetime
+from typing import Optional
+
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID, JSON
+from sqlalchemy import String, Boolean, DateTime
+
+from .base import Base, TimestampMixin
+
+
+class SyncJobStatus:
+    """Lifecycle states of a sync job."""
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+    ACTIVE = (QUEUED, RUNNING)
+
+
+class SyncJob(Base, TimestampMixin):
+    """
+    Sync job model.
+
+    Tracks the progress of one shipment sync: current pipeline stage,
+    created/updated/error counts, per-stage timings and error messages.
+    """
+    __tablename__ = "sync_jobs"
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        default=uuid.uuid4,
+    )
+
+    trigger: Mapped[str] = mapped_column(
+        String(20),
+        nullable=False,
+        default="api",
+        comment="What started the job: api | schedule",
+    )
+
+    dry_run: Mapped[bool] = mapped_column(
+        Boolean,
+        nullable=False,
+        default=False,
+    )
+
+    status: Mapped[str] = mapped_column(
+        String(20),
+        nullable=False,
+        default=SyncJobStatus.QUEUED,
+        index=True,
+    )
+
+    stage: Mapped[Optional[str]] = mapped_column(
+        String(30),
+        nullable=True,
+        comment="Current (or last) pipeline stage",
+    )
+
+    counts: Mapped[Optional[dict]] = mapped_column(
+        JSON,
+        nullable=True,
+        comment="found_keys / added / removed / created / updated / unchanged / skipped / errors",
+    )
+
+    timings: Mapped[Optional[dict]] = mapped_column(
+        JSON,
+        nullable=True,
+        comment="Seconds spent per pipeline stage",
+    )
+
+    errors: Mapped[Optional[list]] = mapped_column(
+        JSON,
+        nullable=True,
+    )
+
+    warnings: Mapped[Optional[list]] = mapped_column(
+        JSON,
+        nullable=True,
+    )
+
+    started_at: Mapped[Optional[datetime.datetime]] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+    )
+
+    finished_at: Mapped[Optional[datetime.datetime]] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+    )
+
+    @property
+    def is_active(self) -> bool:
+        """Whether the job is still queued or running."""
+        return self.status in SyncJobStatus.ACTIVE
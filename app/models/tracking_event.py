@@ -12,7 +12,7 @@ from typing import Optional, TYPE_CHECKING
 
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy import String, DateTime, ForeignKey
+from sqlalchemy import String, DateTime, ForeignKey, Integer, Float, Text, Index
 
 from .base import Base
 
@@ -20,17 +20,29 @@ if TYPE_CHECKING:
     from .client_cte import ClientCTe
 
 
+class DeliveryStatus:
+    """Delivery states shared by tracking events and outbox entries."""
+    PENDING = "pending"
+    SENDING = "sending"  # outbox entry leased by a worker that is sending it
+    DELIVERED = "delivered"
+    FAILED = "failed"
+
+
 class TrackingEvent(Base):
     """
     Tracking event model.
     
     Records tracking events sent to external systems (VBLOG/Brudam)
-    for a specific CTe document.
+    for a specific CTe document, along with the delivery outcome.
     
     Relationships:
         - client_cte: Parent CTe document
     """
     __tablename__ = "tracking_events"
+    __table_args__ = (
+        # Keyset pagination of a CTe's events by (event_date, id)
+        Index("ix_tracking_events_client_cte_id_event_date_id", "client_cte_id", "event_date", "id"),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
@@ -76,12 +88,53 @@ class TrackingEvent(Base):
         nullable=False,
     )
 
+    # Delivery to Brudam (filled by the outbox worker or inline sends)
+    delivery_status: Mapped[Optional[str]] = mapped_column(
+        String(20),
+        nullable=True,
+        index=True,
+        comment="pending | delivered | failed (NULL = recorded before delivery tracking)",
+    )
+
+    delivery_attempts: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        default=0,
+        server_default="0",
+    )
+
+    delivery_latency_ms: Mapped[Optional[float]] = mapped_column(
+        Float,
+        nullable=True,
+        comment="Latency of the last delivery attempt",
+    )
+
+    delivered_at: Mapped[Optional[datetime.datetime]] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+    )
+
+    delivery_response: Mapped[Optional[str]] = mapped_column(
+        Text,
+        nullable=True,
+        comment="Brudam response (or error) of the last attempt, truncated",
+    )
+
     # Relationship
     client_cte: Mapped["ClientCTe"] = relationship(
         "ClientCTe",
         back_populates="tracking_events",
     )
 
+    def record_delivery(self, success: bool, response: Optional[str], latency_ms: Optional[float]) -> None:
+        """Record the outcome of one delivery attempt."""
+        self.delivery_attempts = (self.delivery_attempts or 0) + 1
+        self.delivery_latency_ms = latency_ms
+        self.delivery_response = response[:2000] if response else None
+        if success:
+            self.delivery_status = DeliveryStatus.DELIVERED
+            self.delivered_at = datetime.datetime.now(datetime.timezone.utc)
+
     # Legacy property aliases
     @property
     def cte_cliente_id(self) -> uuid.UUID:
@@ -0,0 +1,116 @@
+# app/models/tracking_outbox.py
+"""
+TrackingOutbox model.
+Pending Brudam tracking deliveries, written in the same transaction as the
+status change and drained by the background outbox worker.
+"""
+
+from __future__ import annotations
+
+import uuid
+import json
+import datetime
+from typing import Optional, List, TYPE_CHECKING
+
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import String, DateTime, ForeignKey, Integer, Text, Index, func
+
+from .base import Base, TimestampMixin
+from .tracking_event import DeliveryStatus
+
+if TYPE_CHECKING:
+    from .tracking_event import TrackingEvent
+
+
+class TrackingOutbox(Base, TimestampMixin):
+    """
+    Tracking outbox entry.
+
+    One row per tracking event to deliver. Attachments are kept as the URLs
+    of the already-saved files and re-read at send time, so no base64 copy
+    is stored in the database.
+
+    Relationships:
+        - tracking_event: Event whose delivery this entry drives
+    """
+    __tablename__ = "tracking_outbox"
+    __table_args__ = (
+        Index("ix_tracking_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        default=uuid.uuid4,
+    )
+
+    tracking_event_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("tracking_events.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+
+    document_key: Mapped[str] = mapped_column(
+        String(60),
+        nullable=False,
+        comment="Document (NF-e) key sent to Brudam",
+    )
+
+    event_code: Mapped[str] = mapped_column(
+        String(10),
+        nullable=False,
+    )
+
+    event_date: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+    )
+
+    attachments_json: Mapped[Optional[str]] = mapped_column(
+        Text,
+        nullable=True,
+        comment="Saved attachment URLs as JSON array",
+    )
+
+    status: Mapped[str] = mapped_column(
+        String(20),
+        nullable=False,
+        default=DeliveryStatus.PENDING,
+    )
+
+    attempts: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        default=0,
+    )
+
+    next_attempt_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+        default=lambda: datetime.datetime.now(datetime.timezone.utc),
+    )
+
+    last_error: Mapped[Optional[str]] = mapped_column(
+        Text,
+        nullable=True,
+    )
+
+    # Relationship
+    tracking_event: Mapped["TrackingEvent"] = relationship("TrackingEvent")
+
+    @property
+    def attachment_urls(self) -> List[str]:
+        """Saved attachment URLs to send with this document."""
+        if not self.attachments_json:
+            return []
+        try:
+            return json.loads(self.attachments_json)
+        except Exception:
+            return []
+
+    @attachment_urls.setter
+    def attachment_urls(self, value: Optional[List[str]]) -> None:
+        self.attachments_json = json.dumps(value) if value else None
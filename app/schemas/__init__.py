@@ -41,6 +41,8 @@ from .user import (
     UserCreate,
     UserRead,
 )
+from .sync_job import SyncJobRead
+from .invoice import InvoiceLookupRead, InvoiceLookupRequest, InvoiceLookupResult
 
 __all__ = [
     # Shipment
@@ -78,5 +80,12 @@ __all__ = [
     # User
     "UserCreate",
     "UserRead",
-    
+
+    # Sync jobs
+    "SyncJobRead",
+
+    # Invoices
+    "InvoiceLookupRead",
+    "InvoiceLookupRequest",
+    "InvoiceLookupResult",
 ]
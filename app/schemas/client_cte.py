@@ -4,7 +4,7 @@ ClientCTe schemas (formerly cte_cliente.py).
 Pydantic models for client CTe API endpoints.
 """
 
-from pydantic import BaseModel, Field
+from pydantic import AliasChoices, BaseModel, Field
 from typing import Optional, List, Any
 import uuid
 
@@ -45,7 +45,8 @@ class ClientCTeRead(ClientCTeBase):
     """Schema for reading a client CTe."""
     id: uuid.UUID
     shipment_id: uuid.UUID = Field(..., alias="carga_id")
-    xml: Optional[str] = None
+    # Read from `loaded_xml`: only filled when the query loaded (and resolved) the XML document
+    xml: Optional[str] = Field(None, validation_alias=AliasChoices("loaded_xml", "xml"))
     invoices: Optional[List[InvoiceSchema]] = Field(None, alias="nfs")
 
     class Config:
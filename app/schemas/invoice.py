@@ -0,0 +1,33 @@
+# app/schemas/invoice.py
+"""
+Invoice schemas.
+Pydantic models for NF-e reverse lookup endpoints.
+"""
+
+from pydantic import BaseModel, Field
+from typing import List
+import datetime
+import uuid
+
+from .client_cte import InvoiceStatusSchema
+
+
+class InvoiceLookupRead(BaseModel):
+    """Where an NF-e is carried: its CTe, shipment and current status."""
+    nfe_key: str
+    cte_id: uuid.UUID
+    cte_access_key: str
+    shipment_id: uuid.UUID
+    status: InvoiceStatusSchema
+    updated_at: datetime.datetime
+
+
+class InvoiceLookupRequest(BaseModel):
+    """Batch of NF-e keys to resolve."""
+    keys: List[str] = Field(..., min_length=1, max_length=1000)
+
+
+class InvoiceLookupResult(BaseModel):
+    """Batch lookup result; an NF-e carried by several CTes appears once per CTe."""
+    found: List[InvoiceLookupRead]
+    missing: List[str]
@@ -5,10 +5,12 @@ Pydantic models for shipment API endpoints.
 """
 
 from pydantic import BaseModel, Field
-from typing import Optional, List, Any
+from typing import Optional, List
 import uuid
 
 from app.models.shipment import ShipmentStatus
+from .client_cte import ClientCTeRead
+from .subcontracted_cte import SubcontractedCTeRead
 
 
 class StateInfo(BaseModel):
@@ -63,9 +65,9 @@ class ShipmentRead(ShipmentBase):
     id: uuid.UUID
     status: ShipmentStatus
 
-    # Relationships - imported here to avoid circular imports
-    client_ctes: List[Any] = Field(default_factory=list, alias="ctes_cliente")
-    subcontracted_ctes: List[Any] = Field(default_factory=list, alias="ctes_subcontratacao")
+    # Relationships
+    client_ctes: List[ClientCTeRead] = Field(default_factory=list, alias="ctes_cliente")
+    subcontracted_ctes: List[SubcontractedCTeRead] = Field(default_factory=list, alias="ctes_subcontratacao")
 
     class Config:
         from_attributes = True
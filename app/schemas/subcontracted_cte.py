@@ -4,7 +4,7 @@ SubcontractedCTe schemas (formerly cte_subcontratacao.py).
 Pydantic models for subcontracted CTe API endpoints.
 """
 
-from pydantic import BaseModel, Field
+from pydantic import AliasChoices, BaseModel, Field
 from typing import Optional, List, Dict
 import uuid
 
@@ -26,7 +26,8 @@ class SubcontractedCTeRead(SubcontractedCTeBase):
     """Schema for reading a subcontracted CTe."""
     id: uuid.UUID
     shipment_id: uuid.UUID = Field(..., alias="carga_id")
-    xml: Optional[str] = None
+    # Read from `loaded_xml`: only filled when the query loaded (and resolved) the XML document
+    xml: Optional[str] = Field(None, validation_alias=AliasChoices("loaded_xml", "xml"))
 
     # VBLOG status fields
     vblog_status_code: Optional[str] = None
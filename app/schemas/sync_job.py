@@ -0,0 +1,29 @@
+# app/schemas/sync_job.py
+"""
+SyncJob schemas.
+Pydantic models for background shipment sync job endpoints.
+"""
+
+from pydantic import BaseModel
+from typing import Optional, Dict, List
+import datetime
+import uuid
+
+
+class SyncJobRead(BaseModel):
+    """Schema for reading a sync job's status."""
+    id: uuid.UUID
+    trigger: str
+    dry_run: bool
+    status: str
+    stage: Optional[str] = None
+    counts: Optional[Dict[str, int]] = None
+    timings: Optional[Dict[str, float]] = None
+    errors: Optional[List[str]] = None
+    warnings: Optional[List[str]] = None
+    started_at: Optional[datetime.datetime] = None
+    finished_at: Optional[datetime.datetime] = None
+    created_at: Optional[datetime.datetime] = None
+
+    class Config:
+        from_attributes = True
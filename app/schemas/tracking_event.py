@@ -30,6 +30,10 @@ class TrackingEventCreate(TrackingEventBase):
 class TrackingEventRead(TrackingEventBase):
     """Schema for reading a tracking event."""
     id: uuid.UUID
+    delivery_status: Optional[str] = None
+    delivery_attempts: int = 0
+    delivery_latency_ms: Optional[float] = None
+    delivered_at: Optional[datetime.datetime] = None
 
     class Config:
         from_attributes = True
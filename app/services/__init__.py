@@ -7,9 +7,12 @@ Contains business logic and external integrations.
 # Services
 from .shipment_service import ShipmentService
 from .client_cte_service import ClientCTeService
+from .invoice_service import InvoiceService
+from .cte_document_service import CTeDocumentService
 from .tracking_event_service import TrackingEventService
 from .location_service import LocationService
 from .attachments_service import AttachmentService
+from .xml_storage_service import XMLStorageService
 from .crypto_service import encrypt_text, decrypt_text
 
 # VBLOG services
@@ -24,9 +27,12 @@ from .vblog import (
 __all__ = [
     "ShipmentService",
     "ClientCTeService",
+    "InvoiceService",
+    "CTeDocumentService",
     "TrackingEventService",
     "LocationService",
     "AttachmentService",
+    "XMLStorageService",
     "encrypt_text",
     "decrypt_text",
     
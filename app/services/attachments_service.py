@@ -1,12 +1,54 @@
+import asyncio
 import base64
 import os
 import uuid
 from pathlib import Path
-from typing import Optional
+from typing import AsyncIterable, AsyncIterator, BinaryIO, Optional
 
 from app.config.settings import settings
 
 
+# Raw bytes per base64 chunk; a multiple of 3 so chunks concatenate cleanly
+BASE64_READ_CHUNK = 3 * 64 * 1024
+
+
+def _read_base64_chunk(f: BinaryIO, chunk_size: int) -> bytes:
+    return base64.b64encode(f.read(chunk_size))
+
+
+class AttachmentRef:
+    """Reference to a saved attachment file.
+
+    Tracking payloads carry the reference instead of a base64 copy; the
+    base64 text is streamed from disk when the request body is sent, so one
+    file shared by many documents is never held in memory per document.
+    """
+
+    __slots__ = ("url", "path", "size")
+
+    def __init__(self, url: str, path: str, size: int):
+        self.url = url
+        self.path = path
+        self.size = size
+
+    @property
+    def base64_size(self) -> int:
+        """Length of the base64 encoding of the file."""
+        return 4 * ((self.size + 2) // 3)
+
+    async def aiter_base64(self, chunk_size: int = BASE64_READ_CHUNK) -> AsyncIterator[bytes]:
+        """Base64 of the file, chunk by chunk; reads and encoding run in a worker thread."""
+        f = await asyncio.to_thread(open, self.path, "rb")
+        try:
+            while chunk := await asyncio.to_thread(_read_base64_chunk, f, chunk_size):
+                yield chunk
+        finally:
+            await asyncio.to_thread(f.close)
+
+    def __repr__(self) -> str:
+        return f"AttachmentRef(url={self.url!r}, size={self.size})"
+
+
 class AttachmentService:
     """Simple local attachment storage service.
 
@@ -29,7 +71,30 @@ class AttachmentService:
         with open(path, "wb") as f:
             f.write(data)
         url = f"{self.base_url.rstrip('/')}/{filename}"
-        return {"url": url, "path": str(path), "filename": filename}
+        return {"url": url, "path": str(path), "filename": filename, "size": len(data)}
+
+    async def save_stream(self, chunks: AsyncIterable[bytes], original_name: Optional[str] = None) -> dict:
+        """Write an async byte stream to disk chunk by chunk (file I/O in a worker thread); metadata includes the size."""
+        filename = self._make_filename(original_name)
+        path = self.storage_dir / filename
+        size = 0
+        f = await asyncio.to_thread(open, path, "wb")
+        try:
+            async for chunk in chunks:
+                await asyncio.to_thread(f.write, chunk)
+                size += len(chunk)
+        finally:
+            await asyncio.to_thread(f.close)
+        url = f"{self.base_url.rstrip('/')}/{filename}"
+        return {"url": url, "path": str(path), "filename": filename, "size": size}
+
+    @staticmethod
+    def to_ref(saved: dict) -> AttachmentRef:
+        """AttachmentRef for a file returned by save_file/save_base64/save_stream."""
+        size = saved.get("size")
+        if size is None:
+            size = os.path.getsize(saved["path"])
+        return AttachmentRef(url=saved["url"], path=saved["path"], size=size)
 
     def save_base64(self, b64: str, original_name: Optional[str] = None) -> dict:
         data = base64.b64decode(b64)
@@ -39,7 +104,7 @@ class AttachmentService:
         with open(path, "rb") as f:
             return base64.b64encode(f.read()).decode()
 
-    def get_base64_from_url(self, url: str) -> Optional[str]:
+    def _local_path(self, url: str) -> Optional[Path]:
         # only supports local urls from ATTACHMENT_BASE_URL
         if not url.startswith(self.base_url.rstrip('/')) and self.base_url != "/":
             # try with slash normalized
@@ -49,4 +114,17 @@ class AttachmentService:
         p = self.storage_dir / filename
         if not p.exists():
             return None
+        return p
+
+    def get_base64_from_url(self, url: str) -> Optional[str]:
+        p = self._local_path(url)
+        if p is None:
+            return None
         return self.get_base64_from_path(str(p))
+
+    def get_ref_from_url(self, url: str) -> Optional[AttachmentRef]:
+        """AttachmentRef for a previously saved local file (None if missing)."""
+        p = self._local_path(url)
+        if p is None:
+            return None
+        return AttachmentRef(url=url, path=str(p), size=p.stat().st_size)
@@ -4,18 +4,28 @@ ClientCTe service (formerly cte_cliente_service.py).
 CRUD operations for client CTe documents using async SQLAlchemy.
 """
 
+import datetime
 from uuid import UUID
-from typing import Optional, List
+from typing import Optional, List, Dict, Iterable, Tuple
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, func, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import selectinload, load_only, raiseload
 
-from app.models.client_cte import ClientCTe
+from app.models.client_cte import ClientCTe, InvoiceStatus
 from app.schemas.client_cte import ClientCTeCreate
 from app.utils.logger import logger
 
 
+# Dialects with native INSERT ... ON CONFLICT support
+UPSERT_INSERTS = {
+    "postgresql": pg_insert,
+    "sqlite": sqlite_insert,
+}
+
+
 class ClientCTeService:
     """Service for client CTe CRUD operations."""
 
@@ -30,7 +40,7 @@ class ClientCTeService:
             shipment_id=shipment_id,
             access_key=data.access_key,
         )
-        cte.xml = data.xml  # Triggers encryption
+        await cte.write_xml(data.xml)  # Encrypted (off the loop when large)
         db.add(cte)
         await db.commit()
         await db.refresh(cte)
@@ -48,14 +58,32 @@ class ClientCTeService:
         return list(result.scalars().all())
 
     @staticmethod
-    async def get_by_id(db: AsyncSession, cte_id: UUID) -> Optional[ClientCTe]:
-        """Get client CTe by ID."""
-        result = await db.execute(
+    async def get_by_id(
+        db: AsyncSession,
+        cte_id: UUID,
+        include_xml: bool = False,
+    ) -> Optional[ClientCTe]:
+        """Get client CTe by ID (its XML document is loaded only if include_xml)."""
+        query = (
             select(ClientCTe)
             .options(selectinload(ClientCTe.tracking_events))
             .where(ClientCTe.id == cte_id)
         )
-        return result.scalar_one_or_none()
+        if include_xml:
+            query = query.options(selectinload(ClientCTe.document))
+        result = await db.execute(query)
+        cte = result.scalar_one_or_none()
+        if cte is not None and include_xml:
+            await cte.resolve_xml()
+        return cte
+
+    @staticmethod
+    async def exists(db: AsyncSession, cte_id: UUID) -> bool:
+        """Check a client CTe exists without loading it."""
+        result = await db.execute(
+            select(ClientCTe.id).where(ClientCTe.id == cte_id).limit(1)
+        )
+        return result.scalar_one_or_none() is not None
 
     @staticmethod
     async def get_by_access_key(
@@ -70,6 +98,115 @@ class ClientCTeService:
         )
         return result.scalar_one_or_none()
 
+    @staticmethod
+    async def get_many_by_access_keys(
+        db: AsyncSession,
+        access_keys: Iterable[str],
+        chunk_size: int = 500,
+    ) -> Dict[str, ClientCTe]:
+        """
+        Resolve many access keys at once into an access_key -> ClientCTe map.
+
+        Issues one `IN (...)` query per `chunk_size` keys and loads only the
+        columns the sync pipeline needs; XML and tracking events are not read.
+        Keys without a stored CTe are simply absent from the map.
+        """
+        keys = list(dict.fromkeys(access_keys))
+        found: Dict[str, ClientCTe] = {}
+
+        for start in range(0, len(keys), chunk_size):
+            chunk = keys[start:start + chunk_size]
+            result = await db.execute(
+                select(ClientCTe)
+                .options(
+                    load_only(
+                        ClientCTe.id,
+                        ClientCTe.shipment_id,
+                        ClientCTe.access_key,
+                        ClientCTe.invoices_json,
+                        ClientCTe.content_hash,
+                        ClientCTe.ingested_at,
+                    ),
+                    raiseload(ClientCTe.tracking_events),
+                )
+                .where(ClientCTe.access_key.in_(chunk))
+            )
+            for cte in result.scalars():
+                found[cte.access_key] = cte
+
+        return found
+
+    @staticmethod
+    async def upsert_many(db: AsyncSession, rows: List[dict]) -> Dict[str, Tuple[UUID, UUID]]:
+        """
+        Insert or update many client CTes keyed by access_key.
+
+        Each row carries id, shipment_id, access_key, content_hash and
+        ingested_at. On conflict those are replaced only when the row
+        provides them; id and shipment_id are never changed. Invoices and XML
+        documents are written separately (InvoiceService.replace_keys,
+        CTeDocumentService.upsert_for_client_ctes).
+        Uses ON CONFLICT (access_key) ... RETURNING on PostgreSQL/SQLite and
+        falls back to ORM writes elsewhere. Does not commit.
+
+        Returns access_key -> (id, shipment_id) of the stored rows, which
+        differ from the given ones when the key already existed (e.g. a
+        concurrent sync inserted it first).
+        """
+        if not rows:
+            return {}
+
+        update_columns = [c for c in rows[0] if c not in ("id", "shipment_id", "access_key")]
+
+        dialect = db.get_bind().dialect.name
+        if dialect in UPSERT_INSERTS:
+            table = ClientCTe.__table__
+            stmt = UPSERT_INSERTS[dialect](ClientCTe)
+            set_ = {
+                column: func.coalesce(stmt.excluded[column], table.c[column])
+                for column in update_columns
+            }
+            set_["updated_at"] = func.now()
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.access_key],
+                set_=set_,
+            ).returning(ClientCTe.access_key, ClientCTe.id, ClientCTe.shipment_id)
+            result = await db.execute(stmt, rows)
+            return {access_key: (cte_id, shipment_id) for access_key, cte_id, shipment_id in result.all()}
+
+        existing = await ClientCTeService.get_many_by_access_keys(
+            db, [row["access_key"] for row in rows]
+        )
+        stored = {}
+        for row in rows:
+            cte = existing.get(row["access_key"])
+            if cte is None:
+                db.add(ClientCTe(**row))
+                stored[row["access_key"]] = (row["id"], row["shipment_id"])
+                continue
+            for column in update_columns:
+                if row[column] is not None:
+                    setattr(cte, column, row[column])
+            stored[row["access_key"]] = (cte.id, cte.shipment_id)
+        await db.flush()
+        return stored
+
+    @staticmethod
+    async def mark_ingested(
+        db: AsyncSession,
+        access_keys: List[str],
+        at: Optional[datetime.datetime] = None,
+    ) -> None:
+        """Stamp ingested_at on CTes whose stored XML is already current. Does not commit."""
+        if not access_keys:
+            return
+        await db.execute(
+            update(ClientCTe)
+            .where(ClientCTe.access_key.in_(access_keys))
+            .values(ingested_at=at or datetime.datetime.now(datetime.timezone.utc))
+            .execution_options(synchronize_session=False)
+        )
+
     @staticmethod
     async def update_xml(
         db: AsyncSession,
@@ -77,7 +214,7 @@ class ClientCTeService:
         xml: str,
     ) -> ClientCTe:
         """Update CTe XML (encrypted)."""
-        cte.xml = xml
+        await cte.write_xml(xml)
         await db.commit()
         await db.refresh(cte)
         logger.info(f"Updated XML for CTe: {cte.access_key}")
@@ -91,10 +228,10 @@ class ClientCTeService:
     ) -> ClientCTe:
         """
         Update associated NF-e invoices.
-        Accepts list of keys - they will be converted to new format with default status.
+        Accepts list of keys; invoices already on the CTe keep their status,
+        new keys get the default status.
         """
-        # The invoices setter now handles migration to new format
-        cte.invoices = invoice_keys
+        cte.invoices = InvoiceStatus.merge(cte.invoices, invoice_keys)
         await db.commit()
         await db.refresh(cte)
         logger.info(f"Updated invoices for CTe: {cte.access_key} ({len(invoice_keys)} invoices)")
@@ -1,14 +1,20 @@
 # app/services/crypto_service.py
 import os
-from typing import Optional
+import base64
+import struct
+import zlib
+from typing import Dict, Optional
 
 # cryptography is optional during tests (if not installed, crypto becomes a noop)
 try:
     from cryptography.fernet import Fernet, InvalidToken  # type: ignore
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM  # type: ignore
+    from cryptography.exceptions import InvalidTag  # type: ignore
     _HAS_FERNET = True
 except Exception:
     Fernet = None
-    InvalidToken = Exception
+    AESGCM = None
+    InvalidToken = InvalidTag = Exception
     _HAS_FERNET = False
 
 from app.config.settings import settings
@@ -24,7 +30,42 @@ else:
     fernet = None
 
 
-def encrypt_text(plain: Optional[str]) -> Optional[str]:
+def _load_aesgcm_keys(spec: Optional[str]) -> Dict[int, "AESGCM"]:
+    """Parse AESGCM_KEYS ("id:base64key,..."), preserving order (first = active)."""
+    keys: Dict[int, AESGCM] = {}
+    for item in (spec or "").split(","):
+        if not item.strip():
+            continue
+        key_id, _, encoded = item.strip().partition(":")
+        key = base64.urlsafe_b64decode(encoded.strip())
+        if len(key) != 32:
+            raise RuntimeError(f"AESGCM key {key_id} must be 32 bytes (AES-256)")
+        keys[int(key_id)] = AESGCM(key)
+    return keys
+
+
+aesgcm_keys = _load_aesgcm_keys(settings.aesgcm_keys) if _HAS_FERNET else {}
+ACTIVE_AESGCM_KEY_ID: Optional[int] = next(iter(aesgcm_keys), None)
+
+if _HAS_FERNET and settings.xml_cipher == "aesgcm" and ACTIVE_AESGCM_KEY_ID is None:
+    raise RuntimeError("XML_CIPHER=aesgcm requer AESGCM_KEYS configuradas no ambiente (.env)")
+
+
+# Stored-format header for zlib-compressed payloads ("z1:" + Fernet token).
+# Tokens without a header are legacy uncompressed Fernet tokens.
+COMPRESSED_PREFIX = "z1:"
+
+
+def is_compressed(token: Optional[str]) -> bool:
+    """Whether a stored token uses the compressed format."""
+    return bool(token) and token.startswith(COMPRESSED_PREFIX)
+
+
+def encrypt_text(plain: Optional[str], compress: bool = False) -> Optional[str]:
+    """
+    Encrypt text with Fernet. With compress=True the UTF-8 bytes are
+    zlib-compressed first and the token is stored with the "z1:" header.
+    """
     if plain is None:
         return None
     if plain == "":
@@ -32,11 +73,16 @@ def encrypt_text(plain: Optional[str]) -> Optional[str]:
     if fernet is None:
         # fallback: return plain text when crypto unavailable (test-only behavior)
         return plain
-    token = fernet.encrypt(plain.encode("utf-8"))
+    data = plain.encode("utf-8")
+    if compress:
+        data = zlib.compress(data, settings.xml_compress_level)
+        return COMPRESSED_PREFIX + fernet.encrypt(data).decode("utf-8")
+    token = fernet.encrypt(data)
     return token.decode("utf-8")
 
 
 def decrypt_text(token: Optional[str]) -> Optional[str]:
+    """Decrypt a stored token (compressed or legacy format)."""
     if token is None:
         return None
     if token == "":
@@ -45,8 +91,49 @@ def decrypt_text(token: Optional[str]) -> Optional[str]:
         # fallback: return token unchanged when crypto unavailable (test-only behavior)
         return token
     try:
+        if is_compressed(token):
+            data = fernet.decrypt(token[len(COMPRESSED_PREFIX):].encode("utf-8"))
+            return zlib.decompress(data).decode("utf-8")
         plain = fernet.decrypt(token.encode("utf-8"))
         return plain.decode("utf-8")
-    except InvalidToken:
+    except (InvalidToken, zlib.error):
         # aqui você pode logar erro, gerar alerta etc.
         return None
+
+
+# Binary AES-GCM envelope:
+#   version (1) | flags (1) | key id (1) | nonce (12) | ciphertext + tag (16)
+# The 15-byte header is authenticated as associated data.
+ENVELOPE_VERSION = 1
+ENVELOPE_FLAG_ZLIB = 0x01
+_ENVELOPE_HEADER = struct.Struct(">BBB12s")
+
+
+def encrypt_envelope(plain: Optional[str], compress: bool = False) -> Optional[bytes]:
+    """Encrypt text into an AES-GCM envelope with the active key (zlib first if compress)."""
+    if plain is None:
+        return None
+    data = plain.encode("utf-8")
+    flags = 0
+    if compress:
+        data = zlib.compress(data, settings.xml_compress_level)
+        flags |= ENVELOPE_FLAG_ZLIB
+    header = _ENVELOPE_HEADER.pack(ENVELOPE_VERSION, flags, ACTIVE_AESGCM_KEY_ID, os.urandom(12))
+    return header + aesgcm_keys[ACTIVE_AESGCM_KEY_ID].encrypt(header[3:], data, header)
+
+
+def decrypt_envelope(blob: Optional[bytes]) -> Optional[str]:
+    """Decrypt an AES-GCM envelope (any configured key id). None if it cannot be opened."""
+    if blob is None:
+        return None
+    try:
+        version, flags, key_id, nonce = _ENVELOPE_HEADER.unpack_from(blob)
+        if version != ENVELOPE_VERSION or key_id not in aesgcm_keys:
+            return None
+        header = bytes(blob[:_ENVELOPE_HEADER.size])
+        data = aesgcm_keys[key_id].decrypt(nonce, bytes(blob[_ENVELOPE_HEADER.size:]), header)
+        if flags & ENVELOPE_FLAG_ZLIB:
+            data = zlib.decompress(data)
+        return data.decode("utf-8")
+    except (InvalidTag, struct.error, zlib.error):
+        return None
@@ -0,0 +1,65 @@
+# app/services/cte_document_service.py
+"""
+CTeDocument service.
+Bulk writes of encrypted CTe XML documents (cte_documents table).
+"""
+
+import uuid
+from uuid import UUID
+from typing import Dict
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+
+from app.models.cte_document import CTeDocument
+from app.services.client_cte_service import UPSERT_INSERTS
+
+
+class CTeDocumentService:
+    """Service for CTe XML documents."""
+
+    @staticmethod
+    async def upsert_for_client_ctes(db: AsyncSession, stored_by_cte: Dict[UUID, dict]) -> None:
+        """
+        Insert or replace the XML document of many client CTes.
+
+        `stored_by_cte` maps client CTe id -> encoded XML columns
+        (CTeDocument.encode_xml). Uses one ON CONFLICT (client_cte_id)
+        upsert on PostgreSQL/SQLite and falls back to ORM writes elsewhere.
+        Does not commit.
+        """
+        if not stored_by_cte:
+            return
+
+        rows = [
+            {"id": uuid.uuid4(), "client_cte_id": cte_id, **stored}
+            for cte_id, stored in stored_by_cte.items()
+        ]
+
+        dialect = db.get_bind().dialect.name
+        if dialect in UPSERT_INSERTS:
+            stmt = UPSERT_INSERTS[dialect](CTeDocument)
+            set_ = {column: stmt.excluded[column] for column in rows[0] if column not in ("id", "client_cte_id")}
+            set_["updated_at"] = func.now()
+            await db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[CTeDocument.__table__.c.client_cte_id],
+                    set_=set_,
+                ),
+                rows,
+            )
+            return
+
+        result = await db.execute(
+            select(CTeDocument).where(CTeDocument.client_cte_id.in_(list(stored_by_cte)))
+        )
+        existing = {document.client_cte_id: document for document in result.scalars()}
+        for row in rows:
+            document = existing.get(row["client_cte_id"])
+            if document is None:
+                db.add(CTeDocument(**row))
+                continue
+            for column, value in row.items():
+                if column not in ("id", "client_cte_id"):
+                    setattr(document, column, value)
+        await db.flush()
@@ -0,0 +1,227 @@
+# app/services/invoice_service.py
+"""
+Invoice service.
+Bulk maintenance of the invoices table (NF-e membership and status per CTe).
+"""
+
+import datetime
+import json
+from uuid import UUID
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, update, delete, exists, and_, or_
+
+from app.models.client_cte import ClientCTe, InvoiceStatus
+from app.models.invoice import Invoice
+from app.services.client_cte_service import UPSERT_INSERTS
+from app.utils.logger import logger
+
+
+# CTes per DELETE statement (keeps the OR-ed WHERE clause small)
+DELETE_CHUNK = 100
+
+# NF-e keys per IN (...) lookup query
+LOOKUP_CHUNK = 500
+
+
+class InvoiceService:
+    """Service for invoice rows of client CTes."""
+
+    @staticmethod
+    async def replace_keys(db: AsyncSession, keys_by_cte: Dict[UUID, List[str]]) -> None:
+        """
+        Make each CTe's invoices match its NF-e key list (in XML order).
+
+        Keys no longer listed are deleted; new keys are inserted with the
+        default status; invoices that stay keep their status and only get
+        their position updated. Uses one DELETE and one upsert for all CTes.
+        Does not commit.
+        """
+        if not keys_by_cte:
+            return
+
+        items = list(keys_by_cte.items())
+        for start in range(0, len(items), DELETE_CHUNK):
+            await db.execute(
+                delete(Invoice)
+                .where(
+                    or_(*(
+                        and_(Invoice.cte_id == cte_id, Invoice.nfe_key.not_in(keys))
+                        if keys else Invoice.cte_id == cte_id
+                        for cte_id, keys in items[start:start + DELETE_CHUNK]
+                    ))
+                )
+                .execution_options(synchronize_session=False)
+            )
+
+        rows = [
+            {
+                "cte_id": cte_id,
+                "nfe_key": key,
+                "status_code": InvoiceStatus.DEFAULT_CODE,
+                "position": position,
+            }
+            for cte_id, keys in keys_by_cte.items()
+            for position, key in enumerate(dict.fromkeys(keys))
+        ]
+        if not rows:
+            return
+
+        dialect = db.get_bind().dialect.name
+        if dialect in UPSERT_INSERTS:
+            stmt = UPSERT_INSERTS[dialect](Invoice)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Invoice.cte_id, Invoice.nfe_key],
+                set_={"position": stmt.excluded.position},
+            )
+            await db.execute(stmt, rows)
+            return
+
+        result = await db.execute(
+            select(Invoice).where(Invoice.cte_id.in_(list(keys_by_cte)))
+        )
+        existing = {(row.cte_id, row.nfe_key): row for row in result.scalars()}
+        for row in rows:
+            invoice = existing.get((row["cte_id"], row["nfe_key"]))
+            if invoice is None:
+                db.add(Invoice(**row))
+            else:
+                invoice.position = row["position"]
+        await db.flush()
+
+    @staticmethod
+    async def backfill_legacy(db: AsyncSession, cte_ids: List[UUID]) -> List[UUID]:
+        """
+        Move the invoices_json of CTes that have no invoice rows yet (databases
+        built without the 0009 backfill) into the invoices table, keeping each
+        NF-e's status, and clear the JSON. Does not commit.
+        Returns the IDs of the CTes moved over.
+        """
+        if not cte_ids:
+            return []
+
+        result = await db.execute(
+            select(ClientCTe.id, ClientCTe.invoices_json)
+            .where(
+                ClientCTe.id.in_(cte_ids),
+                ClientCTe.invoices_json.is_not(None),
+                ClientCTe.invoices_json != "",
+                ~exists().where(Invoice.cte_id == ClientCTe.id),
+            )
+        )
+        legacy = result.all()
+        if not legacy:
+            return []
+
+        rows = []
+        for cte_id, value in legacy:
+            try:
+                invoices = InvoiceStatus.migrate_legacy(json.loads(value))
+            except (ValueError, TypeError):
+                logger.warning(f"CTe {cte_id}: unreadable invoices_json left as is")
+                continue
+            by_key = {inv["key"]: inv for inv in invoices if inv.get("key")}
+            rows.extend(
+                {
+                    "cte_id": cte_id,
+                    "nfe_key": key,
+                    "status_code": str(inv["status"]["code"]),
+                    "position": position,
+                }
+                for position, (key, inv) in enumerate(by_key.items())
+            )
+
+        if rows:
+            await db.execute(insert(Invoice), rows)
+        moved = list(dict.fromkeys(row["cte_id"] for row in rows))
+        if moved:
+            await db.execute(
+                update(ClientCTe)
+                .where(ClientCTe.id.in_(moved))
+                .values(invoices_json=None)
+                .execution_options(synchronize_session=False)
+            )
+        return moved
+
+    @staticmethod
+    async def update_status(
+        db: AsyncSession,
+        cte_ids: List[UUID],
+        nfe_keys: Optional[List[str]],
+        status_code: str,
+    ) -> List[Tuple[UUID, str]]:
+        """
+        Set the status of the given NF-es (all when `nfe_keys` is empty) of
+        the given CTes with a single UPDATE. CTes still on the legacy
+        invoices_json are moved into the invoices table first. Does not commit.
+
+        Returns:
+            (cte_id, nfe_key) of each updated invoice, in cte_ids then XML order
+        """
+        if not cte_ids:
+            return []
+
+        await InvoiceService.backfill_legacy(db, cte_ids)
+
+        stmt = (
+            update(Invoice)
+            .where(Invoice.cte_id.in_(cte_ids))
+            .values(
+                status_code=status_code,
+                updated_at=datetime.datetime.now(datetime.timezone.utc),
+            )
+            .returning(Invoice.cte_id, Invoice.nfe_key, Invoice.position)
+        )
+        if nfe_keys:
+            stmt = stmt.where(Invoice.nfe_key.in_(nfe_keys))
+
+        result = await db.execute(stmt)
+        order = {cte_id: index for index, cte_id in enumerate(cte_ids)}
+        updated = sorted(result.all(), key=lambda row: (order[row.cte_id], row.position))
+
+        logger.info(f"Updated status to {status_code} for {len(updated)} invoice(s)")
+        return [(row.cte_id, row.nfe_key) for row in updated]
+
+    @staticmethod
+    async def lookup(db: AsyncSession, nfe_keys: Iterable[str]) -> List[dict]:
+        """
+        Resolve NF-e keys to the CTes (and shipments) carrying them.
+
+        One `IN (...)` query per LOOKUP_CHUNK keys, served by the
+        (nfe_key, cte_id, status_code) index plus a primary-key probe on
+        client_ctes per match. Keys not found are simply absent.
+
+        Returns:
+            Dicts with nfe_key, cte_id, cte_access_key, shipment_id, status
+            and updated_at, in input key order
+        """
+        keys = list(dict.fromkeys(nfe_keys))
+        found: Dict[str, List[dict]] = {}
+
+        for start in range(0, len(keys), LOOKUP_CHUNK):
+            chunk = keys[start:start + LOOKUP_CHUNK]
+            result = await db.execute(
+                select(
+                    Invoice.nfe_key,
+                    Invoice.cte_id,
+                    Invoice.status_code,
+                    Invoice.updated_at,
+                    ClientCTe.access_key,
+                    ClientCTe.shipment_id,
+                )
+                .join(ClientCTe, ClientCTe.id == Invoice.cte_id)
+                .where(Invoice.nfe_key.in_(chunk))
+                .order_by(Invoice.nfe_key, ClientCTe.access_key)
+            )
+            for row in result:
+                found.setdefault(row.nfe_key, []).append({
+                    "nfe_key": row.nfe_key,
+                    "cte_id": row.cte_id,
+                    "cte_access_key": row.access_key,
+                    "shipment_id": row.shipment_id,
+                    "status": InvoiceStatus.create(row.nfe_key, row.status_code)["status"],
+                    "updated_at": row.updated_at,
+                })
+
+        return [match for key in keys for match in found.get(key, [])]
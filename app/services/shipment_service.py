@@ -4,18 +4,41 @@ Shipment service (formerly carga_service.py).
 CRUD operations for shipments using async SQLAlchemy.
 """
 
+import uuid
 from uuid import UUID
 from typing import Optional, List
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, insert, delete
 from sqlalchemy.orm import selectinload
 
 from app.models.shipment import Shipment
+from app.models.client_cte import ClientCTe
+from app.models.subcontracted_cte import SubcontractedCTe
+from app.models.cte_document import resolve_xml_documents
 from app.schemas.shipment import ShipmentCreate, ShipmentUpdate
 from app.utils.logger import logger
 
 
+def _cte_options(include_xml: bool = False) -> list:
+    """Eager-load the shipment's CTes; their XML documents only on request."""
+    client_ctes = selectinload(Shipment.client_ctes)
+    subcontracted_ctes = selectinload(Shipment.subcontracted_ctes)
+    if include_xml:
+        client_ctes = client_ctes.selectinload(ClientCTe.document)
+        subcontracted_ctes = subcontracted_ctes.selectinload(SubcontractedCTe.document)
+    return [client_ctes, subcontracted_ctes]
+
+
+async def _resolve_cte_xml(shipments: List[Shipment]) -> None:
+    """Decrypt the loaded CTe XML of `shipments` off the event loop."""
+    await resolve_xml_documents(
+        cte
+        for shipment in shipments
+        for cte in (*shipment.client_ctes, *shipment.subcontracted_ctes)
+    )
+
+
 class ShipmentService:
     """Service for shipment CRUD operations."""
 
@@ -30,39 +53,63 @@ class ShipmentService:
         return shipment
 
     @staticmethod
-    async def list_all(db: AsyncSession) -> List[Shipment]:
-        """List all shipments with relationships."""
+    async def create_many(db: AsyncSession, count: int) -> List[UUID]:
+        """
+        Insert `count` empty shipments in one executemany statement.
+        Does not commit; runs inside the caller's transaction.
+        Returns the new shipment IDs.
+        """
+        if count <= 0:
+            return []
+        ids = [uuid.uuid4() for _ in range(count)]
+        await db.execute(insert(Shipment), [{"id": shipment_id} for shipment_id in ids])
+        return ids
+
+    @staticmethod
+    async def delete_many(db: AsyncSession, shipment_ids: List[UUID]) -> None:
+        """Delete shipments by ID in one statement. Does not commit."""
+        if not shipment_ids:
+            return
+        await db.execute(
+            delete(Shipment)
+            .where(Shipment.id.in_(shipment_ids))
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    async def list_all(db: AsyncSession, include_xml: bool = False) -> List[Shipment]:
+        """List all shipments with relationships (CTe XML only if include_xml)."""
         result = await db.execute(
-            select(Shipment)
-            .options(
-                selectinload(Shipment.client_ctes),
-                selectinload(Shipment.subcontracted_ctes),
-            )
+            select(Shipment).options(*_cte_options(include_xml))
         )
-        return list(result.scalars().all())
+        shipments = list(result.scalars().all())
+        if include_xml:
+            await _resolve_cte_xml(shipments)
+        return shipments
 
     @staticmethod
-    async def get_by_id(db: AsyncSession, shipment_id: UUID) -> Optional[Shipment]:
-        """Get shipment by ID with relationships."""
+    async def get_by_id(
+        db: AsyncSession,
+        shipment_id: UUID,
+        include_xml: bool = False,
+    ) -> Optional[Shipment]:
+        """Get shipment by ID with relationships (CTe XML only if include_xml)."""
         result = await db.execute(
             select(Shipment)
-            .options(
-                selectinload(Shipment.client_ctes),
-                selectinload(Shipment.subcontracted_ctes),
-            )
+            .options(*_cte_options(include_xml))
             .where(Shipment.id == shipment_id)
         )
-        return result.scalar_one_or_none()
+        shipment = result.scalar_one_or_none()
+        if shipment is not None and include_xml:
+            await _resolve_cte_xml([shipment])
+        return shipment
 
     @staticmethod
     async def get_by_external_id(db: AsyncSession, external_id: str) -> Optional[Shipment]:
         """Get shipment by external ID."""
         result = await db.execute(
             select(Shipment)
-            .options(
-                selectinload(Shipment.client_ctes),
-                selectinload(Shipment.subcontracted_ctes),
-            )
+            .options(*_cte_options())
             .where(Shipment.external_id == external_id)
         )
         return result.scalar_one_or_none()
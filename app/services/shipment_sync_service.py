@@ -0,0 +1,426 @@
+# app/services/shipment_sync_service.py
+"""
+Shipment sync service.
+VBLOG open-transit synchronization pipeline shared by the sync endpoint
+and the background sync job runner.
+"""
+
+import time
+import uuid
+import datetime
+import xml.etree.ElementTree as ET
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config.settings import settings
+from app.core.cpu_offload import run_cpu
+from app.models.client_cte import ClientCTe
+from app.models.cte_document import CTeDocument
+from app.services.shipment_service import ShipmentService
+from app.services.client_cte_service import ClientCTeService
+from app.services.invoice_service import InvoiceService
+from app.services.cte_document_service import CTeDocumentService
+from app.services.transit_snapshot_service import TransitSnapshotService
+from app.services.vblog.transito import VBlogTransitoService, TransitResponse
+from app.services.vblog.cte import VBlogCTeService
+from app.utils.logger import logger
+
+
+def extract_nfe_keys(cte_xml: Optional[str]) -> list[str]:
+    """Extract NF-e keys from a CTe XML string."""
+    if not cte_xml:
+        return []
+    try:
+        root = ET.fromstring(cte_xml)
+    except Exception:
+        return []
+
+    found: list[str] = []
+    for elem in root.iter():
+        tag = elem.tag.split("}")[-1] if "}" in elem.tag else elem.tag
+        if tag == "chNFe" and elem.text:
+            val = elem.text.strip()
+            if val:
+                found.append(val)
+
+    # Deduplicate while preserving order
+    seen = set()
+    unique = []
+    for x in found:
+        if x not in seen:
+            unique.append(x)
+            seen.add(x)
+    return unique
+
+
+def collect_cte_keys(transit_resp: TransitResponse) -> set[str]:
+    """Collect CTe access keys referenced by open transits."""
+    keys: set[str] = set()
+    for ct in transit_resp.transits:
+        for doc in ct.docs:
+            local_type = (doc.type or "").lower()
+            if local_type == "chavecte" and doc.value:
+                key = doc.value.strip()
+                if len(key) >= 20:  # basic sanity
+                    keys.add(key)
+            elif local_type == "xml" and doc.value:
+                try:
+                    # Try to extract chCTe from inline XML
+                    k = VBlogTransitoService.extract_xml_key(doc.value, key_tag="chCTe")
+                    if k:
+                        keys.add(k)
+                except Exception:
+                    continue
+    return keys
+
+
+def encode_xml_batch(xmls: list[Optional[str]]) -> list[Optional[dict]]:
+    """Stored document columns (compressed/encrypted) for each XML of a batch (None if empty)."""
+    return [CTeDocument.encode_xml(xml) if xml else None for xml in xmls]
+
+
+async def persist_sync_batch(db: AsyncSession, entries: list[dict]) -> list[dict]:
+    """
+    Persist one batch of downloaded CTes in a single transaction.
+
+    New keys get a fresh shipment (one executemany INSERT); every CTe row is
+    then written with one upsert on access_key, and every downloaded XML
+    with one upsert into cte_documents, followed by a single commit.
+    A key that a concurrent sync inserted in the meantime resolves to the
+    stored CTe, and the shipment created for it here is deleted again.
+    Invoice rows are synced for CTes whose NF-e list changed or that are
+    still on the legacy invoices_json; stored statuses are kept for NF-es
+    still present in the XML.
+
+    Args:
+        entries: Dicts with key, existing (prefetched snapshot or None), xml, nfe_keys
+
+    Returns:
+        Per-key detail entries for the sync response
+    """
+    new_count = sum(1 for entry in entries if entry["existing"] is None)
+    shipment_ids = iter(await ShipmentService.create_many(db, new_count))
+    now = datetime.datetime.now(datetime.timezone.utc)
+
+    # Compression + encryption of the whole batch runs off the event loop
+    xmls = [entry["xml"] for entry in entries]
+    encoded = await run_cpu(encode_xml_batch, xmls, size=sum(len(xml or "") for xml in xmls))
+
+    rows = []
+    for entry in entries:
+        existing = entry["existing"]
+        if existing:
+            cte_id, shipment_id = existing["id"], existing["shipment_id"]
+        else:
+            cte_id, shipment_id = uuid.uuid4(), next(shipment_ids)
+        rows.append({
+            "id": cte_id,
+            "shipment_id": shipment_id,
+            "access_key": entry["key"],
+            "content_hash": ClientCTe.hash_xml(entry["xml"]),
+            # Only a stored XML counts as ingested; empty downloads are retried
+            "ingested_at": now if entry["xml"] else None,
+        })
+
+    stored = await ClientCTeService.upsert_many(db, rows)
+
+    details = []
+    invoice_keys = {}
+    documents = {}
+    unused_shipments = []
+    legacy_ctes = []
+    for entry, row, stored_xml in zip(entries, rows, encoded):
+        existing = entry["existing"]
+        cte_id, shipment_id = stored[entry["key"]]
+        if existing is None and cte_id == row["id"]:
+            detail = {"key": entry["key"], "action": "created", "shipment_id": str(shipment_id)}
+            invoice_keys[cte_id] = entry["nfe_keys"]
+        else:
+            detail = {"key": entry["key"], "action": "updated"}
+            if existing is None:
+                # Inserted by a concurrent sync: its shipment is the one kept
+                unused_shipments.append(row["shipment_id"])
+                invoice_keys[cte_id] = entry["nfe_keys"]
+            elif not existing["has_invoice_rows"]:
+                # Still on the legacy invoices_json: move it over, then sync the keys
+                legacy_ctes.append(cte_id)
+                invoice_keys[cte_id] = entry["nfe_keys"]
+            # Invoice rows are rewritten only when the NF-e list changed
+            elif [inv["key"] for inv in existing["invoices"]] != entry["nfe_keys"]:
+                invoice_keys[cte_id] = entry["nfe_keys"]
+
+        if stored_xml is not None:
+            documents[cte_id] = stored_xml
+        detail["has_xml"] = bool(entry["xml"])
+        detail["nfe_count"] = len(entry["nfe_keys"])
+        details.append(detail)
+
+    await ShipmentService.delete_many(db, unused_shipments)
+    await CTeDocumentService.upsert_for_client_ctes(db, documents)
+    await InvoiceService.backfill_legacy(db, legacy_ctes)
+    await InvoiceService.replace_keys(db, invoice_keys)
+    await db.commit()
+    return details
+
+
+def _snapshot(cte: ClientCTe) -> dict:
+    """Plain copy of the prefetched columns (survives rollbacks/expiry)."""
+    return {
+        "id": cte.id,
+        "shipment_id": cte.shipment_id,
+        "invoices": cte.invoices,
+        "has_invoice_rows": bool(cte.invoice_rows),
+        "content_hash": cte.content_hash,
+        "ingested_at": cte.ingested_at,
+    }
+
+
+class ShipmentSyncService:
+    """
+    Runs one VBLOG sync: query transits -> collect keys -> prefetch ->
+    download -> persist.
+
+    Keys are diffed against the stored open-transit snapshot so only newly
+    listed keys are processed; keys that left the list are flagged closed.
+    CTes already ingested are not downloaded again unless `refresh` is set;
+    downloaded XML whose content hash matches the stored one is not rewritten.
+
+    Progress is kept on the instance (stage, counts, per-stage timings,
+    errors) so callers can report it while the sync is running.
+    """
+
+    STAGES = ("query_transits", "collect_keys", "diff", "prefetch", "download", "persist")
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        vblog: VBlogTransitoService,
+        dry_run: bool = False,
+        on_stage: Optional[Callable[["ShipmentSyncService"], Awaitable[None]]] = None,
+        include_raw_xml: bool = False,
+        refresh: bool = False,
+    ):
+        self.db = db
+        self.vblog = vblog
+        self.dry_run = dry_run
+        self.on_stage = on_stage
+        self.include_raw_xml = include_raw_xml
+        self.refresh = refresh
+
+        self.stage = "pending"
+        self.timings: dict[str, float] = {}
+        self.counts = {
+            "found_keys": 0,
+            "added": 0,
+            "removed": 0,
+            "created": 0,
+            "updated": 0,
+            "unchanged": 0,
+            "skipped": 0,
+            "errors": 0,
+        }
+        self.errors: list[str] = []
+        self.warnings: list[str] = []
+
+        # Transit query metadata (the transit list itself is not retained)
+        self.code: Optional[int] = None
+        self.description: Optional[str] = None
+        self.raw_xml: Optional[str] = None
+
+    @asynccontextmanager
+    async def _stage(self, name: str):
+        """Mark a pipeline stage and accumulate its wall time (seconds)."""
+        if name != self.stage:
+            self.stage = name
+            if self.on_stage:
+                await self.on_stage(self)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.timings[name] = round(self.timings.get(name, 0.0) + elapsed, 4)
+
+    def _record_error(self, key: str, error: BaseException) -> None:
+        msg = f"CTe {key} error: {error}"
+        logger.error(msg)
+        self.errors.append(msg)
+        self.counts["errors"] += 1
+
+    def _record_detail(self, detail: dict) -> dict:
+        self.counts[detail["action"]] += 1
+        return detail
+
+    async def iter_results(self) -> AsyncIterator[dict]:
+        """
+        Run the sync, yielding one detail entry per processed key as soon as
+        its batch is persisted (or, on dry runs, downloaded).
+        """
+        async with self._stage("query_transits"):
+            transit_resp = await self.vblog.query_open_transits()
+        self.warnings = list(transit_resp.warnings)
+        self.code = transit_resp.code
+        self.description = transit_resp.description
+        if self.include_raw_xml:
+            self.raw_xml = transit_resp.raw_xml
+        if not transit_resp.transits:
+            return
+
+        async with self._stage("collect_keys"):
+            keys = collect_cte_keys(transit_resp)
+        del transit_resp  # release the parsed transit list before downloading
+        if not keys:
+            self.warnings.append("No CTe keys found in transits")
+            return
+        self.counts["found_keys"] = len(keys)
+
+        # Diff against the previous snapshot; keys that stayed open need no work
+        async with self._stage("diff"):
+            diff = await TransitSnapshotService.diff(self.db, keys)
+            if diff.removed and not self.dry_run:
+                await TransitSnapshotService.mark_closed(self.db, diff.removed)
+                await self.db.commit()
+        self.counts["added"] = len(diff.added)
+        self.counts["removed"] = len(diff.removed)
+        if self.refresh:
+            pending = keys
+        else:
+            pending = diff.added
+            self.counts["unchanged"] += len(diff.unchanged)
+        del keys, diff
+        if not pending:
+            return
+
+        # Resolve already-stored CTes in bulk; create-vs-update is decided in memory
+        async with self._stage("prefetch"):
+            existing_by_key = {
+                key: _snapshot(cte)
+                for key, cte in (
+                    await ClientCTeService.get_many_by_access_keys(self.db, pending)
+                ).items()
+            }
+
+        # Already-ingested CTes are not downloaded again (unless refreshing)
+        to_download = []
+        ingested = []
+        for key in sorted(pending):
+            existing = existing_by_key.get(key)
+            if existing and existing["ingested_at"] and not self.refresh:
+                ingested.append(key)
+            else:
+                to_download.append(key)
+
+        if ingested and not self.dry_run:
+            async with self._stage("persist"):
+                await TransitSnapshotService.mark_open(self.db, ingested)
+                await self.db.commit()
+        for key in ingested:
+            yield self._record_detail({"key": key, "action": "unchanged", "downloaded": False})
+
+        cte_downloader = VBlogCTeService(self.vblog)
+        batch_size = max(1, settings.sync_batch_size)
+
+        # Download (bounded concurrency) and persist one batch at a time
+        for start in range(0, len(to_download), batch_size):
+            async with self._stage("download"):
+                downloads = await cte_downloader.download_many(
+                    to_download[start:start + batch_size],
+                    concurrency=settings.sync_download_concurrency,
+                )
+
+            entries = []
+            unchanged = []
+            for key, xml_cte in downloads.items():
+                if isinstance(xml_cte, BaseException):
+                    self._record_error(key, xml_cte)
+                    continue
+
+                existing = existing_by_key.get(key)
+                if (
+                    existing
+                    and existing["content_hash"]
+                    and existing["content_hash"] == ClientCTe.hash_xml(xml_cte)
+                ):
+                    unchanged.append(key)
+                    continue
+
+                nfe_keys = await run_cpu(extract_nfe_keys, xml_cte, size=len(xml_cte or ""))
+
+                if self.dry_run:
+                    yield self._record_detail({
+                        "key": key,
+                        "action": "skipped",
+                        "has_xml": bool(xml_cte),
+                        "nfe_count": len(nfe_keys),
+                    })
+                    continue
+
+                entries.append({
+                    "key": key,
+                    "existing": existing,
+                    "xml": xml_cte,
+                    "nfe_keys": nfe_keys,
+                })
+
+            batch_details = []
+            if entries:
+                async with self._stage("persist"):
+                    batch_details = await self._persist(entries)
+
+            # Only keys whose XML is stored enter the snapshot; the rest retry next run
+            stored = unchanged + [d["key"] for d in batch_details if d["has_xml"]]
+            if stored and not self.dry_run:
+                async with self._stage("persist"):
+                    await ClientCTeService.mark_ingested(self.db, unchanged)
+                    await TransitSnapshotService.mark_open(self.db, stored)
+                    await self.db.commit()
+
+            for key in unchanged:
+                yield self._record_detail({"key": key, "action": "unchanged", "downloaded": True})
+            for detail in batch_details:
+                yield self._record_detail(detail)
+
+    async def _persist(self, entries: list[dict]) -> list[dict]:
+        """Persist a batch; on failure retry it one CTe per transaction."""
+        try:
+            return await persist_sync_batch(self.db, entries)
+        except Exception as e:
+            await self.db.rollback()
+            logger.warning(f"Sync batch of {len(entries)} CTes failed, retrying per key: {e}")
+
+        # Isolate the failing key(s): one CTe per transaction
+        details = []
+        for entry in entries:
+            try:
+                details += await persist_sync_batch(self.db, [entry])
+            except Exception as key_error:
+                await self.db.rollback()
+                self._record_error(entry["key"], key_error)
+        return details
+
+    async def run(self) -> dict:
+        """Run the sync to completion and return the full result with details."""
+        details = [detail async for detail in self.iter_results()]
+        return {**self.summary(), "details": details}
+
+    def summary(self) -> dict:
+        """Result of the sync so far, without per-key details."""
+        result = {
+            "status": "ok",
+            "found_keys": self.counts["found_keys"],
+            "added": self.counts["added"],
+            "removed": self.counts["removed"],
+            "created": self.counts["created"],
+            "updated": self.counts["updated"],
+            "unchanged": self.counts["unchanged"],
+            "skipped": self.counts["skipped"],
+            "errors": self.errors,
+            "warnings": self.warnings,
+            "code": self.code,
+            "description": self.description,
+        }
+        if self.include_raw_xml:
+            result["raw_xml"] = self.raw_xml
+        return result
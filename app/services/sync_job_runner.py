@@ -0,0 +1,175 @@
+# app/services/sync_job_runner.py
+"""
+Background runner for VBLOG shipment sync jobs.
+Runs at most one sync at a time, on demand (API) or on a fixed schedule,
+and keeps the persisted SyncJob record up to date as the pipeline advances.
+"""
+
+import asyncio
+import datetime
+from typing import Callable, Optional
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config.settings import settings
+from app.core.database import AsyncSessionLocal
+from app.models.sync_job import SyncJob, SyncJobStatus
+from app.services.shipment_sync_service import ShipmentSyncService
+from app.services.sync_job_service import SyncJobService
+from app.services.vblog.transito import VBlogTransitoService
+from app.utils.logger import logger
+
+
+def _utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+class SyncJobRunner:
+    """
+    Owns the background sync task and the optional schedule loop.
+
+    Job records are written through their own short-lived sessions so the
+    status stays visible to pollers while the sync transaction is open.
+    """
+
+    def __init__(
+        self,
+        vblog_factory: Callable[[], VBlogTransitoService],
+        session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+        interval_seconds: int = 0,
+    ):
+        self.vblog_factory = vblog_factory
+        self.session_factory = session_factory
+        self.interval_seconds = interval_seconds
+
+        self._lock = asyncio.Lock()
+        self._job_id: Optional[UUID] = None
+        self._task: Optional[asyncio.Task] = None
+        self._scheduler: Optional[asyncio.Task] = None
+
+    @property
+    def is_running(self) -> bool:
+        """Whether a sync job is currently in flight."""
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        """Recover interrupted jobs and start the schedule loop (if enabled)."""
+        async with self.session_factory() as db:
+            await SyncJobService.fail_interrupted(db)
+
+        if self.interval_seconds > 0 and self._scheduler is None:
+            self._scheduler = asyncio.create_task(self._schedule_loop())
+            logger.info(f"Sync job scheduler started (every {self.interval_seconds}s)")
+
+    async def stop(self) -> None:
+        """Cancel the schedule loop and any running job."""
+        for task in (self._scheduler, self._task):
+            if task and not task.done():
+                task.cancel()
+        for task in (self._scheduler, self._task):
+            if task:
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._scheduler = None
+        self._task = None
+
+    async def trigger(
+        self,
+        dry_run: bool = False,
+        trigger: str = "api",
+        refresh: bool = False,
+    ) -> SyncJob:
+        """
+        Start a sync job in the background and return its record immediately.
+        If a job is already running, that job is returned instead.
+        """
+        async with self._lock:
+            async with self.session_factory() as db:
+                if self.is_running:
+                    job = await SyncJobService.get_by_id(db, self._job_id)
+                    if job:
+                        return job
+                job = await SyncJobService.create(db, trigger=trigger, dry_run=dry_run)
+
+            self._job_id = job.id
+            self._task = asyncio.create_task(self._run(job.id, dry_run, refresh))
+            return job
+
+    async def wait(self) -> None:
+        """Wait for the running job (if any) to finish."""
+        if self._task:
+            await asyncio.shield(self._task)
+
+    async def _update(self, job_id: UUID, **fields) -> None:
+        async with self.session_factory() as db:
+            await SyncJobService.update(db, job_id, **fields)
+
+    async def _run(self, job_id: UUID, dry_run: bool, refresh: bool = False) -> None:
+        """Execute the sync pipeline, mirroring its progress onto the job record."""
+
+        async def report(sync: ShipmentSyncService) -> None:
+            await self._update(
+                job_id,
+                stage=sync.stage,
+                counts=dict(sync.counts),
+                timings=dict(sync.timings),
+                errors=list(sync.errors),
+            )
+
+        vblog = None
+        sync: Optional[ShipmentSyncService] = None
+        try:
+            vblog = self.vblog_factory()
+            await self._update(job_id, status=SyncJobStatus.RUNNING, started_at=_utcnow())
+            async with self.session_factory() as db:
+                sync = ShipmentSyncService(
+                    db, vblog, dry_run=dry_run, on_stage=report, refresh=refresh
+                )
+                async for _ in sync.iter_results():
+                    pass
+
+            await self._update(
+                job_id,
+                status=SyncJobStatus.SUCCEEDED,
+                counts=dict(sync.counts),
+                timings=dict(sync.timings),
+                errors=list(sync.errors),
+                warnings=list(sync.warnings),
+                finished_at=_utcnow(),
+            )
+            logger.info(f"Sync job {job_id} finished: {sync.counts}")
+        except asyncio.CancelledError:
+            await self._update(
+                job_id,
+                status=SyncJobStatus.FAILED,
+                errors=(list(sync.errors) if sync else []) + ["Cancelled"],
+                finished_at=_utcnow(),
+            )
+            raise
+        except Exception as e:
+            logger.exception(f"Sync job {job_id} failed: {e}")
+            await self._update(
+                job_id,
+                status=SyncJobStatus.FAILED,
+                counts=dict(sync.counts) if sync else None,
+                timings=dict(sync.timings) if sync else None,
+                errors=(list(sync.errors) if sync else []) + [str(e)],
+                finished_at=_utcnow(),
+            )
+        finally:
+            if vblog is not None:
+                await vblog.close()
+
+    async def _schedule_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            if not (settings.vblog_cnpj and settings.vblog_token and settings.vblog_base):
+                logger.warning("Scheduled sync skipped: VBLOG configuration missing")
+                continue
+            try:
+                await self.trigger(trigger="schedule")
+            except Exception as e:
+                logger.exception(f"Failed to start scheduled sync job: {e}")
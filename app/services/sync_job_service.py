@@ -0,0 +1,75 @@
+# app/services/sync_job_service.py
+"""
+SyncJob service.
+CRUD operations for persisted shipment sync jobs using async SQLAlchemy.
+"""
+
+import datetime
+from uuid import UUID
+from typing import Optional, List
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+
+from app.models.sync_job import SyncJob, SyncJobStatus
+from app.utils.logger import logger
+
+
+class SyncJobService:
+    """Service for sync job records."""
+
+    @staticmethod
+    async def create(db: AsyncSession, trigger: str = "api", dry_run: bool = False) -> SyncJob:
+        """Create a queued sync job."""
+        job = SyncJob(trigger=trigger, dry_run=dry_run, status=SyncJobStatus.QUEUED)
+        db.add(job)
+        await db.commit()
+        await db.refresh(job)
+        logger.info(f"Queued sync job {job.id} (trigger={trigger}, dry_run={dry_run})")
+        return job
+
+    @staticmethod
+    async def get_by_id(db: AsyncSession, job_id: UUID) -> Optional[SyncJob]:
+        """Get a sync job by ID."""
+        result = await db.execute(select(SyncJob).where(SyncJob.id == job_id))
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def list_recent(db: AsyncSession, limit: int = 20) -> List[SyncJob]:
+        """List the most recent sync jobs, newest first."""
+        result = await db.execute(
+            select(SyncJob).order_by(SyncJob.created_at.desc()).limit(limit)
+        )
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def update(db: AsyncSession, job_id: UUID, **fields) -> Optional[SyncJob]:
+        """Set fields on a sync job and commit."""
+        job = await SyncJobService.get_by_id(db, job_id)
+        if not job:
+            return None
+        for key, value in fields.items():
+            setattr(job, key, value)
+        await db.commit()
+        await db.refresh(job)
+        return job
+
+    @staticmethod
+    async def fail_interrupted(db: AsyncSession) -> int:
+        """
+        Mark jobs left queued/running by a previous process as failed.
+        Returns the number of jobs updated.
+        """
+        result = await db.execute(
+            select(SyncJob).where(SyncJob.status.in_(SyncJobStatus.ACTIVE))
+        )
+        jobs = list(result.scalars().all())
+        now = datetime.datetime.now(datetime.timezone.utc)
+        for job in jobs:
+            job.status = SyncJobStatus.FAILED
+            job.errors = (job.errors or []) + ["Interrupted by application shutdown"]
+            job.finished_at = now
+        if jobs:
+            await db.commit()
+            logger.warning(f"Marked {len(jobs)} interrupted sync job(s) as failed")
+        return len(jobs)
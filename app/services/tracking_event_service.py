@@ -4,11 +4,13 @@ TrackingEvent service (formerly tracking_service.py).
 CRUD operations for tracking events using async SQLAlchemy.
 """
 
+import base64
+import datetime
 from uuid import UUID
-from typing import List
+from typing import List, Optional, Sequence, Tuple, Union
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, insert, and_, or_
 
 from app.models.tracking_event import TrackingEvent
 from app.schemas.tracking_event import TrackingEventCreate
@@ -30,6 +32,33 @@ class TrackingEventService:
         )
         return tracking
 
+    @staticmethod
+    async def register_many(
+        db: AsyncSession,
+        events: Sequence[Union[TrackingEventCreate, dict]],
+    ) -> List[UUID]:
+        """
+        Insert several tracking events in one multi-row INSERT.
+
+        Items are TrackingEventCreate or dicts of column values (e.g. with
+        delivery fields). Runs inside the caller's transaction (no commit,
+        no refresh) and returns the generated IDs in input order.
+        """
+        if not events:
+            return []
+
+        rows = [
+            item.model_dump() if isinstance(item, TrackingEventCreate) else dict(item)
+            for item in events
+        ]
+        result = await db.scalars(
+            insert(TrackingEvent).returning(TrackingEvent.id, sort_by_parameter_order=True),
+            rows,
+        )
+        ids = list(result.all())
+        logger.info(f"Registered {len(ids)} tracking event(s): {rows[0]['event_code']}")
+        return ids
+
     @staticmethod
     async def list_by_cte(db: AsyncSession, cte_id: UUID) -> List[TrackingEvent]:
         """List all tracking events for a CTe."""
@@ -40,6 +69,65 @@ class TrackingEventService:
         )
         return list(result.scalars().all())
 
+    @staticmethod
+    def encode_cursor(event: TrackingEvent) -> str:
+        """Opaque cursor pointing just after `event` in (event_date, id) order."""
+        raw = f"{event.event_date.isoformat()}|{event.id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[datetime.datetime, UUID]:
+        """Parse a cursor from encode_cursor. Raises ValueError if malformed."""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+            event_date, event_id = raw.split("|", 1)
+            return datetime.datetime.fromisoformat(event_date), UUID(event_id)
+        except Exception as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
+
+    @staticmethod
+    async def list_page(
+        db: AsyncSession,
+        cte_id: UUID,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        invoice_key: Optional[str] = None,
+        event_code: Optional[str] = None,
+    ) -> Tuple[List[TrackingEvent], Optional[str]]:
+        """
+        One page of a CTe's tracking events in (event_date, id) order.
+
+        Keyset pagination: `cursor` is the value returned for the previous
+        page, so every page is an index range scan regardless of depth.
+
+        Returns:
+            Tuple of (events, next_cursor); next_cursor is None on the last page
+        """
+        query = select(TrackingEvent).where(TrackingEvent.client_cte_id == cte_id)
+        if invoice_key:
+            query = query.where(TrackingEvent.invoice_key == invoice_key)
+        if event_code:
+            query = query.where(TrackingEvent.event_code == event_code)
+        if cursor:
+            after_date, after_id = TrackingEventService.decode_cursor(cursor)
+            query = query.where(
+                or_(
+                    TrackingEvent.event_date > after_date,
+                    and_(TrackingEvent.event_date == after_date, TrackingEvent.id > after_id),
+                )
+            )
+
+        result = await db.execute(
+            query.order_by(TrackingEvent.event_date, TrackingEvent.id).limit(limit + 1)
+        )
+        events = list(result.scalars().all())
+
+        next_cursor = None
+        if len(events) > limit:
+            events = events[:limit]
+            next_cursor = TrackingEventService.encode_cursor(events[-1])
+        return events, next_cursor
+
     @staticmethod
     async def get_latest_by_cte(db: AsyncSession, cte_id: UUID) -> TrackingEvent | None:
         """Get the most recent tracking event for a CTe."""
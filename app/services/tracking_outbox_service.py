@@ -0,0 +1,209 @@
+# app/services/tracking_outbox_service.py
+"""
+TrackingOutbox service.
+Queues tracking events for Brudam delivery and records delivery outcomes.
+"""
+
+import json
+import datetime
+from uuid import UUID
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, func
+from sqlalchemy.orm import selectinload
+
+from app.config.settings import settings
+from app.models.tracking_event import DeliveryStatus
+from app.models.tracking_outbox import TrackingOutbox
+from app.services.constants import VALID_CODES
+from app.services.tracking_event_service import TrackingEventService
+from app.utils.logger import logger
+
+
+# Recorded as the failed attempt of an entry whose lease ran out mid-send
+LEASE_EXPIRED = "Delivery lease expired before the outcome was recorded"
+
+
+def _utc(value: datetime.datetime) -> datetime.datetime:
+    """Aware UTC datetime (SQLite hands back naive UTC values)."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=datetime.timezone.utc)
+    return value.astimezone(datetime.timezone.utc)
+
+
+class TrackingOutboxService:
+    """Service for the tracking delivery outbox."""
+
+    @staticmethod
+    async def enqueue(
+        db: AsyncSession,
+        entries: List[Tuple[UUID, str]],
+        event_code: str,
+        event_date: datetime.datetime,
+        attachment_urls: Optional[List[str]] = None,
+    ) -> List[UUID]:
+        """
+        Add a pending tracking event plus its outbox entry for each
+        (client_cte_id, invoice_key), both as bulk inserts. Does not commit:
+        the caller commits them together with the status change.
+        Returns the tracking event IDs in input order.
+        """
+        if not entries:
+            return []
+
+        event_ids = await TrackingEventService.register_many(
+            db,
+            [
+                {
+                    "client_cte_id": client_cte_id,
+                    "invoice_key": invoice_key,
+                    "event_code": event_code,
+                    "description": VALID_CODES[event_code]["message"],
+                    "event_date": event_date,
+                    "delivery_status": DeliveryStatus.PENDING,
+                    "delivery_attempts": 0,
+                }
+                for client_cte_id, invoice_key in entries
+            ],
+        )
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        attachments_json = json.dumps(attachment_urls) if attachment_urls else None
+        await db.execute(
+            insert(TrackingOutbox),
+            [
+                {
+                    "tracking_event_id": event_id,
+                    "document_key": invoice_key,
+                    "event_code": event_code,
+                    "event_date": event_date,
+                    "attachments_json": attachments_json,
+                    "status": DeliveryStatus.PENDING,
+                    "attempts": 0,
+                    "next_attempt_at": now,
+                }
+                for event_id, (_, invoice_key) in zip(event_ids, entries)
+            ],
+        )
+        return event_ids
+
+    @staticmethod
+    async def claim_due(db: AsyncSession, limit: int = 100) -> List[TrackingOutbox]:
+        """
+        Lease the pending entries whose next attempt is due, oldest first.
+
+        Rows are locked with SKIP LOCKED where supported, marked SENDING with
+        `next_attempt_at` pushed out by `outbox_lease_seconds` (the lease,
+        also used as the lease token by record_results), and the claim is
+        committed right away, so no transaction (or row lock) stays open
+        while the entries are sent.
+        Entries whose lease ran out (the worker died or hung mid-send) are
+        recorded as a failed attempt instead, so they back off and count
+        towards `outbox_max_attempts`.
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+        result = await db.execute(
+            select(TrackingOutbox)
+            .options(selectinload(TrackingOutbox.tracking_event))
+            .where(
+                TrackingOutbox.status.in_((DeliveryStatus.PENDING, DeliveryStatus.SENDING)),
+                TrackingOutbox.next_attempt_at <= now,
+            )
+            .order_by(TrackingOutbox.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        entries = []
+        lease_until = now + datetime.timedelta(seconds=settings.outbox_lease_seconds)
+        for entry in result.scalars():
+            if entry.status == DeliveryStatus.SENDING:
+                logger.warning(f"Tracking outbox lease expired for {entry.document_key}")
+                TrackingOutboxService.record_result(entry, False, LEASE_EXPIRED, None)
+                continue
+            entry.status = DeliveryStatus.SENDING
+            entry.next_attempt_at = lease_until
+            entries.append(entry)
+        await db.commit()
+        return entries
+
+    @staticmethod
+    async def record_results(
+        db: AsyncSession,
+        outcomes: Dict[UUID, Tuple[bool, Optional[str], Optional[float]]],
+        leases: Dict[UUID, datetime.datetime],
+    ) -> int:
+        """
+        Apply delivery outcomes, keyed by outbox entry id, to the entries
+        still held under the lease they were claimed with (`leases`: entry
+        id -> next_attempt_at set by claim_due). Entries whose lease expired
+        and was handed on are left alone. Does not commit.
+        Returns how many were recorded.
+        """
+        if not outcomes:
+            return 0
+        result = await db.execute(
+            select(TrackingOutbox)
+            .options(selectinload(TrackingOutbox.tracking_event))
+            .where(
+                TrackingOutbox.id.in_(list(outcomes)),
+                TrackingOutbox.status == DeliveryStatus.SENDING,
+            )
+        )
+        recorded = 0
+        for entry in result.scalars():
+            if _utc(entry.next_attempt_at) != _utc(leases[entry.id]):
+                logger.warning(f"Tracking outbox lease lost for {entry.document_key}; outcome dropped")
+                continue
+            TrackingOutboxService.record_result(entry, *outcomes[entry.id])
+            recorded += 1
+        return recorded
+
+    @staticmethod
+    def backoff(attempts: int) -> datetime.timedelta:
+        """Exponential retry delay after `attempts` failed attempts."""
+        delay = settings.outbox_backoff_seconds * (2 ** max(0, attempts - 1))
+        return datetime.timedelta(seconds=min(delay, settings.outbox_backoff_max_seconds))
+
+    @staticmethod
+    def record_result(
+        entry: TrackingOutbox,
+        success: bool,
+        response: Optional[str],
+        latency_ms: Optional[float],
+    ) -> None:
+        """
+        Apply one delivery attempt's outcome to the entry and its event.
+        Failed entries are rescheduled with backoff until
+        `outbox_max_attempts` is reached. Does not commit.
+        """
+        entry.attempts += 1
+        event = entry.tracking_event
+        event.record_delivery(success, response, latency_ms)
+
+        if success:
+            entry.status = DeliveryStatus.DELIVERED
+            entry.last_error = None
+            return
+
+        entry.last_error = response[:2000] if response else None
+        if entry.attempts >= settings.outbox_max_attempts:
+            entry.status = DeliveryStatus.FAILED
+            event.delivery_status = DeliveryStatus.FAILED
+            logger.error(
+                f"Tracking delivery failed permanently for {entry.document_key} "
+                f"after {entry.attempts} attempts: {entry.last_error}"
+            )
+        else:
+            entry.status = DeliveryStatus.PENDING
+            entry.next_attempt_at = (
+                datetime.datetime.now(datetime.timezone.utc) + TrackingOutboxService.backoff(entry.attempts)
+            )
+
+    @staticmethod
+    async def count_by_status(db: AsyncSession) -> dict:
+        """Number of outbox entries per status (for metrics)."""
+        result = await db.execute(
+            select(TrackingOutbox.status, func.count()).group_by(TrackingOutbox.status)
+        )
+        return {status: count for status, count in result.all()}
@@ -0,0 +1,156 @@
+# app/services/tracking_outbox_worker.py
+"""
+Background worker that drains the tracking outbox to Brudam.
+Claims due entries, sends them (batched when they carry no attachments,
+fanned out per document otherwise) and records each outcome.
+"""
+
+import asyncio
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config.settings import settings
+from app.core.database import AsyncSessionLocal
+from app.models.tracking_outbox import TrackingOutbox
+from app.services.attachments_service import AttachmentService, AttachmentRef
+from app.services.tracking_outbox_service import TrackingOutboxService
+from app.services.vblog.tracking import VBlogTrackingService
+from app.utils.logger import logger
+
+
+class TrackingOutboxWorker:
+    """Owns the outbox polling loop; `wake()` triggers an immediate pass."""
+
+    def __init__(
+        self,
+        tracking_factory: Callable[[], VBlogTrackingService],
+        session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+        poll_interval: float = 2.0,
+    ):
+        self.tracking_factory = tracking_factory
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval
+
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the polling loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+            logger.info("Tracking outbox worker started")
+
+    async def stop(self) -> None:
+        """Stop the polling loop (pending entries stay in the outbox)."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def wake(self) -> None:
+        """Ask the worker to drain right away (e.g. after new events were queued)."""
+        self._wake.set()
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                processed = await self.drain_once()
+            except Exception as e:
+                logger.exception(f"Tracking outbox pass failed: {e}")
+                processed = 0
+            if processed:
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def drain_once(self) -> int:
+        """
+        Deliver one batch of due outbox entries. Returns how many were attempted.
+
+        The entries are leased in one short transaction, sent with no
+        transaction open, and their outcomes recorded in a second one.
+        """
+        async with self.session_factory() as db:
+            entries = await TrackingOutboxService.claim_due(db, limit=settings.outbox_batch_size)
+        if not entries:
+            return 0
+
+        # Entries queued by the same status change share code/date/attachments
+        groups: Dict[Tuple, List[TrackingOutbox]] = defaultdict(list)
+        for entry in entries:
+            groups[(entry.event_code, entry.event_date, entry.attachments_json)].append(entry)
+
+        outcomes: Dict[UUID, Tuple[bool, Optional[str], Optional[float]]] = {}
+        tracking = self.tracking_factory()
+        try:
+            for group in groups.values():
+                outcomes.update(await self._deliver(tracking, group))
+        finally:
+            await tracking.close()
+
+        async with self.session_factory() as db:
+            await TrackingOutboxService.record_results(
+                db, outcomes, {entry.id: entry.next_attempt_at for entry in entries}
+            )
+            await db.commit()
+        return len(entries)
+
+    async def _deliver(
+        self,
+        tracking: VBlogTrackingService,
+        entries: List[TrackingOutbox],
+    ) -> Dict[UUID, Tuple[bool, Optional[str], Optional[float]]]:
+        """Send one group of entries; returns (success, response, latency_ms) per entry id."""
+        first = entries[0]
+        keys = list(dict.fromkeys(entry.document_key for entry in entries))
+        attachments = self._load_attachments(first.attachment_urls)
+
+        try:
+            if attachments:
+                sent = dict(zip(keys, await tracking.send_each(
+                    document_keys=keys,
+                    event_code=first.event_code,
+                    event_date=first.event_date,
+                    attachments=attachments,
+                    concurrency=settings.brudam_send_concurrency,
+                )))
+            else:
+                started = time.perf_counter()
+                batch = await tracking.send_many(
+                    document_keys=keys,
+                    event_code=first.event_code,
+                    event_date=first.event_date,
+                    batch_size=settings.brudam_batch_size,
+                )
+                elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+                sent = {key: (ok, response, elapsed_ms) for key, (ok, response) in batch.items()}
+        except Exception as e:
+            logger.warning(f"Tracking outbox delivery error: {e}")
+            sent = {key: (False, str(e), None) for key in keys}
+
+        return {entry.id: sent[entry.document_key] for entry in entries}
+
+    @staticmethod
+    def _load_attachments(urls: List[str]) -> List[AttachmentRef]:
+        """References to the saved attachment files (streamed at send time)."""
+        if not urls:
+            return []
+        service = AttachmentService()
+        attachments = []
+        for url in urls:
+            ref = service.get_ref_from_url(url)
+            if ref is None:
+                logger.warning(f"Outbox attachment not found on disk: {url}")
+                continue
+            attachments.append(ref)
+        return attachments
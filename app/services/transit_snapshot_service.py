@@ -0,0 +1,91 @@
+# app/services/transit_snapshot_service.py
+"""
+Transit snapshot service.
+Persists the open-transit key snapshot and diffs new VBLOG results against it.
+"""
+
+import datetime
+from typing import Iterable, List, NamedTuple, Set
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
+
+from app.models.open_transit_key import OpenTransitKey
+from app.services.client_cte_service import UPSERT_INSERTS
+
+
+class TransitDiff(NamedTuple):
+    """Difference between the stored snapshot and the current open transits."""
+    added: Set[str]
+    removed: Set[str]
+    unchanged: Set[str]
+
+
+class TransitSnapshotService:
+    """Service for the open-transit key snapshot."""
+
+    @staticmethod
+    async def get_open_keys(db: AsyncSession) -> Set[str]:
+        """Keys currently recorded as open."""
+        result = await db.execute(
+            select(OpenTransitKey.access_key).where(OpenTransitKey.closed_at.is_(None))
+        )
+        return set(result.scalars().all())
+
+    @staticmethod
+    async def diff(db: AsyncSession, keys: Iterable[str]) -> TransitDiff:
+        """Compare the current open-transit keys with the stored snapshot."""
+        current = set(keys)
+        previous = await TransitSnapshotService.get_open_keys(db)
+        return TransitDiff(
+            added=current - previous,
+            removed=previous - current,
+            unchanged=current & previous,
+        )
+
+    @staticmethod
+    async def mark_open(db: AsyncSession, keys: List[str]) -> None:
+        """
+        Record keys as open (insert new ones, reopen closed ones).
+        Does not commit.
+        """
+        if not keys:
+            return
+
+        dialect = db.get_bind().dialect.name
+        if dialect in UPSERT_INSERTS:
+            stmt = UPSERT_INSERTS[dialect](OpenTransitKey)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[OpenTransitKey.__table__.c.access_key],
+                set_={"closed_at": None},
+            )
+            await db.execute(stmt, [{"access_key": key} for key in keys])
+            return
+
+        result = await db.execute(
+            select(OpenTransitKey).where(OpenTransitKey.access_key.in_(keys))
+        )
+        existing = {entry.access_key: entry for entry in result.scalars()}
+        for key in keys:
+            if key in existing:
+                existing[key].closed_at = None
+            else:
+                db.add(OpenTransitKey(access_key=key))
+        await db.flush()
+
+    @staticmethod
+    async def mark_closed(
+        db: AsyncSession,
+        keys: Iterable[str],
+        chunk_size: int = 500,
+    ) -> None:
+        """Flag keys that left the open-transit list as closed. Does not commit."""
+        keys = list(keys)
+        now = datetime.datetime.now(datetime.timezone.utc)
+        for start in range(0, len(keys), chunk_size):
+            await db.execute(
+                update(OpenTransitKey)
+                .where(OpenTransitKey.access_key.in_(keys[start:start + chunk_size]))
+                .values(closed_at=now)
+                .execution_options(synchronize_session=False)
+            )
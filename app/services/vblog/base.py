@@ -5,12 +5,17 @@ Provides shared HTTP client management, XML building, and retry logic.
 """
 
 import asyncio
+import json
+import re
+import uuid
 import xml.etree.ElementTree as ET
 from abc import ABC, abstractmethod
-from typing import Optional, Any
+from typing import AsyncIterator, List, Optional, Any, Union
 
 import httpx
 
+from app.core.circuit_breaker import circuit_breakers
+from app.services.attachments_service import AttachmentRef
 from app.utils.logger import logger
 
 
@@ -19,12 +24,67 @@ NS = "http://www.controleembarque.com.br"
 NSMAP = {"ns": NS}
 
 
+class StreamingJSONBody:
+    """
+    JSON request body whose attachments are streamed from disk.
+
+    The payload is serialized once with a placeholder for each AttachmentRef
+    (rendered as {"arquivo": {"nome": url, "dados": <base64>}}); when the
+    body is sent, the placeholders are filled with base64 read from the file
+    in chunks. Content-Length is computed up front, and the body can be
+    iterated again for retries.
+    """
+
+    def __init__(self, payload: Any):
+        marker = f"@attachment:{uuid.uuid4().hex}:"
+        refs: List[AttachmentRef] = []
+        indexes: dict = {}
+
+        def default(obj: Any) -> Any:
+            if isinstance(obj, AttachmentRef):
+                if id(obj) not in indexes:
+                    indexes[id(obj)] = len(refs)
+                    refs.append(obj)
+                return {"arquivo": {"nome": obj.url, "dados": f"{marker}{indexes[id(obj)]}@"}}
+            raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+        text = json.dumps(payload, default=default, ensure_ascii=False)
+
+        # Alternating JSON text (bytes) and attachment references
+        self.parts: List[Union[bytes, AttachmentRef]] = []
+        pattern = re.compile('"' + re.escape(marker) + r'(\d+)@"')
+        pos = 0
+        for match in pattern.finditer(text):
+            self.parts.append(text[pos:match.start()].encode("utf-8"))
+            self.parts.append(refs[int(match.group(1))])
+            pos = match.end()
+        self.parts.append(text[pos:].encode("utf-8"))
+
+        self.content_length = sum(
+            len(part) if isinstance(part, bytes) else part.base64_size + 2
+            for part in self.parts
+        )
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for part in self.parts:
+            if isinstance(part, bytes):
+                yield part
+                continue
+            yield b'"'
+            async for chunk in part.aiter_base64():
+                yield chunk
+            yield b'"'
+
+
 class VBlogBaseClient(ABC):
     """
     Abstract base class for VBLOG services.
     Provides shared functionality for HTTP requests and XML handling.
     """
 
+    # Circuit breaker (and pooled client) name of the upstream this service calls
+    upstream = "vblog"
+
     def __init__(
         self,
         cnpj: Optional[str] = None,
@@ -32,23 +92,27 @@ class VBlogBaseClient(ABC):
         base_url: Optional[str] = None,
         timeout: float = 10.0,
         max_retries: int = 3,
+        client: Optional[httpx.AsyncClient] = None,
     ):
         self.cnpj = cnpj
         self.token = token
         self.base_url = base_url.rstrip("/") if base_url else None
         self.timeout = timeout
         self.max_retries = max_retries
-        self._client: Optional[httpx.AsyncClient] = None
+        # A shared (pooled) client is owned by whoever passed it in
+        self._client: Optional[httpx.AsyncClient] = client
+        self._owns_client = client is None
 
     async def _get_client(self) -> httpx.AsyncClient:
-        """Get or create an async HTTP client."""
+        """Get the shared HTTP client, or create a private one."""
         if self._client is None or self._client.is_closed:
             self._client = httpx.AsyncClient(timeout=self.timeout)
+            self._owns_client = True
         return self._client
 
     async def close(self) -> None:
-        """Close the HTTP client."""
-        if self._client and not self._client.is_closed:
+        """Close the HTTP client if this service owns it (shared clients stay open)."""
+        if self._owns_client and self._client and not self._client.is_closed:
             await self._client.aclose()
             self._client = None
 
@@ -79,22 +143,36 @@ class VBlogBaseClient(ABC):
     async def _send_with_retry(
         self,
         url: str,
-        payload: str | dict,
+        payload: str | dict | StreamingJSONBody,
         content_type: str = "application/xml",
         method: str = "POST",
     ) -> tuple[bool, str, int]:
         """
         Send HTTP request with retry logic.
+
+        Guarded by the upstream's circuit breaker: while the circuit is open
+        the call fails fast without touching the network; in half-open state
+        a single attempt is made as a probe.
         
         Args:
             url: Target URL
-            payload: XML string or dict for JSON
+            payload: XML string, dict for JSON, or a StreamingJSONBody
             content_type: Request content type
             method: HTTP method
             
         Returns:
             Tuple of (success, response_text, status_code)
         """
+        breaker = circuit_breakers.get(self.upstream)
+        if not breaker.allow():
+            msg = (
+                f"Circuit open for {self.upstream}: failing fast "
+                f"(retry in {breaker.retry_in():.0f}s)"
+            )
+            logger.warning(msg)
+            return False, msg, 0
+        max_attempts = 1 if breaker.is_probing else self.max_retries
+
         client = await self._get_client()
         
         headers = {
@@ -105,20 +183,31 @@ class VBlogBaseClient(ABC):
         attempt = 0
         last_error: Optional[Exception] = None
         
-        while attempt < self.max_retries:
+        while attempt < max_attempts:
             try:
-                if content_type == "application/json" and isinstance(payload, dict):
-                    resp = await client.request(method, url, json=payload, headers=headers)
+                if isinstance(payload, StreamingJSONBody):
+                    resp = await client.request(
+                        method, url, content=payload, timeout=self.timeout,
+                        headers={**headers, "Content-Length": str(payload.content_length)},
+                    )
+                elif content_type == "application/json" and isinstance(payload, dict):
+                    resp = await client.request(
+                        method, url, json=payload, headers=headers, timeout=self.timeout
+                    )
                 else:
                     content = payload.encode("utf-8") if isinstance(payload, str) else payload
-                    resp = await client.request(method, url, content=content, headers=headers)
+                    resp = await client.request(
+                        method, url, content=content, headers=headers, timeout=self.timeout
+                    )
                 
                 # Success: 2xx or 3xx
                 if resp.status_code < 400:
+                    breaker.record_success()
                     return True, resp.text, resp.status_code
                 
-                # Client error (4xx): don't retry
+                # Client error (4xx): don't retry (upstream is reachable)
                 if 400 <= resp.status_code < 500:
+                    breaker.record_success()
                     logger.warning(
                         f"Client error {resp.status_code} for {url}: {resp.text[:200]}"
                     )
@@ -126,7 +215,7 @@ class VBlogBaseClient(ABC):
                 
                 # Server error (5xx): retry
                 last_error = RuntimeError(f"HTTP {resp.status_code}: {resp.text[:500]}")
-                logger.warning(f"Server error {resp.status_code}, attempt {attempt + 1}/{self.max_retries}")
+                logger.warning(f"Server error {resp.status_code}, attempt {attempt + 1}/{max_attempts}")
                 
             except Exception as e:
                 last_error = e
@@ -134,20 +223,25 @@ class VBlogBaseClient(ABC):
                 # (e.g., anyio.EndOfStream, BrokenResourceError)
                 error_detail = str(e) if str(e) else f"{type(e).__name__}: args={e.args}"
                 logger.warning(
-                    f"Network error on attempt {attempt + 1}/{self.max_retries}: "
+                    f"Network error on attempt {attempt + 1}/{max_attempts}: "
                     f"{type(e).__name__} - {error_detail}",
                     exc_info=True  # Include full traceback for debugging
                 )
             
             attempt += 1
+            # Stop early if other calls tripped the circuit meanwhile
+            if attempt >= max_attempts or breaker.is_open:
+                break
             await asyncio.sleep(0.5 * attempt)  # Exponential backoff
+
+        breaker.record_failure()
         
         # Build detailed error message for final failure
         if last_error:
             error_msg = str(last_error) if str(last_error) else f"{type(last_error).__name__}: args={last_error.args}"
         else:
             error_msg = "Max retries exceeded"
-        logger.error(f"Failed after {self.max_retries} attempts: {error_msg}")
+        logger.error(f"Failed after {attempt} attempt(s): {error_msg}")
         return False, error_msg, 0
 
     @staticmethod
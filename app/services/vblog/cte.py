@@ -4,13 +4,79 @@ VBLOG CTe service for downloading CTe XML documents.
 Refactored from vblog_cte_service.py with shared base class.
 """
 
+import asyncio
 import xml.etree.ElementTree as ET
-from typing import Optional
+from typing import Dict, Iterable, Optional, Union
 
+from app.core.cpu_offload import run_cpu
 from app.utils.logger import logger
 from .base import VBlogBaseClient, NS
 
 
+def extract_cte_xml(xml_response: str) -> Optional[str]:
+    """
+    Extract CTe XML from VBLOG response.
+    Module-level (pure function of the text) so it can run on the CPU
+    offload executor, including a process pool.
+    
+    Args:
+        xml_response: VBLOG response XML
+        
+    Returns:
+        CTe XML string or None if not found
+    """
+    if not xml_response:
+        return None
+
+    try:
+        root = ET.fromstring(xml_response)
+    except ET.ParseError as e:
+        logger.error(f"XML parse error: {e}")
+        return None
+
+    # Check for API logical errors
+    for elem in root.iter():
+        if "Control" in elem.tag:
+            code = elem.find(".//{*}Cod") or elem.find("Cod")
+            desc = elem.find(".//{*}xDesc") or elem.find("xDesc")
+            
+            if code is not None and code.text not in ["001", "1"]:
+                msg = desc.text if desc is not None else "No description"
+                logger.warning(f"VBLOG API error: {msg}")
+
+    # Search for CTe XML content
+    possible_tags = ['xXMLCTe', 'xml', 'cteProc']
+    
+    for elem in root.iter():
+        tag_clean = elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag
+        
+        if tag_clean in possible_tags:
+            # Found the container element
+            if tag_clean == 'cteProc':
+                # This IS the CTe content
+                return ET.tostring(elem, encoding='unicode')
+            
+            # Check for nested cteProc
+            cte_proc = elem.find(".//{*}cteProc")
+            if cte_proc is not None:
+                return ET.tostring(cte_proc, encoding='unicode')
+            
+            # Check for text content (escaped XML)
+            if elem.text and elem.text.strip():
+                text = elem.text.strip()
+                if text.startswith('<'):
+                    return text
+            
+            # Check nested elements
+            for child in elem:
+                child_tag = child.tag.split('}')[-1] if '}' in child.tag else child.tag
+                if child_tag == 'cteProc':
+                    return ET.tostring(child, encoding='unicode')
+
+    logger.warning("CTe XML not found in response")
+    return None
+
+
 class VBlogCTeService(VBlogBaseClient):
     """
     Service for downloading CTe documents from VBLOG API.
@@ -89,56 +155,7 @@ class VBlogCTeService(VBlogBaseClient):
         Returns:
             CTe XML string or None if not found
         """
-        if not xml_response:
-            return None
-
-        try:
-            root = ET.fromstring(xml_response)
-        except ET.ParseError as e:
-            logger.error(f"XML parse error: {e}")
-            return None
-
-        # Check for API logical errors
-        for elem in root.iter():
-            if "Control" in elem.tag:
-                code = elem.find(".//{*}Cod") or elem.find("Cod")
-                desc = elem.find(".//{*}xDesc") or elem.find("xDesc")
-                
-                if code is not None and code.text not in ["001", "1"]:
-                    msg = desc.text if desc is not None else "No description"
-                    logger.warning(f"VBLOG API error: {msg}")
-
-        # Search for CTe XML content
-        possible_tags = ['xXMLCTe', 'xml', 'cteProc']
-        
-        for elem in root.iter():
-            tag_clean = elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag
-            
-            if tag_clean in possible_tags:
-                # Found the container element
-                if tag_clean == 'cteProc':
-                    # This IS the CTe content
-                    return ET.tostring(elem, encoding='unicode')
-                
-                # Check for nested cteProc
-                cte_proc = elem.find(".//{*}cteProc")
-                if cte_proc is not None:
-                    return ET.tostring(cte_proc, encoding='unicode')
-                
-                # Check for text content (escaped XML)
-                if elem.text and elem.text.strip():
-                    text = elem.text.strip()
-                    if text.startswith('<'):
-                        return text
-                
-                # Check nested elements
-                for child in elem:
-                    child_tag = child.tag.split('}')[-1] if '}' in child.tag else child.tag
-                    if child_tag == 'cteProc':
-                        return ET.tostring(child, encoding='unicode')
-
-        logger.warning("CTe XML not found in response")
-        return None
+        return extract_cte_xml(xml_response)
 
     async def download_cte(self, access_key: str) -> Optional[str]:
         """
@@ -155,7 +172,7 @@ class VBlogCTeService(VBlogBaseClient):
         try:
             xml = self.build_cte_request_xml(access_key)
             response = await self.send_cte_request(xml)
-            cte_xml = self.parse_cte_response(response)
+            cte_xml = await run_cpu(extract_cte_xml, response, size=len(response or ""))
             
             if cte_xml:
                 logger.info(f"CTe downloaded successfully: {access_key}")
@@ -168,6 +185,35 @@ class VBlogCTeService(VBlogBaseClient):
             logger.error(f"CTe download error: {access_key} - {e}")
             return None
 
+    async def download_many(
+        self,
+        access_keys: Iterable[str],
+        concurrency: int = 8,
+    ) -> Dict[str, Union[Optional[str], BaseException]]:
+        """
+        Download several CTe XMLs with at most `concurrency` requests in flight.
+
+        Args:
+            access_keys: CTe access keys to download
+            concurrency: Max simultaneous downloads
+
+        Returns:
+            Dict mapping each key to its XML (or None if not found), or to the
+            exception raised for that key. One failing key never aborts the others.
+        """
+        keys = list(access_keys)
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def _download(key: str) -> Optional[str]:
+            async with semaphore:
+                return await self.download_cte(key)
+
+        results = await asyncio.gather(
+            *(_download(key) for key in keys),
+            return_exceptions=True,
+        )
+        return dict(zip(keys, results))
+
     # Legacy method aliases
     def montar_xml_cte(self, chave: str) -> str:
         """Legacy alias for build_cte_request_xml."""
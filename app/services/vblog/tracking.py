@@ -4,12 +4,17 @@ VBLOG/Brudam tracking service for sending tracking events.
 Refactored from vblog_tracking.py with shared base class.
 """
 
+import asyncio
 import datetime
-from typing import Optional, Tuple, List
+import json
+import time
+from typing import Dict, Iterable, Optional, Tuple, List
+
+import httpx
 
 from app.utils.logger import logger
 from app.services.constants import VALID_CODES, VALID_CODES_SET
-from .base import VBlogBaseClient
+from .base import VBlogBaseClient, StreamingJSONBody
 
 
 class VBlogTrackingService(VBlogBaseClient):
@@ -17,6 +22,8 @@ class VBlogTrackingService(VBlogBaseClient):
     Service for sending tracking events to Brudam API.
     """
 
+    upstream = "brudam"
+
     def __init__(
         self,
         usuario: Optional[str] = None,
@@ -24,9 +31,10 @@ class VBlogTrackingService(VBlogBaseClient):
         endpoint: Optional[str] = None,
         cliente: Optional[str] = None,
         timeout: float = 10.0,
+        client: Optional[httpx.AsyncClient] = None,
     ):
         # Tracking uses different auth, so we don't call super().__init__ with cnpj/token
-        super().__init__(timeout=timeout)
+        super().__init__(timeout=timeout, client=client)
         self.usuario = usuario
         self.senha = senha
         self.endpoint = endpoint
@@ -50,40 +58,109 @@ class VBlogTrackingService(VBlogBaseClient):
             event_date: Event timestamp
             observation: Optional observation text
             document_type: Document type (NFE, PEDIDO, etc.)
-            attachments: Optional list of attachment dicts
+            attachments: Optional list of attachment dicts or AttachmentRefs
             
         Returns:
-            JSON-serializable payload dict
+            Payload dict (JSON-serializable via StreamingJSONBody when it
+            holds AttachmentRefs)
+        """
+        return self.build_batch_payload(
+            document_keys=[document_key],
+            event_code=event_code,
+            event_date=event_date,
+            observation=observation,
+            document_type=document_type,
+            attachments=attachments,
+        )
+
+    def build_batch_payload(
+        self,
+        document_keys: Iterable[str],
+        event_code: str,
+        event_date: Optional[datetime.datetime] = None,
+        observation: Optional[str] = None,
+        document_type: str = "NFE",
+        attachments: Optional[List[dict]] = None,
+    ) -> dict:
+        """
+        Build one JSON payload carrying the same event for many documents
+        (one entry per key in `documentos`). Every document shares the same
+        `attachments` list object rather than a copy of it.
         """
         if event_code not in VALID_CODES_SET:
             raise ValueError(f"Invalid Brudam event code: {event_code}")
 
         date_fmt = (event_date or datetime.datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
-
-        document = {
-            "cliente": self.cliente,
-            "tipo": document_type or "PEDIDO",
-            "chave": document_key,
-            "eventos": [
-                {
-                    "codigo": int(event_code),
-                    "data": date_fmt,
-                    "obs": observation or VALID_CODES[event_code]["message"]
-                }
-            ]
+        event = {
+            "codigo": int(event_code),
+            "data": date_fmt,
+            "obs": observation or VALID_CODES[event_code]["message"]
         }
 
-        if attachments:
-            document["anexos"] = attachments
+        documents = []
+        for document_key in document_keys:
+            document = {
+                "cliente": self.cliente,
+                "tipo": document_type or "PEDIDO",
+                "chave": document_key,
+                "eventos": [event],
+            }
+            if attachments:
+                document["anexos"] = attachments
+            documents.append(document)
 
         return {
             "auth": {
                 "usuario": self.usuario,
                 "senha": self.senha
             },
-            "documentos": [document]
+            "documentos": documents
         }
 
+    @staticmethod
+    def parse_batch_response(
+        response_text: str,
+        document_keys: List[str],
+        batch_ok: bool,
+    ) -> Dict[str, Tuple[bool, str]]:
+        """
+        Map a batch response back to each document.
+
+        Per-document entries are read from a JSON list (top level or under
+        data/documentos/retorno/resultados) whose items carry the document
+        key in `chave`/`documento`. Documents without an entry get the
+        outcome of the whole request.
+        """
+        results = {key: (batch_ok, response_text) for key in document_keys}
+        try:
+            body = json.loads(response_text)
+        except (TypeError, ValueError):
+            return results
+
+        items = body
+        if isinstance(body, dict):
+            items = next(
+                (body[name] for name in ("data", "documentos", "retorno", "resultados")
+                 if isinstance(body.get(name), list)),
+                [],
+            )
+        if not isinstance(items, list):
+            return results
+
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            key = item.get("chave") or item.get("documento")
+            if key not in results:
+                continue
+            if "erro" in item or "error" in item:
+                ok = False
+            else:
+                status = item.get("status", item.get("sucesso", batch_ok))
+                ok = status in (True, 1, "1", "ok", "OK", "sucesso")
+            results[key] = (ok, json.dumps(item, ensure_ascii=False))
+        return results
+
     async def send(
         self,
         document_key: str,
@@ -102,7 +179,7 @@ class VBlogTrackingService(VBlogBaseClient):
             event_date: Event timestamp
             observation: Optional observation text
             document_type: Document type (NFE, PEDIDO, etc.)
-            attachments: Optional list of attachment dicts
+            attachments: Optional list of attachment dicts or AttachmentRefs
             
         Returns:
             Tuple of (success, response_text)
@@ -123,7 +200,8 @@ class VBlogTrackingService(VBlogBaseClient):
 
         success, response, status = await self._send_with_retry(
             url=self.endpoint,
-            payload=payload,
+            # Attachment files are streamed into the body, not copied into it
+            payload=StreamingJSONBody(payload) if attachments else payload,
             content_type="application/json",
         )
 
@@ -134,6 +212,146 @@ class VBlogTrackingService(VBlogBaseClient):
 
         return success, response
 
+    async def send_many(
+        self,
+        document_keys: List[str],
+        event_code: str,
+        event_date: Optional[datetime.datetime] = None,
+        observation: Optional[str] = None,
+        document_type: str = "NFE",
+        batch_size: int = 50,
+    ) -> Dict[str, Tuple[bool, str]]:
+        """
+        Send the same tracking event for many documents, `batch_size`
+        documents per Brudam request. When a batch request fails, its
+        documents are resent one request each (send_each), so a single
+        rejected document does not fail the rest of its batch.
+
+        Returns:
+            Dict of document_key -> (success, response_text)
+        """
+        if not document_keys:
+            return {}
+        if not self.endpoint:
+            raise ValueError("Brudam tracking endpoint not configured")
+
+        batch_size = max(1, batch_size)
+        results: Dict[str, Tuple[bool, str]] = {}
+
+        for start in range(0, len(document_keys), batch_size):
+            batch = document_keys[start:start + batch_size]
+            payload = self.build_batch_payload(
+                document_keys=batch,
+                event_code=event_code,
+                event_date=event_date,
+                observation=observation,
+                document_type=document_type,
+            )
+
+            logger.debug(f"Sending tracking batch: {len(batch)} documents - code {event_code}")
+
+            success, response, status = await self._send_with_retry(
+                url=self.endpoint,
+                payload=payload,
+                content_type="application/json",
+            )
+            batch_results = self.parse_batch_response(response, batch, success)
+            if not success and len(batch) > 1:
+                # A rejected request fails every document in it (one bad key is
+                # enough); resend the unconfirmed ones individually so only the
+                # offending documents fail
+                retry_keys = [key for key, (ok, _) in batch_results.items() if not ok]
+                logger.warning(
+                    f"Tracking batch failed - {response[:200]}; "
+                    f"resending {len(retry_keys)} documents one by one"
+                )
+                single = await self.send_each(
+                    document_keys=retry_keys,
+                    event_code=event_code,
+                    event_date=event_date,
+                    observation=observation,
+                    document_type=document_type,
+                )
+                batch_results.update(
+                    (key, (ok, text)) for key, (ok, text, _) in zip(retry_keys, single)
+                )
+            results.update(batch_results)
+
+            failed = sum(1 for ok, _ in batch_results.values() if not ok)
+            if failed:
+                logger.warning(
+                    f"Tracking batch: {failed}/{len(batch)} documents failed - {response[:200]}"
+                )
+            else:
+                logger.info(f"Tracking batch sent successfully: {len(batch)} documents")
+
+        return results
+
+    async def send_each(
+        self,
+        document_keys: List[str],
+        event_code: str,
+        event_date: Optional[datetime.datetime] = None,
+        observation: Optional[str] = None,
+        document_type: str = "NFE",
+        attachments: Optional[List[dict]] = None,
+        concurrency: int = 8,
+        cancel_event: Optional[asyncio.Event] = None,
+    ) -> List[Tuple[bool, str, float]]:
+        """
+        Send one request per document, at most `concurrency` in flight.
+
+        Setting `cancel_event` cancels the sends still pending or in flight;
+        they are reported as failed.
+
+        Returns:
+            List of (success, response_text, elapsed_ms), in document_keys order
+        """
+        if not self.endpoint:
+            raise ValueError("Brudam tracking endpoint not configured")
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        results: List[Optional[Tuple[bool, str, float]]] = [None] * len(document_keys)
+
+        async def send_one(index: int, document_key: str) -> None:
+            started = time.perf_counter()
+            try:
+                async with semaphore:
+                    started = time.perf_counter()
+                    success, response = await self.send(
+                        document_key=document_key,
+                        event_code=event_code,
+                        event_date=event_date,
+                        observation=observation,
+                        document_type=document_type,
+                        attachments=attachments,
+                    )
+            except asyncio.CancelledError:
+                results[index] = (False, "Cancelled", round((time.perf_counter() - started) * 1000, 1))
+                raise
+            except Exception as e:
+                success, response = False, str(e)
+            results[index] = (success, response, round((time.perf_counter() - started) * 1000, 1))
+
+        async def cancel_on_event(tasks: List[asyncio.Task]) -> None:
+            await cancel_event.wait()
+            logger.warning("Tracking fan-out cancelled; dropping pending sends")
+            for task in tasks:
+                task.cancel()
+
+        async with asyncio.TaskGroup() as group:
+            tasks = [
+                group.create_task(send_one(index, key))
+                for index, key in enumerate(document_keys)
+            ]
+            watcher = group.create_task(cancel_on_event(tasks)) if cancel_event else None
+            if tasks:
+                await asyncio.wait(tasks)
+            if watcher:
+                watcher.cancel()
+
+        return [result or (False, "Cancelled", 0.0) for result in results]
+
     # Legacy method alias for backward compatibility
     async def enviar(
         self,
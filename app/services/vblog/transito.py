@@ -8,6 +8,9 @@ from typing import List, Optional
 from pydantic import BaseModel, Field
 import xml.etree.ElementTree as ET
 
+import httpx
+
+from app.core.cpu_offload import run_cpu
 from app.utils.logger import logger
 from .base import VBlogBaseClient, NS, NSMAP
 
@@ -63,6 +66,101 @@ class TransitResponse(BaseModel):
     warnings: List[str] = Field(default_factory=list)
 
 
+# -----------------------
+# Parsing
+# -----------------------
+def _find_text(root: ET.Element, path: str) -> Optional[str]:
+    """Safely find text in XML element."""
+    elem = root.find(path, NSMAP)
+    return elem.text.strip() if elem is not None and elem.text else None
+
+
+def parse_transit_xml(xml_text: str) -> TransitResponse:
+    """
+    Parse a transit query response into structured models.
+    Resilient: missing fields result in None/empty lists.
+    Module-level (pure function of the text) so it can run on the CPU
+    offload executor, including a process pool.
+    """
+    result = TransitResponse(raw_xml=xml_text)
+
+    try:
+        root = ET.fromstring(xml_text)
+    except ET.ParseError as e:
+        result.warnings.append(f"Invalid XML: {e}")
+        return result
+
+    # Code and description (Control)
+    code_text = _find_text(root, ".//ns:Control/ns:Cod")
+    try:
+        result.code = int(code_text) if code_text and code_text.isdigit() else None
+    except Exception:
+        result.code = None
+
+    result.description = _find_text(root, ".//ns:Control/ns:xDesc")
+    result.protocol = _find_text(root, ".//ns:nProt")
+
+    # Code 13 = no documents (not an error)
+    if result.code == 13:
+        result.warnings.append("Code 13 - No documents found")
+
+    # Find all ControleTransito nodes
+    control_nodes = root.findall(".//ns:ControleTransito", NSMAP)
+    for ct_node in control_nodes:
+        ct_model = TransitControl()
+        ct_model.transport_doc = ct_node.attrib.get("xDocTransp")
+
+        # Parse Docs within each ControleTransito
+        docs_nodes = ct_node.findall(".//ns:Docs", NSMAP)
+        for docs_node in docs_nodes:
+            for child in list(docs_node):
+                tag = child.tag
+                local = tag.split("}", 1)[1] if "}" in tag else tag
+                
+                doc = Document(
+                    type=local,
+                    value=child.text.strip() if child.text else None,
+                    doc_end=child.attrib.get("xDocFim"),
+                    operation_type=child.attrib.get("tpOp"),
+                    other_attrs={k: v for k, v in child.attrib.items() 
+                                if k not in ("xDocFim", "tpOp")},
+                )
+                ct_model.docs.append(doc)
+
+            ct_model.other.update(docs_node.attrib)
+
+        # Parse road modal (optional)
+        modal_node = ct_node.find(".//ns:infModalRodoviario", NSMAP)
+        if modal_node is not None:
+            modal = RoadModal()
+            
+            cpf_node = modal_node.find(".//ns:CPFmotorista", NSMAP)
+            name_node = modal_node.find(".//ns:NomeMotorista", NSMAP)
+            
+            driver = Driver()
+            if cpf_node is not None and cpf_node.text:
+                driver.cpf = cpf_node.text.strip()
+            if name_node is not None and name_node.text:
+                driver.name = name_node.text.strip()
+            modal.driver = driver
+
+            vehicle = Vehicle()
+            traction_node = modal_node.find(".//ns:Tracao", NSMAP)
+            trailer_node = modal_node.find(".//ns:Reboque", NSMAP)
+            if traction_node is not None and traction_node.text:
+                vehicle.traction = traction_node.text.strip()
+            if trailer_node is not None and trailer_node.text:
+                vehicle.trailer = trailer_node.text.strip()
+            modal.vehicle = vehicle
+
+            ct_model.road_modal = modal
+
+        ct_model.other.update(ct_node.attrib)
+        result.transits.append(ct_model)
+
+    return result
+
+
 class VBlogTransitoService(VBlogBaseClient):
     """
     Service for querying open transits from VBLOG API.
@@ -74,8 +172,9 @@ class VBlogTransitoService(VBlogBaseClient):
         token: Optional[str] = None,
         base_url: Optional[str] = None,
         timeout: float = 10.0,
+        client: Optional[httpx.AsyncClient] = None,
     ):
-        super().__init__(cnpj=cnpj, token=token, base_url=base_url, timeout=timeout)
+        super().__init__(cnpj=cnpj, token=token, base_url=base_url, timeout=timeout, client=client)
         self.endpoint = f"{self.base_url}/Webapi/transito/aberto/v2" if self.base_url else None
 
     def build_request_xml(self, return_type: int = 7, transit_status: int = 2) -> str:
@@ -112,91 +211,14 @@ class VBlogTransitoService(VBlogBaseClient):
 
     def _safe_find_text(self, root: ET.Element, path: str) -> Optional[str]:
         """Safely find text in XML element."""
-        elem = root.find(path, NSMAP)
-        return elem.text.strip() if elem is not None and elem.text else None
+        return _find_text(root, path)
 
     def parse_response(self, xml_text: str) -> TransitResponse:
         """
         Parse XML response into structured models.
         Resilient: missing fields result in None/empty lists.
         """
-        result = TransitResponse(raw_xml=xml_text)
-
-        try:
-            root = ET.fromstring(xml_text)
-        except ET.ParseError as e:
-            result.warnings.append(f"Invalid XML: {e}")
-            return result
-
-        # Code and description (Control)
-        code_text = self._safe_find_text(root, ".//ns:Control/ns:Cod")
-        try:
-            result.code = int(code_text) if code_text and code_text.isdigit() else None
-        except Exception:
-            result.code = None
-
-        result.description = self._safe_find_text(root, ".//ns:Control/ns:xDesc")
-        result.protocol = self._safe_find_text(root, ".//ns:nProt")
-
-        # Code 13 = no documents (not an error)
-        if result.code == 13:
-            result.warnings.append("Code 13 - No documents found")
-
-        # Find all ControleTransito nodes
-        control_nodes = root.findall(".//ns:ControleTransito", NSMAP)
-        for ct_node in control_nodes:
-            ct_model = TransitControl()
-            ct_model.transport_doc = ct_node.attrib.get("xDocTransp")
-
-            # Parse Docs within each ControleTransito
-            docs_nodes = ct_node.findall(".//ns:Docs", NSMAP)
-            for docs_node in docs_nodes:
-                for child in list(docs_node):
-                    tag = child.tag
-                    local = tag.split("}", 1)[1] if "}" in tag else tag
-                    
-                    doc = Document(
-                        type=local,
-                        value=child.text.strip() if child.text else None,
-                        doc_end=child.attrib.get("xDocFim"),
-                        operation_type=child.attrib.get("tpOp"),
-                        other_attrs={k: v for k, v in child.attrib.items() 
-                                    if k not in ("xDocFim", "tpOp")},
-                    )
-                    ct_model.docs.append(doc)
-
-                ct_model.other.update(docs_node.attrib)
-
-            # Parse road modal (optional)
-            modal_node = ct_node.find(".//ns:infModalRodoviario", NSMAP)
-            if modal_node is not None:
-                modal = RoadModal()
-                
-                cpf_node = modal_node.find(".//ns:CPFmotorista", NSMAP)
-                name_node = modal_node.find(".//ns:NomeMotorista", NSMAP)
-                
-                driver = Driver()
-                if cpf_node is not None and cpf_node.text:
-                    driver.cpf = cpf_node.text.strip()
-                if name_node is not None and name_node.text:
-                    driver.name = name_node.text.strip()
-                modal.driver = driver
-
-                vehicle = Vehicle()
-                traction_node = modal_node.find(".//ns:Tracao", NSMAP)
-                trailer_node = modal_node.find(".//ns:Reboque", NSMAP)
-                if traction_node is not None and traction_node.text:
-                    vehicle.traction = traction_node.text.strip()
-                if trailer_node is not None and trailer_node.text:
-                    vehicle.trailer = trailer_node.text.strip()
-                modal.vehicle = vehicle
-
-                ct_model.road_modal = modal
-
-            ct_model.other.update(ct_node.attrib)
-            result.transits.append(ct_model)
-
-        return result
+        return parse_transit_xml(xml_text)
 
     async def query_open_transits(
         self, 
@@ -217,7 +239,7 @@ class VBlogTransitoService(VBlogBaseClient):
             ret.warnings.append(f"Request failed: {e}")
             return ret
 
-        return self.parse_response(response)
+        return await run_cpu(parse_transit_xml, response, size=len(response or ""))
 
     # Legacy method aliases for backward compatibility
     async def consultar_transito_aberto(self, tpRet: int = 7, stTransito: int = 2) -> TransitResponse:
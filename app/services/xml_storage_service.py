@@ -0,0 +1,93 @@
+# app/services/xml_storage_service.py
+"""
+XML storage service.
+Re-encodes stored CTe XML (cte_documents) into the current storage format in chunks
+(legacy uncompressed Fernet tokens -> compressed "z1:" tokens, and
+Fernet text <-> AES-GCM envelopes when XML_CIPHER changes).
+"""
+
+from typing import Optional, Tuple, Type
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, and_, or_
+
+from app.models.base import EncryptedXMLMixin
+from app.config.settings import settings
+from app.services.crypto_service import COMPRESSED_PREFIX, decrypt_text, decrypt_envelope
+from app.utils.logger import logger
+
+
+# Rows read and rewritten per transaction
+REENCODE_CHUNK = 500
+
+
+class XMLStorageService:
+    """Service for the stored format of encrypted CTe XML."""
+
+    @staticmethod
+    def stale_filter(model: Type[EncryptedXMLMixin]):
+        """WHERE clause matching rows not stored in the current format."""
+        fernet_rows = and_(model.xml_encrypted.is_not(None), model.xml_encrypted != "")
+        if settings.xml_cipher == "aesgcm":
+            return fernet_rows
+        stale_text = and_(fernet_rows, model.xml_encrypted.not_like(f"{COMPRESSED_PREFIX}%"))
+        return or_(stale_text, model.xml_blob.is_not(None))
+
+    @staticmethod
+    async def reencode_chunk(
+        db: AsyncSession,
+        model: Type[EncryptedXMLMixin],
+        after_id: Optional[UUID] = None,
+        limit: int = REENCODE_CHUNK,
+    ) -> Tuple[int, int, Optional[UUID]]:
+        """
+        Re-encode up to `limit` stale rows of `model` with id > after_id.
+
+        Rows are walked in id order (keyset), so rows that cannot be
+        decrypted are skipped rather than retried forever. Commits the chunk.
+        Returns (rows scanned, rows rewritten, last id scanned).
+        """
+        query = (
+            select(model.id, model.xml_encrypted, model.xml_blob)
+            .where(XMLStorageService.stale_filter(model))
+            .order_by(model.id)
+            .limit(limit)
+        )
+        if after_id is not None:
+            query = query.where(model.id > after_id)
+        rows = (await db.execute(query)).all()
+        if not rows:
+            return 0, 0, None
+
+        updates = []
+        for row_id, token, blob in rows:
+            plain = decrypt_envelope(blob) if blob is not None else decrypt_text(token)
+            if plain is None:
+                logger.warning(f"{model.__tablename__} {row_id}: XML could not be decrypted; left as is")
+                continue
+            updates.append({"id": row_id, **model.encode_xml(plain)})
+
+        if updates:
+            await db.execute(update(model), updates)
+        await db.commit()
+        return len(rows), len(updates), rows[-1][0]
+
+    @staticmethod
+    async def reencode_all(
+        db: AsyncSession,
+        model: Type[EncryptedXMLMixin],
+        chunk_size: int = REENCODE_CHUNK,
+    ) -> int:
+        """Re-encode every stale row of `model`, one chunk per transaction. Returns rows rewritten."""
+        after_id = None
+        total = 0
+        while True:
+            scanned, rewritten, after_id = await XMLStorageService.reencode_chunk(
+                db, model, after_id, chunk_size
+            )
+            if not scanned:
+                break
+            total += rewritten
+            logger.info(f"{model.__tablename__}: re-encoded {total} XML rows so far")
+        return total
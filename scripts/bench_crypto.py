@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark CTe XML storage ciphers.
+
+Compares encrypt/decrypt throughput and stored size of Fernet text tokens
+and AES-GCM binary envelopes (each with and without zlib compression) on
+generated CTe documents shaped like VBLOG downloads (cteProc with NF-e
+references and signature).
+
+Usage:
+    FERNET_KEY=... python scripts/bench_crypto.py --docs 200 --nfes 40
+"""
+import argparse
+import os
+import random
+import statistics
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import app.services  # noqa: F401  (loads services/models in dependency order)
+from app.services import crypto_service
+
+
+def build_cte_xml(nfes: int) -> str:
+    """A cteProc document with `nfes` NF-e references (sizes comparable to real CTes)."""
+    rnd = random.Random(nfes)
+    digits = lambda n: "".join(rnd.choice(string.digits) for _ in range(n))  # noqa: E731
+    b64 = lambda n: "".join(rnd.choice(string.ascii_letters + string.digits + "+/") for _ in range(n))  # noqa: E731
+    key = digits(44)
+    nfe_refs = "".join(f"<infNFe><chave>{digits(44)}</chave></infNFe>" for _ in range(nfes))
+    party = (
+        "<CNPJ>{cnpj}</CNPJ><IE>{ie}</IE><xNome>CENTAURO TRANSPORTES E LOGISTICA LTDA</xNome>"
+        "<enderReme><xLgr>RUA DAS INDUSTRIAS</xLgr><nro>{nro}</nro><xBairro>DISTRITO INDUSTRIAL</xBairro>"
+        "<cMun>3550308</cMun><xMun>SAO PAULO</xMun><CEP>{cep}</CEP><UF>SP</UF></enderReme>"
+    )
+    parties = "".join(
+        f"<{tag}>" + party.format(cnpj=digits(14), ie=digits(12), nro=digits(4), cep=digits(8)) + f"</{tag}>"
+        for tag in ("emit", "rem", "exped", "receb", "dest")
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<cteProc xmlns="http://www.portalfiscal.inf.br/cte" versao="4.00">'
+        f'<CTe><infCte Id="CTe{key}" versao="4.00">'
+        f"<ide><cUF>35</cUF><cCT>{digits(8)}</cCT><CFOP>6353</CFOP>"
+        "<natOp>PRESTACAO DE SERVICO DE TRANSPORTE</natOp><mod>57</mod><serie>1</serie>"
+        f"<nCT>{digits(6)}</nCT><dhEmi>2026-10-17T10:00:00-03:00</dhEmi><tpImp>1</tpImp></ide>"
+        f"{parties}"
+        "<vPrest><vTPrest>1520.35</vTPrest><vRec>1520.35</vRec></vPrest>"
+        f"<infCTeNorm><infCarga><vCarga>98213.50</vCarga><proPred>CALCADOS E ARTIGOS ESPORTIVOS</proPred>"
+        f"</infCarga><infDoc>{nfe_refs}</infDoc></infCTeNorm>"
+        "</infCte>"
+        f'<Signature xmlns="http://www.w3.org/2000/09/xmldsig#"><SignedInfo>'
+        f"<DigestValue>{b64(28)}</DigestValue></SignedInfo>"
+        f"<SignatureValue>{b64(344)}</SignatureValue>"
+        f"<KeyInfo><X509Data><X509Certificate>{b64(2400)}</X509Certificate></X509Data></KeyInfo>"
+        "</Signature></CTe>"
+        f"<protCTe><infProt><chCTe>{key}</chCTe><nProt>{digits(15)}</nProt><cStat>100</cStat>"
+        "<xMotivo>Autorizado o uso do CT-e</xMotivo></infProt></protCTe>"
+        "</cteProc>"
+    )
+
+
+def ensure_aesgcm_key() -> None:
+    """Use the configured AES-GCM key ring, or a throwaway key for the benchmark."""
+    if crypto_service.ACTIVE_AESGCM_KEY_ID is None:
+        crypto_service.aesgcm_keys = {1: crypto_service.AESGCM(os.urandom(32))}
+        crypto_service.ACTIVE_AESGCM_KEY_ID = 1
+
+
+def bench(docs: list[str], encrypt, decrypt, repeat: int) -> dict:
+    stored = [encrypt(doc) for doc in docs]
+    assert [decrypt(token) for token in stored] == docs
+
+    enc_runs, dec_runs = [], []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for doc in docs:
+            encrypt(doc)
+        enc_runs.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for token in stored:
+            decrypt(token)
+        dec_runs.append(time.perf_counter() - started)
+
+    plain_mb = sum(len(doc.encode("utf-8")) for doc in docs) / 1e6
+    return {
+        "enc_ms": statistics.median(enc_runs) * 1000,
+        "dec_ms": statistics.median(dec_runs) * 1000,
+        "enc_mbs": plain_mb / statistics.median(enc_runs),
+        "dec_mbs": plain_mb / statistics.median(dec_runs),
+        "stored": sum(len(token) for token in stored),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--docs", type=int, default=200, help="documents per run")
+    parser.add_argument("--nfes", type=int, default=40, help="NF-e references per document (max)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    ensure_aesgcm_key()
+    docs = [build_cte_xml(1 + i % args.nfes) for i in range(args.docs)]
+    plain = sum(len(doc.encode("utf-8")) for doc in docs)
+    print(f"{len(docs)} documents, {plain / len(docs) / 1024:.1f} KiB average, {plain / 1e6:.2f} MB total\n")
+
+    variants = {
+        "fernet": (lambda d: crypto_service.encrypt_text(d), crypto_service.decrypt_text),
+        "fernet+zlib": (lambda d: crypto_service.encrypt_text(d, compress=True), crypto_service.decrypt_text),
+        "aesgcm": (lambda d: crypto_service.encrypt_envelope(d), crypto_service.decrypt_envelope),
+        "aesgcm+zlib": (lambda d: crypto_service.encrypt_envelope(d, compress=True), crypto_service.decrypt_envelope),
+    }
+    print(f"{'variant':<12} {'encrypt':>10} {'MB/s':>8} {'decrypt':>10} {'MB/s':>8} {'stored':>10} {'ratio':>6}")
+    for name, (encrypt, decrypt) in variants.items():
+        r = bench(docs, encrypt, decrypt, args.repeat)
+        print(
+            f"{name:<12} {r['enc_ms']:>8.1f}ms {r['enc_mbs']:>8.1f} {r['dec_ms']:>8.1f}ms "
+            f"{r['dec_mbs']:>8.1f} {r['stored'] / 1e6:>8.2f}MB {r['stored'] / plain:>6.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
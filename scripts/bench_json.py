@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark JSON rendering of ShipmentRead list payloads.
+
+Compares FastAPI's stdlib-based JSONResponse with ORJSONResponse (the
+application's default response class) on the same encoded content, i.e.
+the work done after the response model has been validated.
+
+Usage:
+    python scripts/bench_json.py --shipments 500 --ctes 5 --invoices 20
+"""
+import argparse
+import datetime
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+import app.services  # noqa: F401  (loads services/models in dependency order)
+from app.schemas.shipment import ShipmentRead
+
+
+def build_payload(shipments: int, ctes: int, invoices: int) -> list:
+    """ShipmentRead list shaped like GET /shipments output."""
+    now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    items = []
+    for s in range(shipments):
+        shipment_id = uuid.uuid4()
+        items.append(ShipmentRead.model_validate({
+            "id": shipment_id,
+            "status": {"code": "1"},
+            "external_id": f"EXT{s}",
+            "client_id": "CENTAURO",
+            "origin_state": {"code": "35", "abbreviation": "SP"},
+            "destination_city": {"code": "3550308", "name": "Sao Paulo"},
+            "client_ctes": [
+                {
+                    "id": uuid.uuid4(),
+                    "shipment_id": shipment_id,
+                    "access_key": f"3524{s:020d}{c:020d}",
+                    "invoices": [
+                        {
+                            "key": f"3524{s:014d}{c:013d}{i:013d}",
+                            "status": {"code": "1", "message": f"Em transito {now}", "type": "info"},
+                        }
+                        for i in range(invoices)
+                    ],
+                }
+                for c in range(ctes)
+            ],
+        }))
+    return items
+
+
+def bench(render, content, repeat: int) -> list:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = render(content)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shipments", type=int, default=500)
+    parser.add_argument("--ctes", type=int, default=5, help="Client CTes per shipment")
+    parser.add_argument("--invoices", type=int, default=20, help="Invoices per CTe")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    models = build_payload(args.shipments, args.ctes, args.invoices)
+    content = jsonable_encoder(models)
+
+    results = {}
+    for name, response_class in (("JSONResponse", JSONResponse), ("ORJSONResponse", ORJSONResponse)):
+        renderer = response_class.__new__(response_class)
+        timings, size = bench(renderer.render, content, args.repeat)
+        results[name] = statistics.median(timings)
+        print(
+            f"{name:<16} median {results[name]:8.2f} ms  "
+            f"p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:8.2f} ms  body {size / 1024:,.0f} KiB"
+        )
+
+    print(f"speedup          {results['JSONResponse'] / results['ORJSONResponse']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark event-loop lag while large VBLOG responses are processed.
+
+Runs the same workload (parse a large open-transit response, then
+compress/encrypt a batch of CTe XML) under each CPU executor kind while
+a LoopLagMonitor samples the loop, and prints the observed lag.
+
+Usage:
+    FERNET_KEY=... python scripts/bench_loop_lag.py --transits 20000 --ctes 200
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import app.services  # noqa: F401  (loads services/models in dependency order)
+from app.core.cpu_offload import CPUOffloader
+from app.core.loop_lag import LoopLagMonitor
+from app.core import cpu_offload
+from app.services.shipment_sync_service import encode_xml_batch
+from app.services.vblog.transito import parse_transit_xml
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from bench_crypto import build_cte_xml  # noqa: E402
+
+
+def build_transit_xml(transits: int) -> str:
+    """Open-transit response with `transits` ControleTransito nodes."""
+    nodes = "".join(
+        f'<ControleTransito xDocTransp="{i}"><Docs><chaveCTe>{i:044d}</chaveCTe></Docs>'
+        "<infModalRodoviario><CPFmotorista>00000000000</CPFmotorista>"
+        "<NomeMotorista>MOTORISTA TESTE</NomeMotorista><Tracao>ABC1D23</Tracao></infModalRodoviario>"
+        "</ControleTransito>"
+        for i in range(transits)
+    )
+    return (
+        '<retDocSubTransito xmlns="http://www.controleembarque.com.br">'
+        f"<Control><Cod>001</Cod><xDesc>OK</xDesc></Control>{nodes}</retDocSubTransito>"
+    )
+
+
+async def run(kind: str, transit_xml: str, cte_xmls: list[str]) -> dict:
+    offloader = CPUOffloader(kind=kind, workers=2, min_bytes=64 * 1024)
+    cpu_offload.cpu_offloader = offloader
+    # Warm the pool so worker start-up is not counted as lag
+    warmup = build_transit_xml(1)
+    await offloader.run(parse_transit_xml, warmup, size=offloader.min_bytes)
+
+    monitor = LoopLagMonitor(interval=0.005)
+    monitor.start()
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    try:
+        parsed = await cpu_offload.run_cpu(parse_transit_xml, transit_xml, size=len(transit_xml))
+        await cpu_offload.run_cpu(encode_xml_batch, cte_xmls, size=sum(map(len, cte_xmls)))
+        elapsed = time.perf_counter() - started
+        await asyncio.sleep(0.05)
+    finally:
+        await monitor.stop()
+        offloader.shutdown()
+    return {"elapsed_ms": elapsed * 1000, "transits": len(parsed.transits), **monitor.snapshot()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--transits", type=int, default=20000)
+    parser.add_argument("--ctes", type=int, default=200)
+    args = parser.parse_args()
+
+    transit_xml = build_transit_xml(args.transits)
+    cte_xmls = [build_cte_xml(40) for _ in range(args.ctes)]
+    print(
+        f"transit response {len(transit_xml) / 1e6:.1f} MB, "
+        f"{len(cte_xmls)} CTe XMLs {sum(map(len, cte_xmls)) / 1e6:.1f} MB\n"
+    )
+    print(f"{'executor':<8} {'work':>9} {'max lag':>9} {'p99 lag':>9}")
+    for kind in ("none", "thread", "process"):
+        r = asyncio.run(run(kind, transit_xml, cte_xmls))
+        print(f"{kind:<8} {r['elapsed_ms']:>7.0f}ms {r['max_ms']:>7.1f}ms {r['p99_ms']:>7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Re-encode stored CTe XML into the current storage format.
+
+Rewrites cte_documents rows whose XML is not in the format selected by
+XML_CIPHER / XML_COMPRESS_LEVEL (legacy uncompressed Fernet tokens, or
+Fernet text after switching to AES-GCM envelopes), one chunk per
+transaction.
+
+Safe to stop and re-run: already converted rows are skipped, and the
+application reads both formats in the meantime.
+
+Usage:
+    python scripts/reencode_xml.py --chunk-size 500
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import app.services  # noqa: F401  (loads services/models in dependency order)
+from app.core.database import AsyncSessionLocal
+from app.models.cte_document import CTeDocument
+from app.services.xml_storage_service import REENCODE_CHUNK, XMLStorageService
+
+
+async def main(chunk_size: int) -> None:
+    async with AsyncSessionLocal() as db:
+        total = await XMLStorageService.reencode_all(db, CTeDocument, chunk_size)
+    print(f"{CTeDocument.__tablename__}: {total} rows re-encoded")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunk-size", type=int, default=REENCODE_CHUNK)
+    args = parser.parse_args()
+    asyncio.run(main(args.chunk_size))
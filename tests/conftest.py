@@ -83,6 +83,16 @@ async def client(db_session: AsyncSession):
     app.dependency_overrides.clear()
 
 
+@pytest_asyncio.fixture(scope="function")
+async def session_factory(tmp_path):
+    """File-backed database so background workers' sessions see each other's commits."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+
 # Legacy fixture names for backward compatibility
 @pytest_asyncio.fixture(scope="function")
 async def async_client(client):
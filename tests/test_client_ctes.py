@@ -0,0 +1,257 @@
+# tests/test_client_ctes.py
+"""
+Tests for client CTe services.
+Tests the service layer directly against an in-memory database.
+"""
+
+import pytest
+
+from app.models.shipment import Shipment
+from app.models.client_cte import ClientCTe
+from app.models.cte_document import CTeDocument
+from app.services.client_cte_service import ClientCTeService
+from app.services.cte_document_service import CTeDocumentService
+
+
+async def _make_cte(db, access_key: str, invoices=None) -> ClientCTe:
+    shipment = Shipment()
+    db.add(shipment)
+    await db.flush()
+    cte = ClientCTe(shipment_id=shipment.id, access_key=access_key)
+    cte.xml = f"<cteProc>{access_key}</cteProc>"
+    cte.invoices = invoices or []
+    db.add(cte)
+    await db.commit()
+    return cte
+
+
+@pytest.mark.asyncio
+async def test_get_many_by_access_keys_chunked(db_session):
+    """Test bulk resolution of access keys across several IN chunks."""
+    for i in range(5):
+        await _make_cte(db_session, f"KEY{i}")
+    db_session.expunge_all()
+
+    found = await ClientCTeService.get_many_by_access_keys(
+        db_session, ["KEY0", "KEY3", "KEY4", "MISSING"], chunk_size=2
+    )
+
+    assert set(found) == {"KEY0", "KEY3", "KEY4"}
+    assert found["KEY3"].access_key == "KEY3"
+
+
+@pytest.mark.asyncio
+async def test_prefetched_cte_can_be_updated(db_session):
+    """Test a prefetched (partially loaded) CTe still supports XML/invoice updates."""
+    await _make_cte(db_session, "KEYX", invoices=["NF1"])
+    db_session.expunge_all()
+
+    cte = (await ClientCTeService.get_many_by_access_keys(db_session, ["KEYX"]))["KEYX"]
+    cte = await ClientCTeService.update_xml(db_session, cte, "<cteProc>new</cteProc>")
+    cte = await ClientCTeService.update_invoices(db_session, cte, ["NF1", "NF2"])
+    db_session.expunge_all()
+
+    stored = await ClientCTeService.get_by_id(db_session, cte.id, include_xml=True)
+    assert stored.xml == "<cteProc>new</cteProc>"
+    assert stored.invoice_keys == ["NF1", "NF2"]
+
+
+@pytest.mark.asyncio
+async def test_shipment_read_serializes_ctes(db_session):
+    """Test ShipmentRead renders its CTes (typed) through the orjson response class."""
+    import orjson
+    from fastapi.encoders import jsonable_encoder
+
+    from app.main import app
+    from app.schemas.shipment import ShipmentRead
+    from app.services.shipment_service import ShipmentService
+
+    cte = await _make_cte(db_session, "KEYS", invoices=["NF1"])
+    db_session.expunge_all()
+    shipment = await ShipmentService.get_by_id(db_session, cte.shipment_id)
+
+    read = ShipmentRead.model_validate(shipment)
+    body = orjson.loads(app.router.default_response_class(jsonable_encoder(read)).body)
+
+    # API output uses the legacy (Portuguese) aliases
+    (cte_out,) = body["ctes_cliente"]
+    assert cte_out["chave"] == "KEYS"
+    assert cte_out["carga_id"] == str(cte.shipment_id)
+    assert cte_out["nfs"][0]["chave"] == "NF1"
+
+
+@pytest.mark.asyncio
+async def test_shipment_read_omits_xml_by_default(db_session):
+    """Test CTe XML is not loaded on reads and only rendered when requested."""
+    from app.api.deps import include_xml
+    from app.schemas.shipment import ShipmentRead
+    from app.services.shipment_service import ShipmentService
+
+    cte = await _make_cte(db_session, "KEYD")
+    db_session.expunge_all()
+
+    shipment = await ShipmentService.get_by_id(db_session, cte.shipment_id)
+    (cte_out,) = ShipmentRead.model_validate(shipment).client_ctes
+    assert cte_out.xml is None
+
+    db_session.expunge_all()
+    shipment = await ShipmentService.get_by_id(db_session, cte.shipment_id, include_xml=True)
+    (cte_out,) = ShipmentRead.model_validate(shipment).client_ctes
+    assert cte_out.xml == "<cteProc>KEYD</cteProc>"
+
+    assert include_xml("nfs, XML") is True
+    assert include_xml(None) is False
+
+
+def test_xml_cache_lru_bytes_and_ttl():
+    """Test the decrypted-XML cache counts hits/misses and stays within its byte budget."""
+    from app.core.xml_cache import DecryptedXMLCache
+
+    calls = []
+
+    def decrypt(token):
+        calls.append(token)
+        return token.upper()
+
+    cache = DecryptedXMLCache(max_bytes=10, ttl_seconds=60)
+    assert cache.get_or_decrypt("aaaa", decrypt) == "AAAA"
+    assert cache.get_or_decrypt("aaaa", decrypt) == "AAAA"
+    assert calls == ["aaaa"]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache.get_or_decrypt("bbbb", decrypt)
+    cache.get_or_decrypt("aaaa", decrypt)  # refresh aaaa; bbbb is now LRU
+    cache.get_or_decrypt("cccc", decrypt)  # 12 bytes > 10: evicts bbbb
+    assert cache.size_bytes == 8
+    assert cache.evictions == 1
+    cache.get_or_decrypt("bbbb", decrypt)
+    assert calls[-1] == "bbbb"
+
+    cache.ttl_seconds = 0.0  # disabled: always decrypts
+    cache.get_or_decrypt("cccc", decrypt)
+    assert calls[-1] == "cccc"
+
+
+@pytest.mark.asyncio
+async def test_legacy_xml_reencoded_compressed(db_session):
+    """Test legacy uncompressed XML still decrypts and is re-encoded as z1 tokens."""
+    from app.core.xml_cache import xml_cache
+    from app.services.crypto_service import encrypt_text, is_compressed
+    from app.services.xml_storage_service import XMLStorageService
+
+    xml = "<cteProc>" + "<infNFe><chave>35000000000000000000</chave></infNFe>" * 50 + "</cteProc>"
+    ctes = [await _make_cte(db_session, f"KEYZ{i}") for i in range(3)]
+    for cte in ctes:
+        cte.document.xml_encrypted = encrypt_text(xml)  # legacy format
+    await db_session.commit()
+    legacy_size = len(ctes[0].document.xml_encrypted)
+    xml_cache.clear()
+    assert ctes[0].xml == xml
+
+    assert await XMLStorageService.reencode_all(db_session, CTeDocument, chunk_size=2) == 3
+    db_session.expunge_all()
+
+    stored = await ClientCTeService.get_by_id(db_session, ctes[0].id, include_xml=True)
+    assert is_compressed(stored.document.xml_encrypted)
+    assert len(stored.document.xml_encrypted) < legacy_size / 4
+    assert stored.xml == xml
+    assert await XMLStorageService.reencode_all(db_session, CTeDocument) == 0
+
+
+@pytest.mark.asyncio
+async def test_aesgcm_envelope_storage(db_session, monkeypatch):
+    """Test AES-GCM envelopes in xml_blob, with Fernet documents read and migrated lazily."""
+    import os
+    from app.config.settings import settings
+    from app.core.xml_cache import xml_cache
+    from app.services import crypto_service
+    from app.services.xml_storage_service import XMLStorageService
+
+    legacy = await _make_cte(db_session, "KEYF")  # written with Fernet
+    monkeypatch.setattr(settings, "xml_cipher", "aesgcm")
+    monkeypatch.setattr(crypto_service, "aesgcm_keys", {7: crypto_service.AESGCM(os.urandom(32))})
+    monkeypatch.setattr(crypto_service, "ACTIVE_AESGCM_KEY_ID", 7)
+    xml_cache.clear()
+
+    cte = await _make_cte(db_session, "KEYG")
+    assert cte.document.xml_encrypted is None
+    assert cte.document.xml_blob[:3] == bytes([1, 1, 7])  # version, zlib flag, key id
+    db_session.expunge_all()
+
+    stored = await ClientCTeService.get_by_id(db_session, cte.id, include_xml=True)
+    assert stored.xml == "<cteProc>KEYG</cteProc>"
+    assert (await ClientCTeService.get_by_id(db_session, legacy.id, include_xml=True)).xml == "<cteProc>KEYF</cteProc>"
+
+    # Upserting new XML over a Fernet document replaces both columns
+    await CTeDocumentService.upsert_for_client_ctes(
+        db_session, {legacy.id: CTeDocument.encode_xml("<cteProc>F2</cteProc>")}
+    )
+    await db_session.commit()
+    db_session.expunge_all()
+    stored = await ClientCTeService.get_by_id(db_session, legacy.id, include_xml=True)
+    assert stored.document.xml_encrypted is None
+    assert stored.xml == "<cteProc>F2</cteProc>"
+
+    stored.document.xml_encrypted = crypto_service.encrypt_text("<cteProc>old</cteProc>")
+    stored.document.xml_blob = None
+    await db_session.commit()
+    assert await XMLStorageService.reencode_all(db_session, CTeDocument) == 1
+    db_session.expunge_all()
+    stored = await ClientCTeService.get_by_id(db_session, legacy.id, include_xml=True)
+    assert stored.document.xml_blob is not None
+    assert stored.xml == "<cteProc>old</cteProc>"
+
+    tampered = bytearray(stored.document.xml_blob)
+    tampered[-1] ^= 1
+    assert crypto_service.decrypt_envelope(bytes(tampered)) is None
+
+
+@pytest.mark.asyncio
+async def test_xml_document_loaded_on_demand(db_session):
+    """Test CTe XML lives in cte_documents, is loaded only on demand and goes away with its CTe."""
+    from sqlalchemy import func, inspect, select
+
+    cte = await _make_cte(db_session, "KEYDOC")
+    db_session.expunge_all()
+
+    stored = await ClientCTeService.get_by_id(db_session, cte.id)
+    assert "document" in inspect(stored).unloaded
+    assert await stored.read_xml() == "<cteProc>KEYDOC</cteProc>"
+
+    await stored.write_xml("<cteProc>v2</cteProc>")
+    await db_session.commit()
+    assert stored.content_hash == ClientCTe.hash_xml("<cteProc>v2</cteProc>")
+    count = select(func.count()).select_from(CTeDocument)
+    assert (await db_session.execute(count)).scalar_one() == 1
+
+    await db_session.delete(stored)
+    await db_session.commit()
+    assert (await db_session.execute(count)).scalar_one() == 0
+
+
+@pytest.mark.asyncio
+async def test_resolved_xml_serialized_without_inline_decrypt(db_session, monkeypatch):
+    """Test read paths decrypt XML before serialization, so the schemas do no crypto work."""
+    from app.core.xml_cache import xml_cache
+    from app.schemas.client_cte import ClientCTeRead
+    from app.schemas.shipment import ShipmentRead
+    from app.services.shipment_service import ShipmentService
+
+    cte = await _make_cte(db_session, "KEYRES")
+    db_session.expunge_all()
+    cte = await ClientCTeService.get_by_id(db_session, cte.id, include_xml=True)
+    db_session.expunge_all()
+    shipment = await ShipmentService.get_by_id(db_session, cte.shipment_id, include_xml=True)
+
+    def inline_decrypt(*args):
+        raise AssertionError("XML decrypted on the event loop during serialization")
+
+    monkeypatch.setattr(xml_cache, "get_or_decrypt", inline_decrypt)
+    assert ClientCTeRead.model_validate(cte).xml == "<cteProc>KEYRES</cteProc>"
+    (cte_out,) = ShipmentRead.model_validate(shipment).client_ctes
+    assert cte_out.xml == "<cteProc>KEYRES</cteProc>"
+
+    # A new value replaces the resolved one
+    cte.xml = "<cteProc>v2</cteProc>"
+    monkeypatch.undo()
+    assert cte.loaded_xml == "<cteProc>v2</cteProc>"
@@ -0,0 +1,166 @@
+# tests/test_invoices.py
+"""
+Tests for the invoices table and InvoiceService.
+Tests the service layer directly against an in-memory database.
+"""
+
+import json
+
+import pytest
+from sqlalchemy import select
+
+from app.models.shipment import Shipment
+from app.models.client_cte import ClientCTe
+from app.models.invoice import Invoice
+from app.services.invoice_service import InvoiceService
+
+
+async def _make_cte(db, access_key: str, invoices=None) -> ClientCTe:
+    shipment = Shipment()
+    db.add(shipment)
+    await db.flush()
+    cte = ClientCTe(shipment_id=shipment.id, access_key=access_key)
+    cte.invoices = invoices or []
+    db.add(cte)
+    await db.commit()
+    return cte
+
+
+@pytest.mark.asyncio
+async def test_invoices_stored_as_rows(db_session):
+    """Test CTe invoices are written to the invoices table in order."""
+    cte = await _make_cte(db_session, "KEY1", ["NF2", "NF1"])
+    db_session.expunge_all()
+
+    rows = (await db_session.execute(
+        select(Invoice.nfe_key, Invoice.status_code).order_by(Invoice.position)
+    )).all()
+    assert rows == [("NF2", "10"), ("NF1", "10")]
+
+    stored = await db_session.get(ClientCTe, cte.id)
+    assert stored.invoice_keys == ["NF2", "NF1"]
+    assert stored.invoices_json is None
+
+
+@pytest.mark.asyncio
+async def test_legacy_invoices_json_still_readable(db_session):
+    """Test CTes not yet backfilled fall back to invoices_json."""
+    cte = await _make_cte(db_session, "KEY1")
+    cte.invoices_json = '["NF1", "NF2"]'
+    await db_session.commit()
+    db_session.expunge_all()
+
+    stored = await db_session.get(ClientCTe, cte.id)
+    assert stored.invoice_keys == ["NF1", "NF2"]
+
+    updated = stored.update_invoice_status(["NF2"], "1")
+    await db_session.commit()
+    assert [inv["key"] for inv in updated] == ["NF2"]
+    assert [inv["status"]["code"] for inv in stored.invoices] == ["10", "1"]
+
+
+@pytest.mark.asyncio
+async def test_update_status_is_targeted(db_session):
+    """Test one UPDATE changes only the selected invoices, in CTe then XML order."""
+    first = await _make_cte(db_session, "KEY1", ["NF1", "NF2", "NF3"])
+    second = await _make_cte(db_session, "KEY2", ["NF4"])
+
+    updated = await InvoiceService.update_status(db_session, [second.id, first.id], ["NF3", "NF1", "NF4"], "1")
+    await db_session.commit()
+    assert updated == [(second.id, "NF4"), (first.id, "NF1"), (first.id, "NF3")]
+    # Loaded rows are synchronized with the UPDATE
+    assert [inv["status"]["code"] for inv in first.invoices] == ["1", "10", "1"]
+
+    everything = await InvoiceService.update_status(db_session, [first.id], None, "2")
+    assert len(everything) == 3
+
+
+
+@pytest.mark.asyncio
+async def test_update_status_moves_legacy_json_cte(db_session):
+    """Test a status update on a CTe only on legacy invoices_json moves it to rows first."""
+    from app.models.client_cte import InvoiceStatus
+
+    cte = await _make_cte(db_session, "KEYL")
+    cte.invoices_json = json.dumps([InvoiceStatus.create("NF1", "3"), InvoiceStatus.create("NF2")])
+    await db_session.commit()
+
+    updated = await InvoiceService.update_status(db_session, [cte.id], ["NF2"], "1")
+    await db_session.commit()
+    assert updated == [(cte.id, "NF2")]
+
+    db_session.expunge_all()
+    stored = await db_session.get(ClientCTe, cte.id)
+    assert stored.invoices_json is None
+    assert [(inv["key"], inv["status"]["code"]) for inv in stored.invoices] == [("NF1", "3"), ("NF2", "1")]
+
+
+@pytest.mark.asyncio
+async def test_replace_keys_keeps_statuses(db_session):
+    """Test replacing the NF-e list keeps surviving statuses and drops removed keys."""
+    cte = await _make_cte(db_session, "KEY1", ["NF1", "NF2"])
+    await InvoiceService.update_status(db_session, [cte.id], ["NF2"], "1")
+    await db_session.commit()
+
+    await InvoiceService.replace_keys(db_session, {cte.id: ["NF3", "NF2"]})
+    await db_session.commit()
+    db_session.expunge_all()
+
+    stored = await db_session.get(ClientCTe, cte.id)
+    assert [(inv["key"], inv["status"]["code"]) for inv in stored.invoices] == [("NF3", "10"), ("NF2", "1")]
+
+
+@pytest.mark.asyncio
+async def test_lookup_invoices_by_key(db_session):
+    """Test NF-e keys resolve to their CTe, shipment and status."""
+    from fastapi import HTTPException
+
+    from app.api.routes.invoices import get_invoice, lookup_invoices
+    from app.schemas.invoice import InvoiceLookupRequest
+
+    first = await _make_cte(db_session, "KEY1", ["NF1", "NF2"])
+    second = await _make_cte(db_session, "KEY2", ["NF2"])
+    await InvoiceService.update_status(db_session, [first.id], ["NF1"], "1")
+    await db_session.commit()
+
+    (match,) = await get_invoice("NF1", db=db_session)
+    assert match["cte_id"] == first.id
+    assert match["shipment_id"] == first.shipment_id
+    assert match["status"]["code"] == "1"
+
+    result = await lookup_invoices(InvoiceLookupRequest(keys=["NF2", "NF9", "NF1"]), db=db_session)
+    assert [(m["nfe_key"], m["cte_access_key"]) for m in result["found"]] == [
+        ("NF2", "KEY1"), ("NF2", "KEY2"), ("NF1", "KEY1"),
+    ]
+    assert result["missing"] == ["NF9"]
+    assert {m["cte_id"] for m in result["found"] if m["nfe_key"] == "NF2"} == {first.id, second.id}
+
+    with pytest.raises(HTTPException) as exc:
+        await get_invoice("NF9", db=db_session)
+    assert exc.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_invoice_index_built_once_per_load(db_session, monkeypatch):
+    """Test legacy JSON is decoded once and lookups follow row updates."""
+    from app.models import client_cte as client_cte_module
+
+    cte = await _make_cte(db_session, "KEY1", ["NF1", "NF2"])
+    assert cte.get_invoice_by_key("NF2")["status"]["code"] == "10"
+
+    await InvoiceService.update_status(db_session, [cte.id], ["NF2"], "1")
+    assert cte.get_invoice_by_key("NF2")["status"]["code"] == "1"
+    assert cte.get_invoice_by_key("NF9") is None
+
+    legacy = await _make_cte(db_session, "KEY2")
+    legacy.invoices_json = '["NF3", "NF4"]'
+    await db_session.commit()
+
+    decodes = []
+    real_loads = client_cte_module.json.loads
+    monkeypatch.setattr(client_cte_module.json, "loads", lambda s: decodes.append(s) or real_loads(s))
+
+    assert legacy.invoice_keys == ["NF3", "NF4"]
+    assert legacy.get_invoice_by_key("NF4")["key"] == "NF4"
+    assert len(legacy.invoices) == 2
+    assert len(decodes) == 1
@@ -0,0 +1,101 @@
+# tests/test_migrations.py
+"""
+Tests for Alembic migrations on SQLite.
+Runs the alembic CLI against a throwaway database file.
+"""
+
+import os
+import shutil
+import sqlite3
+import subprocess
+import uuid
+
+import pytest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+pytestmark = pytest.mark.skipif(shutil.which("alembic") is None, reason="alembic CLI not installed")
+
+
+def _alembic(db_path, *args):
+    env = {**os.environ, "DATABASE_URL": f"sqlite+aiosqlite:///{db_path}"}
+    subprocess.run(["alembic", *args], cwd=ROOT, env=env, check=True, capture_output=True)
+
+
+def _column_types(conn, table):
+    return {row[1]: row[2] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def test_cte_documents_migration_keeps_text_uuid_columns(tmp_path):
+    """Test 0011 -> 0012 moves the XML and the rebuilt CTe tables keep text UUID columns."""
+    db_path = tmp_path / "migrate.db"
+    _alembic(db_path, "upgrade", "0011")
+
+    shipment_id, cte_id = uuid.uuid4().hex, uuid.uuid4().hex
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("INSERT INTO shipments (id, status) VALUES (?, '{}')", (shipment_id,))
+        conn.execute(
+            "INSERT INTO client_ctes (id, shipment_id, access_key, xml_encrypted) VALUES (?, ?, 'KEY1', 'token')",
+            (cte_id, shipment_id),
+        )
+
+    _alembic(db_path, "upgrade", "0012")
+
+    with sqlite3.connect(db_path) as conn:
+        for table in ("client_ctes", "subcontracted_ctes"):
+            types = _column_types(conn, table)
+            assert types["id"] == "CHAR(32)"
+            assert types["shipment_id"] == "CHAR(32)"
+            assert "xml_encrypted" not in types
+        assert conn.execute("SELECT client_cte_id, xml_encrypted FROM cte_documents").fetchall() == [
+            (cte_id, "token")
+        ]
+        assert conn.execute(
+            "SELECT \"table\" FROM pragma_foreign_key_list('client_ctes')"
+        ).fetchall() == [("shipments",)]
+
+        # All-digit / exponent-looking hex ids must stay text
+        numeric_id = "1234567890" * 3 + "12"
+        exponent_id = "1" * 16 + "e" + "2" * 15
+        for row_id in (numeric_id, exponent_id):
+            conn.execute(
+                "INSERT INTO client_ctes (id, shipment_id, access_key) VALUES (?, ?, ?)",
+                (row_id, shipment_id, row_id),
+            )
+        assert conn.execute(
+            "SELECT DISTINCT typeof(id) FROM client_ctes"
+        ).fetchall() == [("text",)]
+
+    _alembic(db_path, "downgrade", "0011")
+
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT xml_encrypted FROM client_ctes WHERE id = ?", (cte_id,)).fetchone() == (
+            "token",
+        )
+
+
+def test_invoices_migration_round_trip(tmp_path):
+    """Test 0008 -> 0009 -> 0008 restores invoices_json with the full status of each NF-e."""
+    import json
+
+    from app.models.client_cte import InvoiceStatus
+
+    db_path = tmp_path / "migrate.db"
+    _alembic(db_path, "upgrade", "0008")
+
+    invoices = [InvoiceStatus.create("NF1", "1"), InvoiceStatus.create("NF2")]
+    shipment_id, cte_id = uuid.uuid4().hex, uuid.uuid4().hex
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("INSERT INTO shipments (id, status) VALUES (?, '{}')", (shipment_id,))
+        conn.execute(
+            "INSERT INTO client_ctes (id, shipment_id, access_key, invoices_json) VALUES (?, ?, 'KEY1', ?)",
+            (cte_id, shipment_id, json.dumps(invoices)),
+        )
+
+    _alembic(db_path, "upgrade", "0009")
+    _alembic(db_path, "downgrade", "0008")
+
+    with sqlite3.connect(db_path) as conn:
+        (restored,) = conn.execute("SELECT invoices_json FROM client_ctes").fetchone()
+    assert json.loads(restored) == invoices
@@ -0,0 +1,350 @@
+# tests/test_shipment_sync.py
+"""
+Tests for the VBLOG shipment sync pipeline.
+Drives the sync with a fake VBLOG client against an in-memory database.
+"""
+
+import asyncio
+import json
+
+import pytest
+from sqlalchemy import select, func
+
+from app.api.routes.shipments_sync import sync_shipments_from_vblog
+from app.models.client_cte import ClientCTe
+from app.models.cte_document import CTeDocument
+from app.models.shipment import Shipment
+from app.models.sync_job import SyncJobStatus
+from app.models.open_transit_key import OpenTransitKey
+from app.services.sync_job_runner import SyncJobRunner
+from app.services.sync_job_service import SyncJobService
+from app.services.vblog.cte import VBlogCTeService
+from app.services.vblog.transito import (
+    VBlogTransitoService,
+    TransitResponse,
+    TransitControl,
+    Document,
+)
+
+
+def _key(n: int) -> str:
+    return f"3524{n:040d}"
+
+
+def _cte_xml(key: str, nfes: list[str]) -> str:
+    nfe_tags = "".join(f"<infNFe><chave><chNFe>{n}</chNFe></chave></infNFe>" for n in nfes)
+    return f'<cteProc xmlns="http://www.portalfiscal.inf.br/cte"><chCTe>{key}</chCTe>{nfe_tags}</cteProc>'
+
+
+class FakeVBlog(VBlogTransitoService):
+    """Transit service returning a fixed set of open CTe keys."""
+
+    def __init__(self, keys: list[str]):
+        super().__init__(cnpj="123", token="t", base_url="http://vblog.local")
+        self.keys = keys
+
+    async def query_open_transits(self, return_type: int = 7, transit_status: int = 2):
+        return TransitResponse(
+            code=1,
+            transits=[
+                TransitControl(docs=[Document(type="chaveCTe", value=k) for k in self.keys])
+            ],
+        )
+
+
+@pytest.fixture
+def fake_downloads(monkeypatch):
+    """Patch CTe downloads to serve XML from a dict (missing key -> error)."""
+    documents: dict[str, str] = {}
+
+    async def download_cte(self, access_key):
+        if access_key not in documents:
+            raise RuntimeError("not found")
+        return documents[access_key]
+
+    monkeypatch.setattr(VBlogCTeService, "download_cte", download_cte)
+    return documents
+
+
+async def _count(db, model) -> int:
+    return (await db.execute(select(func.count()).select_from(model))).scalar_one()
+
+
+@pytest.mark.asyncio
+async def test_sync_creates_and_updates_in_batches(db_session, fake_downloads, monkeypatch):
+    """Test new keys create shipments, changed keys are upserted, batches commit."""
+    from app.config.settings import settings
+    monkeypatch.setattr(settings, "sync_batch_size", 2)
+
+    keys = [_key(i) for i in range(5)]
+    for i, key in enumerate(keys):
+        fake_downloads[key] = _cte_xml(key, [f"NF{i}"])
+
+    result = await sync_shipments_from_vblog(dry_run=False, db=db_session, vblog=FakeVBlog(keys))
+
+    assert result["created"] == 5
+    assert result["updated"] == 0
+    assert result["errors"] == []
+    assert await _count(db_session, Shipment) == 5
+    assert await _count(db_session, ClientCTe) == 5
+    assert await _count(db_session, CTeDocument) == 5
+
+    fake_downloads[keys[0]] = _cte_xml(keys[0], ["NF0", "NF9"])
+    result = await sync_shipments_from_vblog(
+        dry_run=False, refresh=True, db=db_session, vblog=FakeVBlog(keys)
+    )
+
+    assert result["created"] == 0
+    assert result["updated"] == 1
+    assert result["unchanged"] == 4
+    assert await _count(db_session, Shipment) == 5
+
+    db_session.expunge_all()
+    cte = (await db_session.execute(
+        select(ClientCTe).where(ClientCTe.access_key == keys[0])
+    )).scalar_one()
+    assert cte.invoice_keys == ["NF0", "NF9"]
+    assert await cte.read_xml() == fake_downloads[keys[0]]
+    assert await _count(db_session, CTeDocument) == 5
+
+
+@pytest.mark.asyncio
+async def test_sync_skips_ingested_ctes(db_session, fake_downloads):
+    """Test ingested CTes are not re-downloaded and keep their invoice statuses."""
+    keys = [_key(1), _key(2)]
+    for key in keys:
+        fake_downloads[key] = _cte_xml(key, ["NF1"])
+    await sync_shipments_from_vblog(dry_run=False, db=db_session, vblog=FakeVBlog(keys))
+
+    cte = (await db_session.execute(
+        select(ClientCTe).where(ClientCTe.access_key == keys[0])
+    )).scalar_one()
+    cte.update_invoice_status(None, "1")
+    await db_session.commit()
+
+    fake_downloads.clear()  # any download attempt would now fail
+    result = await sync_shipments_from_vblog(dry_run=False, db=db_session, vblog=FakeVBlog(keys))
+    assert result["unchanged"] == 2
+    assert result["errors"] == []
+
+    fake_downloads[keys[0]] = _cte_xml(keys[0], ["NF1", "NF2"])
+    result = await sync_shipments_from_vblog(
+        dry_run=False, refresh=True, db=db_session, vblog=FakeVBlog([keys[0]])
+    )
+    assert result["updated"] == 1
+
+    db_session.expunge_all()
+    cte = (await db_session.execute(
+        select(ClientCTe).where(ClientCTe.access_key == keys[0])
+    )).scalar_one()
+    assert [inv["status"]["code"] for inv in cte.invoices] == ["1", "10"]
+
+
+@pytest.mark.asyncio
+async def test_sync_isolates_download_errors(db_session, fake_downloads):
+    """Test a failing download is reported without blocking the other keys."""
+    keys = [_key(1), _key(2)]
+    fake_downloads[keys[0]] = _cte_xml(keys[0], [])
+
+    result = await sync_shipments_from_vblog(dry_run=False, db=db_session, vblog=FakeVBlog(keys))
+
+    assert result["created"] == 1
+    assert len(result["errors"]) == 1
+    assert keys[1] in result["errors"][0]
+
+    # The failed key never entered the snapshot, so the next run retries it
+    fake_downloads[keys[1]] = _cte_xml(keys[1], [])
+    result = await sync_shipments_from_vblog(dry_run=False, db=db_session, vblog=FakeVBlog(keys))
+    assert result["added"] == 1
+    assert result["created"] == 1
+
+
+
+
+@pytest.mark.asyncio
+async def test_sync_dry_run_reports_skipped(db_session, fake_downloads):
+    """Test a dry run reports the keys it would have written as skipped, and writes nothing."""
+    keys = [_key(1), _key(2)]
+    for key in keys:
+        fake_downloads[key] = _cte_xml(key, ["NF1"])
+
+    result = await sync_shipments_from_vblog(dry_run=True, db=db_session, vblog=FakeVBlog(keys))
+
+    assert result["skipped"] == 2
+    assert result["created"] == 0
+    assert await _count(db_session, ClientCTe) == 0
+
+
+@pytest.mark.asyncio
+async def test_persist_batch_lost_insert_race_keeps_no_orphan_shipment(db_session):
+    """Test a key inserted concurrently resolves to the stored CTe and its pre-created shipment is dropped."""
+    from app.services.shipment_sync_service import persist_sync_batch
+
+    key = _key(1)
+    entry = {"key": key, "existing": None, "xml": _cte_xml(key, ["NF1"]), "nfe_keys": ["NF1"]}
+    (first,) = await persist_sync_batch(db_session, [dict(entry)])
+    assert first["action"] == "created"
+
+    # Second sync prefetched before the first one committed
+    entry["xml"] = _cte_xml(key, ["NF1", "NF2"])
+    entry["nfe_keys"] = ["NF1", "NF2"]
+    (second,) = await persist_sync_batch(db_session, [entry])
+    assert second["action"] == "updated"
+
+    assert await _count(db_session, Shipment) == 1
+    assert await _count(db_session, CTeDocument) == 1
+    db_session.expunge_all()
+    cte = (await db_session.execute(select(ClientCTe).where(ClientCTe.access_key == key))).scalar_one()
+    assert str(cte.shipment_id) == first["shipment_id"]
+    assert [inv["key"] for inv in cte.invoices] == ["NF1", "NF2"]
+
+
+
+@pytest.mark.asyncio
+async def test_persist_batch_moves_legacy_invoices(db_session):
+    """Test a CTe still on legacy invoices_json gets invoice rows even if its NF-e list is unchanged."""
+    from app.models.invoice import Invoice
+    from app.services.client_cte_service import ClientCTeService
+    from app.services.shipment_sync_service import _snapshot, persist_sync_batch
+
+    key = _key(1)
+    shipment = Shipment()
+    db_session.add(shipment)
+    await db_session.flush()
+    cte = ClientCTe(shipment_id=shipment.id, access_key=key)
+    cte.invoices_json = json.dumps([{"key": "NF1", "status": {"code": "3"}}, {"key": "NF2", "status": {"code": "10"}}])
+    db_session.add(cte)
+    await db_session.commit()
+    db_session.expunge_all()
+
+    existing = _snapshot((await ClientCTeService.get_many_by_access_keys(db_session, [key]))[key])
+    assert not existing["has_invoice_rows"]
+    entry = {"key": key, "existing": existing, "xml": _cte_xml(key, ["NF1", "NF2"]), "nfe_keys": ["NF1", "NF2"]}
+    await persist_sync_batch(db_session, [entry])
+
+    rows = (await db_session.execute(select(Invoice).order_by(Invoice.position))).scalars().all()
+    assert [(row.nfe_key, row.status_code) for row in rows] == [("NF1", "3"), ("NF2", "10")]
+
+
+@pytest.mark.asyncio
+async def test_sync_diffs_open_transit_snapshot(db_session, fake_downloads):
+    """Test only added keys are processed and keys that left are closed."""
+    a, b, c = _key(1), _key(2), _key(3)
+    for key in (a, b, c):
+        fake_downloads[key] = _cte_xml(key, [])
+
+    await sync_shipments_from_vblog(dry_run=False, db=db_session, vblog=FakeVBlog([a, b]))
+    del fake_downloads[a], fake_downloads[b]  # stayed keys must not be downloaded
+
+    result = await sync_shipments_from_vblog(dry_run=False, db=db_session, vblog=FakeVBlog([b, c]))
+
+    assert (result["added"], result["removed"], result["unchanged"]) == (1, 1, 1)
+    assert result["created"] == 1
+    assert result["errors"] == []
+
+    db_session.expunge_all()
+    snapshot = {
+        entry.access_key: entry
+        for entry in (await db_session.execute(select(OpenTransitKey))).scalars()
+    }
+    assert set(snapshot) == {a, b, c}
+    assert not snapshot[a].is_open
+    assert snapshot[b].is_open and snapshot[c].is_open
+
+
+@pytest.mark.asyncio
+async def test_sync_streams_ndjson(db_session, fake_downloads):
+    """Test stream mode emits one line per key then a summary without raw_xml."""
+    keys = [_key(1), _key(2), _key(3)]
+    for key in keys:
+        fake_downloads[key] = _cte_xml(key, ["NF1"])
+
+    response = await sync_shipments_from_vblog(stream=True, db=db_session, vblog=FakeVBlog(keys))
+    assert response.media_type == "application/x-ndjson"
+
+    lines = [json.loads(chunk) async for chunk in response.body_iterator]
+
+    assert [line["type"] for line in lines] == ["key", "key", "key", "summary"]
+    assert {line["key"] for line in lines[:-1]} == set(keys)
+    assert lines[-1]["created"] == 3
+    assert "raw_xml" not in lines[-1]
+
+
+@pytest.mark.asyncio
+async def test_sync_job_runs_in_background(session_factory, fake_downloads):
+    """Test trigger returns at once, reuses the running job and records progress."""
+    keys = [_key(1), _key(2)]
+    for key in keys:
+        fake_downloads[key] = _cte_xml(key, ["NF1"])
+
+    release = asyncio.Event()
+
+    class GatedVBlog(FakeVBlog):
+        async def query_open_transits(self, return_type: int = 7, transit_status: int = 2):
+            await release.wait()
+            return await super().query_open_transits(return_type, transit_status)
+
+    runner = SyncJobRunner(vblog_factory=lambda: GatedVBlog(keys), session_factory=session_factory)
+
+    job = await runner.trigger()
+    assert job.status == SyncJobStatus.QUEUED
+    assert (await runner.trigger()).id == job.id
+
+    release.set()
+    await runner.wait()
+
+    async with session_factory() as db:
+        stored = await SyncJobService.get_by_id(db, job.id)
+        assert stored.status == SyncJobStatus.SUCCEEDED
+        assert stored.counts["created"] == 2
+        assert set(stored.timings) >= {"query_transits", "download", "persist"}
+        assert stored.finished_at is not None
+        assert await _count(db, ClientCTe) == 2
+
+    await runner.stop()
+
+
+@pytest.mark.asyncio
+async def test_sync_job_failure_is_recorded(session_factory):
+    """Test an upstream failure marks the job as failed with the error."""
+
+    class BrokenVBlog(FakeVBlog):
+        async def query_open_transits(self, return_type: int = 7, transit_status: int = 2):
+            raise RuntimeError("VBLOG down")
+
+    runner = SyncJobRunner(vblog_factory=lambda: BrokenVBlog([]), session_factory=session_factory)
+    job = await runner.trigger()
+    await runner.wait()
+
+    async with session_factory() as db:
+        stored = await SyncJobService.get_by_id(db, job.id)
+        assert stored.status == SyncJobStatus.FAILED
+        assert stored.errors == ["VBLOG down"]
+
+
+@pytest.mark.asyncio
+async def test_sync_job_start_failure_is_recorded(session_factory):
+    """Test a failure while marking the job running still fails the job and closes the client."""
+    closed = []
+
+    class ClosingVBlog(FakeVBlog):
+        async def close(self):
+            closed.append(True)
+
+    runner = SyncJobRunner(vblog_factory=lambda: ClosingVBlog([]), session_factory=session_factory)
+    update = runner._update
+
+    async def flaky_update(job_id, **fields):
+        if fields.get("status") == SyncJobStatus.RUNNING:
+            raise RuntimeError("database unavailable")
+        await update(job_id, **fields)
+
+    runner._update = flaky_update
+    job = await runner.trigger()
+    await runner.wait()
+
+    assert closed == [True]
+    async with session_factory() as db:
+        stored = await SyncJobService.get_by_id(db, job.id)
+        assert stored.status == SyncJobStatus.FAILED
+        assert stored.errors == ["database unavailable"]
@@ -0,0 +1,139 @@
+# tests/test_tracking_events.py
+"""
+Tests for tracking event services.
+Tests the service layer directly against an in-memory database.
+"""
+
+import datetime
+
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy import select
+
+from app.api.routes.tracking import list_tracking_events
+
+from app.models.shipment import Shipment
+from app.models.client_cte import ClientCTe
+from app.models.tracking_event import TrackingEvent
+from app.schemas.tracking_event import TrackingEventCreate
+from app.services.tracking_event_service import TrackingEventService
+
+
+async def _make_cte(db) -> ClientCTe:
+    shipment = Shipment()
+    db.add(shipment)
+    await db.flush()
+    cte = ClientCTe(shipment_id=shipment.id, access_key="KEY1")
+    db.add(cte)
+    await db.flush()
+    return cte
+
+
+@pytest.mark.asyncio
+async def test_register_many_returns_ids_in_order(db_session):
+    """Test bulk registration inserts every event and returns IDs in input order."""
+    cte = await _make_cte(db_session)
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    ids = await TrackingEventService.register_many(
+        db_session,
+        [
+            TrackingEventCreate(
+                client_cte_id=cte.id,
+                invoice_key=f"NF{i}",
+                event_code="1",
+                description="Em transito",
+                event_date=now,
+            )
+            for i in range(5)
+        ] + [{
+            "client_cte_id": cte.id,
+            "invoice_key": "NF5",
+            "event_code": "1",
+            "description": "Em transito",
+            "event_date": now,
+            "delivery_status": "delivered",
+        }],
+    )
+    await db_session.commit()
+
+    assert len(set(ids)) == 6
+    rows = (await db_session.execute(select(TrackingEvent.id, TrackingEvent.invoice_key))).all()
+    by_id = dict(rows)
+    assert [by_id[event_id] for event_id in ids] == [f"NF{i}" for i in range(6)]
+    assert (await db_session.get(TrackingEvent, ids[5])).delivery_status == "delivered"
+    assert await TrackingEventService.register_many(db_session, []) == []
+
+
+@pytest.mark.asyncio
+async def test_list_tracking_events_keyset_pages(db_session):
+    """Test events are paged by (event_date, id) with filters and a next cursor."""
+    import uuid
+
+    cte = await _make_cte(db_session)
+    base = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+    # Pairs of events share a timestamp so the id tiebreaker is exercised
+    await TrackingEventService.register_many(
+        db_session,
+        [
+            {
+                "client_cte_id": cte.id,
+                "invoice_key": "NF1" if i % 3 else "NF2",
+                "event_code": "1" if i < 6 else "2",
+                "description": "Evento",
+                "event_date": base + datetime.timedelta(minutes=i // 2),
+            }
+            for i in range(10)
+        ],
+    )
+    await db_session.commit()
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        response = Response()
+        page = await list_tracking_events(
+            cte.id, response, limit=3, cursor=cursor, invoice_key=None, event_code=None, db=db_session
+        )
+        seen.extend(page)
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert pages == 4
+    assert len({e.id for e in seen}) == 10
+    assert [(e.event_date, str(e.id)) for e in seen] == sorted((e.event_date, str(e.id)) for e in seen)
+
+    response = Response()
+    filtered = await list_tracking_events(
+        cte.id, response, limit=100, cursor=None, invoice_key="NF2", event_code="1", db=db_session
+    )
+    assert [e.invoice_key for e in filtered] == ["NF2", "NF2"]
+    assert "X-Next-Cursor" not in response.headers
+
+    with pytest.raises(HTTPException) as exc:
+        await list_tracking_events(
+            cte.id, Response(), limit=3, cursor="not-a-cursor", invoice_key=None, event_code=None, db=db_session
+        )
+    assert exc.value.status_code == 400
+
+    with pytest.raises(HTTPException) as exc:
+        await list_tracking_events(
+            uuid.uuid4(), Response(), limit=3, cursor=None, invoice_key=None, event_code=None, db=db_session
+        )
+    assert exc.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_next_cursor_header_exposed_to_cors_clients():
+    """Test browsers on an allowed origin can read the X-Next-Cursor header."""
+    from httpx import AsyncClient, ASGITransport
+    from app.config.settings import settings
+    from app.main import app
+
+    origin = settings.cors_origins[0]
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as http:
+        response = await http.get("/health", headers={"Origin": origin})
+
+    assert response.headers["access-control-allow-origin"] == origin
+    assert "X-Next-Cursor" in response.headers["access-control-expose-headers"]
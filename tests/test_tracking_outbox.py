@@ -0,0 +1,204 @@
+# tests/test_tracking_outbox.py
+"""
+Tests for the tracking delivery outbox.
+Queues events against a file-backed database and drains them with a fake
+Brudam client.
+"""
+
+import datetime
+
+import pytest
+from sqlalchemy import select
+
+from app.config.settings import settings
+from app.models.shipment import Shipment
+from app.models.client_cte import ClientCTe
+from app.models.tracking_event import TrackingEvent, DeliveryStatus
+from app.models.tracking_outbox import TrackingOutbox
+from app.services.tracking_outbox_service import TrackingOutboxService
+from app.services.tracking_outbox_worker import TrackingOutboxWorker
+from app.services.vblog.tracking import VBlogTrackingService
+
+
+class FakeTrackingService(VBlogTrackingService):
+    """Tracking service that answers batches from a fixed outcome."""
+
+    def __init__(self, ok: bool = True):
+        super().__init__(cliente="TEST", endpoint="http://brudam/api")
+        self.ok = ok
+        self.batches = []
+
+    async def send_many(self, document_keys, event_code, **kwargs):
+        self.batches.append(list(document_keys))
+        response = "ok" if self.ok else "HTTP 503"
+        return {key: (self.ok, response) for key in document_keys}
+
+
+async def _queue(session_factory, invoice_keys):
+    async with session_factory() as db:
+        shipment = Shipment()
+        db.add(shipment)
+        await db.flush()
+        cte = ClientCTe(shipment_id=shipment.id, access_key="KEY1")
+        cte.invoices = invoice_keys
+        db.add(cte)
+        await db.flush()
+
+        event_ids = await TrackingOutboxService.enqueue(
+            db,
+            [(cte.id, key) for key in invoice_keys],
+            event_code="1",
+            event_date=datetime.datetime.now(datetime.timezone.utc),
+        )
+        await db.commit()
+        return event_ids
+
+
+def _make_due(db):
+    """Pull every rescheduled entry back to now."""
+    return db.execute(
+        TrackingOutbox.__table__.update().values(
+            next_attempt_at=datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=1)
+        )
+    )
+
+
+@pytest.mark.asyncio
+async def test_outbox_drain_delivers_events(session_factory):
+    """Test queued events are sent in one batch and marked delivered."""
+    event_ids = await _queue(session_factory, ["NF1", "NF2"])
+    tracking = FakeTrackingService(ok=True)
+    worker = TrackingOutboxWorker(tracking_factory=lambda: tracking, session_factory=session_factory)
+
+    assert await worker.drain_once() == 2
+    assert tracking.batches == [["NF1", "NF2"]]
+    assert await worker.drain_once() == 0
+
+    async with session_factory() as db:
+        for event_id in event_ids:
+            event = await db.get(TrackingEvent, event_id)
+            assert event.delivery_status == DeliveryStatus.DELIVERED
+            assert event.delivery_attempts == 1
+            assert event.delivery_latency_ms is not None
+            assert event.delivered_at is not None
+        assert await TrackingOutboxService.count_by_status(db) == {DeliveryStatus.DELIVERED: 2}
+
+
+@pytest.mark.asyncio
+async def test_outbox_failure_backs_off_then_fails(session_factory, monkeypatch):
+    """Test failed sends are rescheduled with backoff and give up at max attempts."""
+    monkeypatch.setattr(settings, "outbox_max_attempts", 2)
+    (event_id,) = await _queue(session_factory, ["NF1"])
+    worker = TrackingOutboxWorker(
+        tracking_factory=lambda: FakeTrackingService(ok=False), session_factory=session_factory
+    )
+
+    assert await worker.drain_once() == 1
+    # Rescheduled into the future, so not due yet
+    assert await worker.drain_once() == 0
+
+    async with session_factory() as db:
+        event = await db.get(TrackingEvent, event_id)
+        assert event.delivery_status == DeliveryStatus.PENDING
+        assert event.delivery_attempts == 1
+        assert await TrackingOutboxService.count_by_status(db) == {DeliveryStatus.PENDING: 1}
+        await _make_due(db)
+        await db.commit()
+
+    assert await worker.drain_once() == 1
+
+    async with session_factory() as db:
+        event = await db.get(TrackingEvent, event_id)
+        assert event.delivery_status == DeliveryStatus.FAILED
+        assert event.delivery_attempts == 2
+        assert event.delivery_response == "HTTP 503"
+        assert await TrackingOutboxService.count_by_status(db) == {DeliveryStatus.FAILED: 1}
+
+
+
+@pytest.mark.asyncio
+async def test_outbox_claim_is_committed_before_sending(session_factory):
+    """Test entries are leased in a committed transaction and sent with none open."""
+    await _queue(session_factory, ["NF1", "NF2"])
+    seen = []
+
+    class CheckingTrackingService(FakeTrackingService):
+        async def send_many(self, document_keys, event_code, **kwargs):
+            # A separate session already sees the lease
+            async with session_factory() as db:
+                seen.append(await TrackingOutboxService.count_by_status(db))
+                assert await TrackingOutboxService.claim_due(db) == []
+            return await super().send_many(document_keys, event_code, **kwargs)
+
+    worker = TrackingOutboxWorker(tracking_factory=CheckingTrackingService, session_factory=session_factory)
+
+    assert await worker.drain_once() == 2
+    assert seen == [{DeliveryStatus.SENDING: 2}]
+    async with session_factory() as db:
+        assert await TrackingOutboxService.count_by_status(db) == {DeliveryStatus.DELIVERED: 2}
+
+
+@pytest.mark.asyncio
+async def test_outbox_expired_lease_counts_as_failed_attempt(session_factory):
+    """Test an entry left SENDING by a dead worker backs off as a failed attempt, then is retried."""
+    (event_id,) = await _queue(session_factory, ["NF1"])
+    async with session_factory() as db:
+        assert len(await TrackingOutboxService.claim_due(db)) == 1
+
+    tracking = FakeTrackingService(ok=True)
+    worker = TrackingOutboxWorker(tracking_factory=lambda: tracking, session_factory=session_factory)
+    # Still leased
+    assert await worker.drain_once() == 0
+
+    async with session_factory() as db:
+        await _make_due(db)
+        await db.commit()
+    # Lease expiry is recorded as a failed attempt and backed off
+    assert await worker.drain_once() == 0
+    async with session_factory() as db:
+        entry = (await db.execute(select(TrackingOutbox))).scalar_one()
+        assert (entry.status, entry.attempts) == (DeliveryStatus.PENDING, 1)
+        assert (await db.get(TrackingEvent, event_id)).delivery_attempts == 1
+        await _make_due(db)
+        await db.commit()
+
+    assert await worker.drain_once() == 1
+    assert tracking.batches == [["NF1"]]
+    async with session_factory() as db:
+        assert await TrackingOutboxService.count_by_status(db) == {DeliveryStatus.DELIVERED: 1}
+
+
+@pytest.mark.asyncio
+async def test_outbox_outcome_dropped_after_lease_lost(session_factory):
+    """Test a send that outlives its lease does not record over the entry's new state."""
+    await _queue(session_factory, ["NF1"])
+
+    class HangingTrackingService(FakeTrackingService):
+        async def send_many(self, document_keys, event_code, **kwargs):
+            # The lease runs out mid-send and another worker takes the entry over
+            async with session_factory() as db:
+                await _make_due(db)
+                await db.commit()
+                assert await TrackingOutboxService.claim_due(db) == []
+                await _make_due(db)
+                await db.commit()
+                assert len(await TrackingOutboxService.claim_due(db)) == 1
+            return await super().send_many(document_keys, event_code, **kwargs)
+
+    worker = TrackingOutboxWorker(tracking_factory=HangingTrackingService, session_factory=session_factory)
+    assert await worker.drain_once() == 1
+
+    async with session_factory() as db:
+        entry = (await db.execute(select(TrackingOutbox))).scalar_one()
+        # Only the lease expiry was counted; the entry stays with the new lease holder
+        assert (entry.status, entry.attempts) == (DeliveryStatus.SENDING, 1)
+        assert entry.last_error.startswith("Delivery lease expired")
+
+
+def test_outbox_backoff_is_capped(monkeypatch):
+    """Test the retry delay doubles per attempt up to the configured maximum."""
+    monkeypatch.setattr(settings, "outbox_backoff_seconds", 5.0)
+    monkeypatch.setattr(settings, "outbox_backoff_max_seconds", 30.0)
+
+    delays = [TrackingOutboxService.backoff(n).total_seconds() for n in range(1, 6)]
+    assert delays == [5.0, 10.0, 20.0, 30.0, 30.0]
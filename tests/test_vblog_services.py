@@ -182,3 +182,352 @@ async def test_extract_xml_key_not_found():
     key = client.extract_xml_key(xml)
     
     assert key is None
+
+
+@pytest.mark.asyncio
+async def test_cte_download_many_bounded_and_isolated():
+    """Test download_many caps concurrency and isolates per-key failures."""
+    import asyncio
+    from app.services.vblog.cte import VBlogCTeService
+
+    in_flight = 0
+    peak = 0
+
+    class FakeCTeService(VBlogCTeService):
+        async def download_cte(self, access_key):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            if access_key == "bad":
+                raise RuntimeError("boom")
+            return f"<cteProc>{access_key}</cteProc>"
+
+    svc = FakeCTeService(MockVBlogClient())
+    keys = ["a", "b", "bad", "c", "d", "e"]
+    results = await svc.download_many(keys, concurrency=2)
+
+    assert list(results) == keys
+    assert peak == 2
+    assert isinstance(results["bad"], RuntimeError)
+    assert results["a"] == "<cteProc>a</cteProc>"
+
+
+@pytest.mark.asyncio
+async def test_shared_http_client_survives_service_close():
+    """Test services reuse the pooled client and never close it themselves."""
+    from app.core.http_clients import HTTPClientRegistry
+    from app.services.vblog.transito import VBlogTransitoService
+
+    registry = HTTPClientRegistry()
+    shared = registry.get("vblog")
+    assert registry.get("vblog") is shared
+
+    service = VBlogTransitoService(cnpj="1", token="t", base_url="http://x", client=shared)
+    assert await service._get_client() is shared
+    await service.close()
+    assert not shared.is_closed
+
+    await registry.aclose()
+    assert shared.is_closed
+
+
+def test_circuit_breaker_transitions():
+    """Test closed -> open -> half-open (single probe) -> closed."""
+    import time
+    from app.core.circuit_breaker import CircuitBreaker, CircuitState
+
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == CircuitState.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == CircuitState.HALF_OPEN
+    assert not breaker.allow()  # only one probe at a time
+
+    breaker.record_success()
+    assert breaker.state == CircuitState.CLOSED
+    assert breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_send_with_retry_fails_fast_when_circuit_open(monkeypatch):
+    """Test an open circuit short-circuits calls without hitting the network."""
+    import httpx
+    from app.config.settings import settings
+    from app.core.circuit_breaker import CircuitBreakerRegistry
+    from app.services.vblog import base as vblog_base
+    from app.services.vblog.transito import VBlogTransitoService
+
+    monkeypatch.setattr(settings, "circuit_failure_threshold", 1)
+    monkeypatch.setattr(vblog_base, "circuit_breakers", CircuitBreakerRegistry())
+
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(503, text="down")
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+        service = VBlogTransitoService(cnpj="1", token="t", base_url="http://x", client=http)
+        service.max_retries = 1
+
+        ok, _, _ = await service._send_with_retry("http://x/api", "<a/>")
+        assert not ok and len(calls) == 1
+
+        ok, msg, status = await service._send_with_retry("http://x/api", "<a/>")
+        assert not ok and status == 0
+        assert "Circuit open" in msg
+        assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_tracking_send_many_batches_and_maps_results(monkeypatch):
+    """Test documents are packed per batch and per-document results mapped back."""
+    import json
+    import httpx
+    from app.core.circuit_breaker import CircuitBreakerRegistry
+    from app.services.vblog import base as vblog_base
+
+    monkeypatch.setattr(vblog_base, "circuit_breakers", CircuitBreakerRegistry())
+
+    batches = []
+
+    def handler(request):
+        keys = [doc["chave"] for doc in json.loads(request.content)["documentos"]]
+        batches.append(keys)
+        if "K3" in keys:
+            return httpx.Response(200, json={"data": [
+                {"chave": "K3", "status": 0, "message": "rejeitado"},
+                {"chave": "K4", "status": 1},
+            ]})
+        return httpx.Response(200, text="OK")
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+        svc = VBlogTrackingService(cliente="TEST", endpoint="http://brudam/api", client=http)
+        results = await svc.send_many(["K1", "K2", "K3", "K4", "K5"], "1", batch_size=2)
+
+    assert batches == [["K1", "K2"], ["K3", "K4"], ["K5"]]
+    assert {key: ok for key, (ok, _) in results.items()} == {
+        "K1": True, "K2": True, "K3": False, "K4": True, "K5": True,
+    }
+    assert "rejeitado" in results["K3"][1]
+
+
+
+@pytest.mark.asyncio
+async def test_tracking_send_many_isolates_rejected_document(monkeypatch):
+    """Test a batch rejected because of one document is resent per document."""
+    import json
+    import httpx
+    from app.core.circuit_breaker import CircuitBreakerRegistry
+    from app.services.vblog import base as vblog_base
+
+    monkeypatch.setattr(vblog_base, "circuit_breakers", CircuitBreakerRegistry())
+
+    requests = []
+
+    def handler(request):
+        keys = [doc["chave"] for doc in json.loads(request.content)["documentos"]]
+        requests.append(keys)
+        if "BAD" in keys:
+            return httpx.Response(422, text="documento invalido")
+        return httpx.Response(200, text="OK")
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+        svc = VBlogTrackingService(cliente="TEST", endpoint="http://brudam/api", client=http)
+        results = await svc.send_many(["K1", "BAD", "K3"], "1", batch_size=50)
+
+    assert requests[0] == ["K1", "BAD", "K3"]
+    assert sorted(requests[1:]) == [["BAD"], ["K1"], ["K3"]]
+    assert {key: ok for key, (ok, _) in results.items()} == {"K1": True, "BAD": False, "K3": True}
+
+
+class SlowTrackingService(VBlogTrackingService):
+    """Tracking service whose sends sleep instead of hitting the network."""
+
+    def __init__(self, delays: dict):
+        super().__init__(cliente="TEST", endpoint="http://brudam/api")
+        self.delays = delays
+        self.in_flight = 0
+        self.peak = 0
+
+    async def send(self, document_key, event_code, **kwargs):
+        import asyncio
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delays[document_key])
+        finally:
+            self.in_flight -= 1
+        return True, f"ok {document_key}"
+
+
+@pytest.mark.asyncio
+async def test_tracking_send_each_bounded_and_ordered():
+    """Test per-invoice fan-out respects the cap and keeps invoice order."""
+    svc = SlowTrackingService({"K1": 0.03, "K2": 0.01, "K3": 0.02, "K4": 0.0})
+
+    results = await svc.send_each(["K1", "K2", "K3", "K4"], "1", concurrency=2)
+
+    assert svc.peak == 2
+    assert [resp for _, resp, _ in results] == ["ok K1", "ok K2", "ok K3", "ok K4"]
+    assert all(ok and elapsed >= 0 for ok, _, elapsed in results)
+
+
+@pytest.mark.asyncio
+async def test_tracking_send_each_cancelled():
+    """Test setting the cancel event drops pending sends and reports them failed."""
+    import asyncio
+
+    svc = SlowTrackingService({"K1": 0.0, "K2": 5.0, "K3": 5.0})
+    cancel = asyncio.Event()
+    asyncio.get_running_loop().call_later(0.05, cancel.set)
+
+    results = await asyncio.wait_for(
+        svc.send_each(["K1", "K2", "K3"], "1", concurrency=1, cancel_event=cancel),
+        timeout=2,
+    )
+
+    assert results[0][0] is True
+    assert [ok for ok, _, _ in results[1:]] == [False, False]
+    assert results[1][1] == "Cancelled"
+
+
+@pytest.mark.asyncio
+async def test_tracking_attachment_streamed_from_disk(tmp_path, monkeypatch):
+    """Test attachments are base64-streamed into the body with an exact Content-Length."""
+    import base64
+    import json
+    import httpx
+    from app.core.circuit_breaker import CircuitBreakerRegistry
+    from app.services.attachments_service import AttachmentService
+    from app.services.vblog import base as vblog_base
+    from app.services.vblog.base import StreamingJSONBody
+
+    monkeypatch.setattr(vblog_base, "circuit_breakers", CircuitBreakerRegistry())
+
+    data = bytes(range(256)) * 1000 + b"tail"
+    storage = AttachmentService(storage_dir=str(tmp_path), base_url="/attachments")
+    ref = storage.to_ref(storage.save_file(data, "photo.jpg"))
+    assert storage.get_ref_from_url(ref.url).size == len(data)
+
+    svc = VBlogTrackingService(cliente="TEST", endpoint="http://brudam/api")
+    payload = svc.build_batch_payload(["K1", "K2"], "1", attachments=[ref])
+    body = StreamingJSONBody(payload)
+
+    import threading
+    from app.services import attachments_service
+
+    read_threads = set()
+    read_chunk = attachments_service._read_base64_chunk
+
+    def tracked_read(f, chunk_size):
+        read_threads.add(threading.current_thread())
+        return read_chunk(f, chunk_size)
+
+    monkeypatch.setattr(attachments_service, "_read_base64_chunk", tracked_read)
+    first = b"".join([chunk async for chunk in body])
+    again = b"".join([chunk async for chunk in body])
+    # File reads never run on the event loop thread
+    assert read_threads and threading.main_thread() not in read_threads
+    assert first == again and len(first) == body.content_length
+
+    decoded = json.loads(first)
+    for document in decoded["documentos"]:
+        (anexo,) = document["anexos"]
+        assert anexo["arquivo"]["nome"] == ref.url
+        assert base64.b64decode(anexo["arquivo"]["dados"]) == data
+
+    received = []
+
+    def handler(request):
+        received.append((request.headers["Content-Length"], request.read()))
+        return httpx.Response(200, text="OK")
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+        svc = VBlogTrackingService(cliente="TEST", endpoint="http://brudam/api", client=http)
+        ok, _ = await svc.send("K1", "1", attachments=[ref])
+
+    assert ok
+    length, content = received[0]
+    assert int(length) == len(content)
+    assert base64.b64decode(json.loads(content)["documentos"][0]["anexos"][0]["arquivo"]["dados"]) == data
+
+
+@pytest.mark.asyncio
+async def test_parsers_offloaded_above_threshold():
+    """Test large responses are parsed on the executor (incl. a process pool) and small ones inline."""
+    from app.core.cpu_offload import CPUOffloader
+    from app.core.loop_lag import LoopLagMonitor
+    from app.services.vblog.cte import extract_cte_xml
+    from app.services.vblog.transito import parse_transit_xml
+
+    cte = '<cteProc xmlns="http://www.portalfiscal.inf.br/cte"><chCTe>K1</chCTe></cteProc>'
+    response = f'<retConsCTe><Control><Cod>001</Cod></Control><xXMLCTe>{cte}</xXMLCTe></retConsCTe>'
+    transit = (
+        '<retDocSubTransito xmlns="http://www.controleembarque.com.br">'
+        '<Control><Cod>001</Cod><xDesc>OK</xDesc></Control>'
+        '<ControleTransito xDocTransp="1"><Docs><chaveCTe>K1</chaveCTe></Docs></ControleTransito>'
+        '</retDocSubTransito>'
+    )
+
+    offloader = CPUOffloader(kind="process", workers=1, min_bytes=100)
+    try:
+        assert "K1" in await offloader.run(extract_cte_xml, response, size=len(response))
+        parsed = await offloader.run(parse_transit_xml, transit, size=len(transit))
+        assert parsed.transits[0].docs[0].value == "K1"
+        assert await offloader.run(extract_cte_xml, "", size=0) is None
+    finally:
+        offloader.shutdown()
+    assert (offloader.offloaded, offloader.inline) == (2, 1)
+
+    monitor = LoopLagMonitor()
+    monitor.record(0.004)
+    monitor.record(0.250)
+    stats = monitor.snapshot()
+    assert stats["samples"] == 2
+    assert stats["last_ms"] == 250.0
+    assert stats["max_ms"] == 250.0
+
+
+@pytest.mark.asyncio
+async def test_url_attachments_downloaded_with_pooled_client(tmp_path, monkeypatch):
+    """Test attachment URLs share the pooled client and are written to disk in full."""
+    import httpx
+    from app.api.routes import shipments_status
+    from app.core.http_clients import HTTPClientRegistry
+    from app.services.attachments_service import AttachmentService
+
+    def handler(request):
+        if request.url.path == "/missing.pdf":
+            return httpx.Response(404)
+        return httpx.Response(200, content=request.url.path.encode() * 1000)
+
+    registry = HTTPClientRegistry()
+    registry._clients["attachments"] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(shipments_status, "http_clients", registry)
+
+    storage = AttachmentService(storage_dir=str(tmp_path), base_url="/attachments")
+    refs = await shipments_status.process_attachments(
+        None,
+        [
+            {"arquivo": {"nome": "http://files/a.pdf"}},
+            {"arquivo": {"nome": "http://files/missing.pdf"}},
+            {"arquivo": {"nome": "http://files/b.jpg"}},
+        ],
+        storage,
+    )
+
+    assert list(registry._clients) == ["attachments"]
+    assert [ref.url.rsplit(".", 1)[1] for ref in refs] == ["pdf", "jpg"]
+    for ref, name in zip(refs, ("/a.pdf", "/b.jpg")):
+        with open(ref.path, "rb") as f:
+            assert f.read() == name.encode() * 1000
+        assert ref.size == len(name) * 1000
+    await registry.aclose()